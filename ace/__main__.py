@@ -1,8 +1,23 @@
 import logging
 import os
+import sys
 from argparse import ArgumentParser
 
-from ace.charter import Charter
+from rich import print
+
+from ace.batch import run_batch
+from ace.cache import DEFAULT_MAX_BYTES, OutputCache
+from ace.catalog import Catalog
+from ace.charter import RENDERERS, Charter
+from ace.client import DEFAULT_HOST, DEFAULT_PORT
+from ace.instruments import INSTRUMENTS
+from ace.mapping import CHART_RESOLUTION
+from ace.metrics import PROFILERS, StageMetrics, print_metrics, write_metrics_json
+from ace.package import PACKAGE_FORMATS
+from ace.preview import DEFAULT_PREVIEW_LENGTH
+from ace.quantize import grid_ticks
+from ace.service import DEFAULT_QUEUE_SIZE, serve
+from ace.watch import DEFAULT_DEBOUNCE, DEFAULT_INTERVAL, watch
 
 
 def _configure_logging():
@@ -15,18 +30,39 @@ def _configure_logging():
     )
 
 
+def _report_metrics(args, songs: list):
+    if songs is None:
+        return
+    if args.profile:
+        print_metrics(songs)
+    if args.metrics_json:
+        write_metrics_json(args.metrics_json, songs)
+
+
 def main():
     _configure_logging()
     parser = ArgumentParser()
 
-    # Input directory
-    parser.add_argument(
+    # Input directory, or a batch of MIDI files
+    inputs = parser.add_mutually_exclusive_group(required=True)
+    inputs.add_argument(
         "-i",
         "--input_dir",
         type=str,
-        required=True,
         help="The directory of the MIDI file to process",
     )
+    inputs.add_argument(
+        "-b",
+        "--batch",
+        type=str,
+        nargs="+",
+        help="Directories and/or glob patterns of MIDI files to process in parallel",
+    )
+    inputs.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run a local conversion service that `python -m ace.client` sends MIDI files to",
+    )
 
     # Output directory
     home_dir = os.path.expanduser("~")
@@ -37,32 +73,312 @@ def main():
         default=os.path.join(home_dir, "Downloads"),
         help="The directory to save all output files",
     )
-    args = parser.parse_args()
 
-    # LOGIC
-    # Split the MIDI file
-    charter = Charter()
-    split_midi_key = charter.split_midi(
-        in_file_dir=args.input_dir, out_dir=args.output_dir
+    # Split MIDI side output
+    parser.add_argument(
+        "--save_split_midi",
+        action="store_true",
+        help="Also save the extracted drum track as <name>_DRUMS.mid",
+    )
+
+    # Batch worker processes
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes in batch mode (defaults to the CPU count)",
+    )
+
+    # Watch mode
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and reconvert the input MIDI files whenever they change",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=DEFAULT_DEBOUNCE,
+        help="Seconds a watched file must stay unchanged before it's reconverted",
+    )
+    parser.add_argument(
+        "--poll_interval",
+        type=float,
+        default=DEFAULT_INTERVAL,
+        help="Seconds between rescans of the watched files when inotify isn't available",
+    )
+
+    # Conversion service
+    parser.add_argument(
+        "--host",
+        type=str,
+        default=DEFAULT_HOST,
+        help="Address the conversion service listens on",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help="Port the conversion service listens on",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of songs the conversion service converts at the same time",
+    )
+    parser.add_argument(
+        "--queue_size",
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        help="Number of jobs that can wait for a worker before the service turns new ones away",
     )
 
-    # Create Clone Hero folder
-    song_name = (
-        os.path.basename(args.input_dir).replace(".mid", "").replace("_", " ").title()
+    # Output cache
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help="Regenerate every output instead of reusing cached charts and audio",
+    )
+    parser.add_argument(
+        "--cache_size",
+        type=float,
+        default=DEFAULT_MAX_BYTES / 1024**3,
+        help="Maximum size of the output cache in ~/.ace/cache, in GB",
+    )
+
+    # Song catalog
+    parser.add_argument(
+        "--no_catalog",
+        action="store_true",
+        help="Don't record conversions in the song catalog in ~/.ace/catalog.db",
+    )
+    parser.add_argument(
+        "--skip_known",
+        action="store_true",
+        help="In batch mode, skip files the catalog has already converted with the same settings, including duplicates under other names",
     )
-    ch_out_dir = f"artist - {song_name} (ACE)"
-    os.makedirs(os.path.join(args.output_dir, ch_out_dir), exist_ok=True)
 
-    # Convert to .chart file
-    charter.generate_chart_file(
-        in_file_key=split_midi_key, out_dir=args.output_dir, ch_out_dir=ch_out_dir
+    # Chart difficulties
+    parser.add_argument(
+        "--expert_only",
+        action="store_true",
+        help="Only chart Expert drums instead of also reducing them to Hard, Medium and Easy",
     )
 
-    # Generate .wav file
-    charter.generate_wav_file(
-        in_file_key=split_midi_key, out_dir=args.output_dir, ch_out_dir=ch_out_dir
+    # Drum hit cleanup
+    parser.add_argument(
+        "--quantize",
+        type=int,
+        default=None,
+        metavar="SUBDIVISION",
+        help="Snap the drum notes to the nearest 1/SUBDIVISION note, e.g. 16 or 12 for triplet eighths, and merge the hits that land together",
+    )
+    parser.add_argument(
+        "--flam_ticks",
+        type=int,
+        default=None,
+        help=f"Merge hits on one lane at most this many chart ticks apart ({CHART_RESOLUTION} per beat) into one note, 0 merging only duplicates",
     )
 
+    parser.add_argument(
+        "--instruments",
+        type=str,
+        nargs="+",
+        choices=INSTRUMENTS,
+        default=(),
+        help="Also chart these instruments from the same MIDI file, next to the drums",
+    )
+
+    # Audio renderer
+    parser.add_argument(
+        "--renderer",
+        type=str,
+        choices=RENDERERS,
+        default="fluidsynth",
+        help="Render audio with FluidSynth (highest fidelity) or by mixing cached one-shot samples with NumPy (fastest)",
+    )
+    parser.add_argument(
+        "--render_jobs",
+        type=int,
+        default=1,
+        help="FluidSynth processes rendering time segments of a long song at once, stitched with crossfades (defaults to 1, rendering each song in one piece)",
+    )
+
+    # Output layout
+    parser.add_argument(
+        "--package",
+        type=str,
+        choices=PACKAGE_FORMATS,
+        default=None,
+        help="Write each song as one .zip or .sng archive with notes.chart, song.ini and the audio, instead of a song folder",
+    )
+
+    # Preview clips
+    parser.add_argument(
+        "--preview",
+        type=float,
+        nargs="*",
+        metavar="SECONDS",
+        default=None,
+        help="Also render preview.wav and write its bounds to the chart: the densest --preview_length seconds of drums, or START END in seconds",
+    )
+    parser.add_argument(
+        "--preview_length",
+        type=float,
+        default=DEFAULT_PREVIEW_LENGTH,
+        help="Seconds of the automatically picked preview",
+    )
+    parser.add_argument(
+        "--preview_only",
+        action="store_true",
+        help="Render only preview.wav, not the full song.wav",
+    )
+
+    # Metrics and profiling
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print the wall time, CPU time, process peak RSS, events and bytes written of each stage",
+    )
+    parser.add_argument(
+        "--metrics_json",
+        type=str,
+        default=None,
+        help="Write the per-stage metrics of every song to this JSON file",
+    )
+    parser.add_argument(
+        "--profile_chart",
+        type=str,
+        default=None,
+        help="Dump a profile of the chart stage to this file (single file mode only)",
+    )
+    parser.add_argument(
+        "--profiler",
+        type=str,
+        choices=PROFILERS,
+        default="cprofile",
+        help="Profile the chart stage with cProfile (pstats file) or a sampling profiler (collapsed stacks)",
+    )
+    args = parser.parse_args()
+    if args.batch and args.profile_chart:
+        parser.error("--profile_chart only works with -i/--input_dir")
+    if args.skip_known and (not args.batch or args.watch or args.no_catalog):
+        parser.error("--skip_known only works with -b/--batch and the catalog")
+    if args.preview is not None and (
+        len(args.preview) not in (0, 2)
+        or (args.preview and not 0 <= args.preview[0] < args.preview[1])
+    ):
+        parser.error("--preview takes no value or a START END pair in seconds")
+    if args.preview_only and args.preview is None:
+        parser.error("--preview_only needs --preview")
+    if args.quantize is not None:
+        try:
+            grid_ticks(args.quantize)
+        except ValueError as e:
+            parser.error(f"--quantize: {e}")
+    if args.flam_ticks is not None and args.flam_ticks < 0:
+        parser.error("--flam_ticks must not be negative")
+    if args.render_jobs < 1:
+        parser.error("--render_jobs must be at least 1")
+    collect_metrics = args.profile or args.metrics_json or args.profile_chart
+    if (args.watch or args.serve) and collect_metrics:
+        parser.error("--watch and --serve don't record metrics or profiles")
+    if args.watch and args.serve:
+        parser.error("--watch only works with -i/--input_dir or -b/--batch")
+
+    # LOGIC
+    cache = None
+    if not args.no_cache:
+        cache = OutputCache(max_bytes=int(args.cache_size * 1024**3))
+    charter_options = {
+        "cache": cache,
+        "renderer": args.renderer,
+        "render_jobs": args.render_jobs,
+    }
+    if args.expert_only:
+        charter_options["difficulties"] = ()
+    if args.instruments:
+        charter_options["instruments"] = tuple(args.instruments)
+    if args.quantize is not None:
+        charter_options["quantize"] = args.quantize
+    if args.flam_ticks is not None:
+        charter_options["flam_ticks"] = args.flam_ticks
+    if not args.no_catalog:
+        charter_options["catalog"] = Catalog()
+    if args.package:
+        charter_options["package"] = args.package
+    if args.preview is not None:
+        charter_options["preview"] = tuple(args.preview) or "auto"
+        charter_options["preview_length"] = args.preview_length
+        charter_options["preview_only"] = args.preview_only
+
+    if args.serve:
+        serve(
+            out_dir=args.output_dir,
+            charter_options=charter_options,
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            queue_size=args.queue_size,
+        )
+        return
+
+    if args.watch:
+        watch(
+            inputs=args.batch or [args.input_dir],
+            out_dir=args.output_dir,
+            save_split_midi=args.save_split_midi,
+            charter_options=charter_options,
+            debounce=args.debounce,
+            interval=args.poll_interval,
+        )
+        return
+
+    if args.batch:
+        songs = [] if collect_metrics else None
+        failures = run_batch(
+            inputs=args.batch,
+            out_dir=args.output_dir,
+            jobs=args.jobs,
+            save_split_midi=args.save_split_midi,
+            charter_options=charter_options,
+            metrics=songs,
+            skip_known=args.skip_known,
+        )
+        _report_metrics(args, songs)
+        if failures:
+            sys.exit(1)
+        return
+
+    # Parse the MIDI file once, then generate the .chart and .wav files from memory
+    metrics = None
+    if collect_metrics:
+        metrics = StageMetrics(profiler=args.profiler if args.profile_chart else None)
+    charter = Charter(**charter_options, metrics=metrics)
+    error = None
+    try:
+        charter.convert(
+            in_file_dir=args.input_dir,
+            out_dir=args.output_dir,
+            ch_out_dir=charter.song_folder(args.input_dir),
+            save_split_midi=args.save_split_midi,
+        )
+    except FileNotFoundError as e:
+        error = f"{type(e).__name__}: {e}"
+
+    if metrics is not None:
+        song = {"input": args.input_dir, "error": error, **metrics.to_dict()}
+        _report_metrics(args, [song])
+        if args.profile_chart:
+            metrics.dump_profile(args.profile_chart)
+            print(
+                f"[bold green]✔ Saved chart stage profile to:[/bold green] [cyan]{args.profile_chart}[/cyan]"
+            )
+    if error is not None:
+        sys.exit(1)
+
 
 if __name__ == "__main__":
     main()
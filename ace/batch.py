@@ -0,0 +1,261 @@
+"""
+Module for converting whole MIDI libraries in one process invocation.
+Collects MIDI files from directories and glob patterns and fans the conversion
+out over a process pool, reporting progress and failures per file.
+"""
+
+import glob
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from rich import print
+from rich.progress import Progress
+
+from ace.cache import file_digest
+from ace.catalog import Catalog
+from ace.charter import Charter
+from ace.metrics import StageMetrics
+
+logger = logging.getLogger(__name__)
+
+MIDI_EXTENSIONS = (".mid", ".midi")
+
+
+def find_midi_files(inputs: list):
+    """
+    Collect the MIDI files matched by a list of files, directories or glob patterns.
+
+    Directories are searched recursively. Glob patterns support "**" for
+    recursive matching. Duplicates are removed while keeping the input order.
+
+    Args:
+        inputs (list): MIDI file paths, directories and/or glob patterns
+
+    Returns:
+        list: Paths of the matched MIDI files
+    """
+    found = {}
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            for root, dirs, files in os.walk(pattern):
+                dirs.sort()
+                for file in sorted(files):
+                    if file.lower().endswith(MIDI_EXTENSIONS):
+                        found.setdefault(os.path.join(root, file), None)
+        elif os.path.isfile(pattern):
+            found.setdefault(pattern, None)
+        else:
+            for path in sorted(glob.glob(pattern, recursive=True)):
+                if os.path.isfile(path) and path.lower().endswith(MIDI_EXTENSIONS):
+                    found.setdefault(path, None)
+
+    return list(found)
+
+
+def convert_file(
+    in_file_dir: str,
+    out_dir: str,
+    save_split_midi: bool = False,
+    charter_options: dict = None,
+    collect_metrics: bool = False,
+):
+    """
+    Convert a single MIDI file, catching any error so the batch can continue.
+
+    Runs in a worker process, so it must stay a module-level function.
+
+    Args:
+        in_file_dir (str): Path to the input MIDI file
+        out_dir (str): Directory where all output files will be saved
+        save_split_midi (bool): Also write the split "_DRUMS" MIDI file to out_dir
+        charter_options (dict, optional): Keyword arguments for the Charter
+        collect_metrics (bool): Record the time and memory of each stage
+
+    Returns:
+        tuple: The input path, the error message or None on success, and the song
+            metrics (see `ace.metrics.write_metrics_json`) or None
+    """
+    metrics = StageMetrics() if collect_metrics else None
+    error = None
+    try:
+        charter = Charter(**(charter_options or {}), metrics=metrics)
+        charter.convert(
+            in_file_dir=in_file_dir,
+            out_dir=out_dir,
+            ch_out_dir=charter.song_folder(in_file_dir),
+            save_split_midi=save_split_midi,
+        )
+    except Exception as e:
+        logger.exception(f"Error: Failed to convert {in_file_dir}")
+        error = f"{type(e).__name__}: {e}"
+
+    song_metrics = None
+    if metrics is not None:
+        song_metrics = {"input": in_file_dir, "error": error, **metrics.to_dict()}
+    return in_file_dir, error, song_metrics
+
+
+def _output_collisions(midi_files: list):
+    """
+    Find the MIDI files whose outputs would overwrite those of an earlier file.
+
+    Outputs are named after the input filename only, so songs with the same name in
+    different directories of a library would share a song folder and chart file.
+
+    Args:
+        midi_files (list): Paths of the matched MIDI files, in input order
+
+    Returns:
+        dict: Error messages of the colliding files, keyed by path. The first file
+            with a given name is left to convert
+    """
+    charter = Charter()
+    owners = {}
+    collisions = {}
+    for in_file_dir in midi_files:
+        split_key = charter.split_file_key(in_file_dir)
+        names = (
+            ("song folder", charter.song_folder(in_file_dir).lower()),
+            ("chart", os.path.splitext(split_key)[0].lower()),
+        )
+        for kind, name in names:
+            owner = owners.get((kind, name))
+            if owner is not None:
+                collisions[in_file_dir] = (
+                    f"OutputCollision: same {kind} as {owner}, rename one of them"
+                )
+                break
+        else:
+            for kind, name in names:
+                owners[(kind, name)] = in_file_dir
+    return collisions
+
+
+def _known_files(midi_files: list, catalog: Catalog, charter_options: dict):
+    """
+    Find the MIDI files the catalog already has outputs for, and report them.
+
+    Args:
+        midi_files (list): Paths of the matched MIDI files
+        catalog (Catalog): Catalog of earlier conversions
+        charter_options (dict): Keyword arguments for the Charter, whose settings
+            the earlier conversions must match
+
+    Returns:
+        dict: Source path of the earlier conversion, keyed by the known file's path
+    """
+    settings = Charter(**charter_options).settings()
+    known = {}
+    for in_file_dir in midi_files:
+        row = catalog.known(file_digest(in_file_dir), settings, in_file_dir)
+        if row is None:
+            continue
+        known[in_file_dir] = row["source_path"]
+        if row["source_path"] == os.path.abspath(in_file_dir):
+            print(
+                f"[bold green]✔ Skipped unchanged:[/bold green] [cyan]{in_file_dir}[/cyan]"
+            )
+        else:
+            print(
+                f"[bold green]✔ Skipped duplicate of[/bold green] [cyan]{row['source_path']}[/cyan]: [cyan]{in_file_dir}[/cyan]"
+            )
+    logger.info(f"Skipping {len(known)} MIDI files known to the catalog")
+    return known
+
+
+def run_batch(
+    inputs: list,
+    out_dir: str,
+    jobs: int = None,
+    save_split_midi: bool = False,
+    charter_options: dict = None,
+    metrics: list = None,
+    skip_known: bool = False,
+):
+    """
+    Convert every MIDI file matched by the inputs using a pool of worker processes.
+
+    Files whose outputs would overwrite those of an earlier file with the same name
+    fail instead of converting.
+
+    Args:
+        inputs (list): MIDI file paths, directories and/or glob patterns
+        out_dir (str): Directory where all output files will be saved
+        jobs (int, optional): Number of worker processes. Defaults to the CPU count
+        save_split_midi (bool): Also write the split "_DRUMS" MIDI files to out_dir
+        charter_options (dict, optional): Keyword arguments for each worker's Charter,
+            e.g. the shared output cache
+        metrics (list, optional): Receives the stage metrics of every song, in input
+            order. Metrics are only recorded when a list is given
+        skip_known (bool): Skip files whose contents were already converted with the
+            same settings according to the catalog in the charter options, whether
+            under the same name or as a duplicate, as long as the outputs still exist
+
+    Returns:
+        dict: Error messages of the failed conversions, keyed by input path
+    """
+    midi_files = find_midi_files(inputs)
+    if not midi_files:
+        logger.error(f"Error: No MIDI files found in: {inputs}")
+        print("[bold red]Error:[/bold red] No MIDI files found")
+        return {}
+
+    failures = _output_collisions(midi_files)
+    collisions = len(failures)
+    for in_file_dir, error in failures.items():
+        logger.error(f"Error: Not converting {in_file_dir}: {error}")
+        print(f"[bold red]✘ Failed:[/bold red] [cyan]{in_file_dir}[/cyan] ({error})")
+    midi_files = [path for path in midi_files if path not in failures]
+
+    skipped = {}
+    catalog = (charter_options or {}).get("catalog")
+    if skip_known and catalog is not None:
+        skipped = _known_files(midi_files, catalog, charter_options)
+        midi_files = [path for path in midi_files if path not in skipped]
+
+    song_metrics = {}
+    with Progress() as progress, ProcessPoolExecutor(max_workers=jobs) as executor:
+        task = progress.add_task("Converting", total=len(midi_files))
+        futures = {
+            executor.submit(
+                convert_file,
+                in_file_dir,
+                out_dir,
+                save_split_midi,
+                charter_options,
+                metrics is not None,
+            ): in_file_dir
+            for in_file_dir in midi_files
+        }
+        for future in as_completed(futures):
+            try:
+                in_file_dir, error, song_metrics[in_file_dir] = future.result()
+            except Exception as e:
+                # The worker process itself died
+                in_file_dir, error = futures[future], f"{type(e).__name__}: {e}"
+            if error is None:
+                progress.console.print(
+                    f"[bold green]✔ Converted:[/bold green] [cyan]{in_file_dir}[/cyan]"
+                )
+            else:
+                failures[in_file_dir] = error
+                progress.console.print(
+                    f"[bold red]✘ Failed:[/bold red] [cyan]{in_file_dir}[/cyan] ({error})"
+                )
+            progress.advance(task)
+
+    if metrics is not None:
+        metrics.extend(
+            song_metrics[path] for path in midi_files if song_metrics.get(path)
+        )
+
+    total = len(midi_files) + collisions
+    converted = total - len(failures)
+    logger.info(f"Batch converted {converted}/{total} MIDI files")
+    summary = f"Converted {converted}/{total} MIDI files, {len(failures)} failed"
+    if skip_known:
+        summary += f", {len(skipped)} skipped"
+    print(f"[bold]{summary}[/bold]")
+
+    return failures
@@ -0,0 +1,287 @@
+"""
+Module for the content-addressed output cache.
+Stores generated charts and audio under ~/.ace/cache, keyed by a hash of everything
+that affects them, so re-running a conversion on an unchanged song skips the work.
+"""
+
+import hashlib
+import io
+import itertools
+import json
+import logging
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Bump when a code change alters the generated outputs, invalidating old entries
+CACHE_VERSION = 2
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".ace", "cache")
+DEFAULT_MAX_BYTES = 5 * 1024**3
+
+
+def file_digest(path: str):
+    """
+    Hash the contents of a file.
+
+    Args:
+        path (str): Path of the file to hash
+
+    Returns:
+        str: Hex SHA-256 digest of the file bytes
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def midi_digest_of(midi):
+    """
+    Hash an in-memory MIDI file as it would be saved.
+
+    Args:
+        midi (MidiFile): The MIDI file to hash
+
+    Returns:
+        str: Hex SHA-256 digest of the Standard MIDI File bytes
+    """
+    buffer = io.BytesIO()
+    midi.save(file=buffer)
+    return hashlib.sha256(buffer.getbuffer()).hexdigest()
+
+
+_tmp_ids = itertools.count()
+
+
+def tmp_path(path: str, suffix: str = ".tmp"):
+    """
+    Build a temporary path next to a file, unique to this process, thread and call.
+
+    Args:
+        path (str): The file the temporary file will replace
+        suffix (str): Ending of the temporary path. Eviction skips ".tmp" files
+
+    Returns:
+        str: The temporary path
+    """
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.{next(_tmp_ids)}{suffix}"
+
+
+def _link_or_copy(src: str, dst: str):
+    """
+    Hard link src to dst, copying when the two paths are on different file systems.
+
+    Args:
+        src (str): Existing file
+        dst (str): Path to create, replaced if it exists
+    """
+    try:
+        # Renaming a second link to the same file onto dst would do nothing
+        if os.path.samefile(src, dst):
+            return
+    except FileNotFoundError:
+        pass
+
+    tmp_fp = tmp_path(dst)
+    try:
+        try:
+            os.link(src, tmp_fp)
+        except OSError:
+            shutil.copyfile(src, tmp_fp)
+        os.replace(tmp_fp, dst)
+    finally:
+        try:
+            os.remove(tmp_fp)
+        except FileNotFoundError:
+            pass
+
+
+class OutputCache:
+    """
+    Size-bounded, least-recently-used cache of generated output files.
+
+    Each entry is a single file named after its key. Hits refresh the entry's
+    modification time, which is what eviction orders by. The cache directory is
+    only rescanned when the running size estimate goes over max_bytes.
+
+    Args:
+        cache_dir (str, optional): Directory holding the entries. Defaults to ~/.ace/cache
+        max_bytes (int, optional): Total size the cache is trimmed to after each store
+    """
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self._total_bytes = None
+
+    def make_key(self, *parts):
+        """
+        Build a cache key from JSON-serializable parts.
+
+        Args:
+            *parts: Everything the cached output depends on, e.g. the input digest,
+                the output kind and the settings used to generate it
+
+        Returns:
+            str: Hex SHA-256 digest identifying the entry
+        """
+        payload = json.dumps([CACHE_VERSION, *parts], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _entry_fp(self, key: str):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def fetch(self, key: str, out_fps: list, link: bool = False):
+        """
+        Place a cached output at one or more paths.
+
+        Args:
+            key (str): Key from `make_key`
+            out_fps (list): Paths to write the cached file to
+            link (bool): Hard link the entry instead of copying it. Only use this for
+                outputs that are never edited in place
+
+        Returns:
+            bool: True on a hit, False if the key isn't cached
+        """
+        entry_fp = self._entry_fp(key)
+        try:
+            os.utime(entry_fp)
+            for out_fp in out_fps:
+                if link:
+                    _link_or_copy(entry_fp, out_fp)
+                else:
+                    shutil.copyfile(entry_fp, out_fp)
+        except FileNotFoundError:
+            # Missing, or evicted by another process while reading
+            return False
+
+        logger.info(f"Cache hit {key} for: {out_fps}")
+        return True
+
+    def open(self, key: str):
+        """
+        Open a cached output for reading, e.g. to stream it into a song package.
+
+        Args:
+            key (str): Key from `make_key`
+
+        Returns:
+            Binary file handle of the entry, or None if the key isn't cached
+        """
+        entry_fp = self._entry_fp(key)
+        try:
+            os.utime(entry_fp)
+            f = open(entry_fp, "rb")
+        except FileNotFoundError:
+            return None
+
+        logger.info(f"Cache hit {key}")
+        return f
+
+    @contextmanager
+    def writer(self, key: str):
+        """
+        Write an output straight into the cache. The entry only appears once the
+        block completes, and is discarded if it raises.
+
+        Args:
+            key (str): Key from `make_key`
+
+        Yields:
+            Binary file handle to write the output to
+        """
+        entry_fp = self._entry_fp(key)
+        os.makedirs(os.path.dirname(entry_fp), exist_ok=True)
+        tmp_fp = tmp_path(entry_fp)
+        try:
+            with open(tmp_fp, "wb") as f:
+                yield f
+        except BaseException:
+            os.remove(tmp_fp)
+            raise
+        os.replace(tmp_fp, entry_fp)
+        self._added(entry_fp)
+
+    def alias(self, key: str, existing_key: str):
+        """
+        Store an existing entry under a second key by hard linking it.
+
+        Args:
+            key (str): Key from `make_key` to add
+            existing_key (str): Key of the cached entry
+
+        Returns:
+            bool: True if the entry was aliased, False if it isn't cached
+        """
+        entry_fp = self._entry_fp(key)
+        os.makedirs(os.path.dirname(entry_fp), exist_ok=True)
+        try:
+            _link_or_copy(self._entry_fp(existing_key), entry_fp)
+        except FileNotFoundError:
+            return False
+        self._added(entry_fp)
+        return True
+
+    def store(self, key: str, src_fp: str, link: bool = False):
+        """
+        Add a generated output to the cache, then evict old entries if it's too big.
+
+        Args:
+            key (str): Key from `make_key`
+            src_fp (str): The generated file
+            link (bool): Hard link the file into the cache instead of copying it
+        """
+        entry_fp = self._entry_fp(key)
+        os.makedirs(os.path.dirname(entry_fp), exist_ok=True)
+        if link:
+            _link_or_copy(src_fp, entry_fp)
+        else:
+            tmp_fp = tmp_path(entry_fp)
+            shutil.copyfile(src_fp, tmp_fp)
+            os.replace(tmp_fp, entry_fp)
+        self._added(entry_fp)
+
+    def _added(self, entry_fp: str):
+        size = os.path.getsize(entry_fp)
+        if self._total_bytes is None or self._total_bytes + size > self.max_bytes:
+            self.evict()
+        else:
+            self._total_bytes += size
+
+    def evict(self):
+        """
+        Delete least recently used entries until the cache fits in max_bytes.
+        """
+        entries = []
+        total = 0
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            logger.info(f"Evicted cache entry: {path}")
+
+        self._total_bytes = total
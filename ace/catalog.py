@@ -0,0 +1,218 @@
+"""
+Module for the SQLite catalog of the generated song library.
+Records every conversion in ~/.ace/catalog.db with its source, content hash, outputs,
+note counts, duration and settings, so known and duplicate inputs can be found
+without walking the output directories.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.expanduser("~"), ".ace", "catalog.db")
+
+# Seconds to wait for another process (e.g. a batch worker) to finish writing
+BUSY_TIMEOUT = 30.0
+
+# One row per source file and settings, replaced when the file is converted again.
+# The unique index also serves lookups by source path
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversions (
+    id INTEGER PRIMARY KEY,
+    source_path TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    chart_path TEXT NOT NULL,
+    notes_chart_path TEXT NOT NULL,
+    wav_path TEXT NOT NULL,
+    notes INTEGER NOT NULL,
+    note_counts TEXT NOT NULL,
+    duration REAL,
+    converted_at REAL NOT NULL,
+    UNIQUE (source_path, settings)
+);
+CREATE INDEX IF NOT EXISTS conversions_content_hash ON conversions (content_hash);
+"""
+
+# Columns holding JSON text, decoded when rows are returned
+JSON_COLUMNS = ("settings", "note_counts")
+
+
+def _settings_text(settings: dict):
+    return json.dumps(settings, sort_keys=True)
+
+
+class Catalog:
+    """
+    Persistent record of the converted songs.
+
+    The database is only opened on first use, so a Catalog can be passed to worker
+    processes like an OutputCache. Every process and thread opens its own connection.
+
+    Args:
+        path (str, optional): SQLite database file. Defaults to ~/.ace/catalog.db
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or DEFAULT_CATALOG_PATH
+        self._local = threading.local()
+
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT)
+            conn.row_factory = sqlite3.Row
+            with conn:
+                conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """
+        Close this thread's database connection, if it's open.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def record(
+        self,
+        source_path: str,
+        content_hash: str,
+        settings: dict,
+        outputs: dict,
+        note_counts: dict,
+        duration: float = None,
+    ):
+        """
+        Record a conversion, replacing an earlier one of the same file and settings.
+
+        Args:
+            source_path (str): Input MIDI file, stored as an absolute path
+            content_hash (str): Hex SHA-256 digest of the input file
+            settings (dict): ACE settings the outputs were generated with, see
+                `Charter.settings`
+            outputs (dict): Paths of the "chart", "notes_chart" and "wav" outputs
+            note_counts (dict): Number of note events per chart section
+            duration (float, optional): Song length in seconds
+
+        Returns:
+            bool: True if the conversion was recorded, False if the database failed
+        """
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO conversions (source_path, content_hash, settings, "
+                    "chart_path, notes_chart_path, wav_path, notes, note_counts, duration, "
+                    "converted_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        os.path.abspath(source_path),
+                        content_hash,
+                        _settings_text(settings),
+                        os.path.abspath(outputs["chart"]),
+                        os.path.abspath(outputs["notes_chart"]),
+                        os.path.abspath(outputs["wav"]),
+                        sum(note_counts.values()),
+                        json.dumps(note_counts),
+                        duration,
+                        time.time(),
+                    ),
+                )
+        except sqlite3.Error as e:
+            # A broken catalog must not fail the conversion it records
+            logger.warning(f"Failed to catalog {source_path}: {e}")
+            return False
+
+        logger.info(f"Cataloged conversion of: {source_path}")
+        return True
+
+    def _rows(self, query: str, params=()):
+        rows = []
+        for row in self._connect().execute(query, params):
+            row = dict(row)
+            for column in JSON_COLUMNS:
+                row[column] = json.loads(row[column])
+            rows.append(row)
+        return rows
+
+    def find(self, source_path: str):
+        """
+        List the recorded conversions of a source file.
+
+        Args:
+            source_path (str): Input MIDI file
+
+        Returns:
+            list: Conversion rows as dicts, most recent first
+        """
+        return self._rows(
+            "SELECT * FROM conversions WHERE source_path = ? ORDER BY converted_at DESC",
+            (os.path.abspath(source_path),),
+        )
+
+    def known(self, content_hash: str, settings: dict, source_path: str = None):
+        """
+        Find a conversion of the same content and settings whose outputs still exist.
+
+        Args:
+            content_hash (str): Hex SHA-256 digest of the input file
+            settings (dict): ACE settings, see `Charter.settings`
+            source_path (str, optional): Input MIDI file. Its own conversion is
+                preferred over those of other files with the same contents
+
+        Returns:
+            dict | None: The most recent matching conversion row, or None
+        """
+        rows = self._rows(
+            "SELECT * FROM conversions WHERE content_hash = ? AND settings = ? "
+            "ORDER BY converted_at DESC",
+            (content_hash, _settings_text(settings)),
+        )
+        if source_path is not None:
+            source_path = os.path.abspath(source_path)
+            rows.sort(key=lambda row: row["source_path"] != source_path)
+        for row in rows:
+            outputs = (row["chart_path"], row["notes_chart_path"], row["wav_path"])
+            if all(os.path.exists(path) for path in outputs):
+                return row
+        return None
+
+    def duplicates(self):
+        """
+        Group the recorded source files that have the same contents.
+
+        Returns:
+            dict: Sorted lists of two or more source paths, keyed by content hash
+        """
+        groups = {}
+        for content_hash, source_path in self._connect().execute(
+            "SELECT DISTINCT content_hash, source_path FROM conversions WHERE "
+            "content_hash IN (SELECT content_hash FROM conversions GROUP BY "
+            "content_hash HAVING COUNT(DISTINCT source_path) > 1) "
+            "ORDER BY content_hash, source_path"
+        ):
+            groups.setdefault(content_hash, []).append(source_path)
+        return groups
+
+    def songs(self):
+        """
+        List every recorded conversion.
+
+        Returns:
+            list: Conversion rows as dicts, ordered by source path
+        """
+        return self._rows("SELECT * FROM conversions ORDER BY source_path, settings")
@@ -0,0 +1,296 @@
+"""
+Module for reading Clone Hero .chart files back into the model they're generated from.
+Tokenizes the section/key-value grammar one line at a time, so only the parsed notes
+are held in memory, and loads note sections into NoteTracks.
+"""
+
+from bisect import bisect_right
+
+from ace.mapping import CHART_RESOLUTION, CYMBAL_MARKER, CYMBAL_OFFSET
+from ace.note_track import CYMBAL, NoteTrack
+from ace.tempo_map import TempoMap
+
+# Sections holding metadata instead of timed events
+META_SECTIONS = ("Song",)
+
+# Sections holding timed events that aren't notes
+EVENT_SECTIONS = ("SyncTrack", "Events")
+
+# Note numbers by their text, faster than int() for the few values charts use
+_NOTE_VALUES = {str(note): note for note in range(256)}
+
+
+class ChartParseError(ValueError):
+    """Raised when a .chart file doesn't follow the section/key-value grammar."""
+
+
+def _bpm(value: str, where: str):
+    """
+    Parse the value of a SyncTrack "B" event.
+
+    Args:
+        value (str): BPM x 1000, as written after "B"
+        where (str): Location of the event, for error messages
+
+    Returns:
+        int: The BPM x 1000
+
+    Raises:
+        ChartParseError: If the value isn't a positive number
+    """
+    try:
+        bpm = int(value)
+    except ValueError:
+        bpm = 0
+    if bpm <= 0:
+        raise ChartParseError(f"{where}: bad tempo 'B {value}'")
+    return bpm
+
+
+class Chart:
+    """
+    Contents of a .chart file, in the shapes `Charter.generate_chart_file` writes.
+
+    Args:
+        song (dict): [Song] values keyed by name, as raw text (quoted strings keep
+            their quotes)
+        sync_items (list): [SyncTrack] (chart_tick, event) pairs, e.g. (0, "B 120000")
+        events (list): [Events] (chart_tick, event) pairs
+        note_sections (list): (section name, NoteTrack) pairs in file order
+    """
+
+    __slots__ = ("song", "sync_items", "events", "note_sections")
+
+    def __init__(self, song=None, sync_items=None, events=None, note_sections=None):
+        self.song = song if song is not None else {}
+        self.sync_items = sync_items if sync_items is not None else []
+        self.events = events if events is not None else []
+        self.note_sections = note_sections if note_sections is not None else []
+
+    @property
+    def resolution(self):
+        """
+        int: Chart ticks per beat, CHART_RESOLUTION when the [Song] section has none.
+        """
+        return int(self.song.get("Resolution", CHART_RESOLUTION))
+
+    def tempo_map(self):
+        """
+        Build the tempo map of the SyncTrack, in chart ticks.
+
+        Returns:
+            TempoMap: Tempo changes of the chart, with the resolution as ticks per beat
+
+        Raises:
+            ChartParseError: If a "B" value isn't a positive number
+        """
+        changes = []
+        for tick, event in self.sync_items:
+            kind, _, value = event.partition(" ")
+            if kind == "B":
+                # "B" values are BPM x 1000, tempos microseconds per beat
+                bpm = _bpm(value, f"tick {tick}")
+                changes.append((tick, (60_000_000_000 + bpm // 2) // bpm))
+        return TempoMap(changes, self.resolution)
+
+    def sections(self):
+        """
+        List the sections for `write_chart`, which writes them back unchanged.
+
+        Returns:
+            list: (name, items) pairs in file order
+        """
+        sections = [
+            ("Song", self.song.items()),
+            ("SyncTrack", self.sync_items),
+            ("Events", self.events),
+        ]
+        sections.extend((name, notes.items()) for name, notes in self.note_sections)
+        return sections
+
+
+def read_chart(f):
+    """
+    Read a .chart file into a Chart, one line at a time.
+
+    Note sections are loaded into NoteTracks, with each cymbal marker folded into a
+    CYMBAL flag on the pad right before it. A marker without its pad stays a plain
+    note. Events of note sections that aren't notes, e.g. star power, are skipped.
+
+    Args:
+        f: Readable text file handle
+
+    Returns:
+        Chart: The parsed chart
+
+    Raises:
+        ChartParseError: If the file breaks the grammar or a tick or note isn't a number
+    """
+    chart = Chart()
+    tracks = {}
+
+    # Every section reader advances the same line iterator
+    lines = enumerate(f, 1)
+    for line_no, line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if not (line.startswith("[") and line.endswith("]")):
+            raise ChartParseError(f"line {line_no}: expected a [section] header")
+
+        name = line[1:-1]
+        _open_section(lines, name)
+        if name in META_SECTIONS:
+            chart.song.update(_read_items(lines, name, timed=False))
+        elif name in EVENT_SECTIONS:
+            items = chart.sync_items if name == "SyncTrack" else chart.events
+            items.extend(_read_items(lines, name, timed=True))
+        else:
+            track = tracks.get(name)
+            if track is None:
+                track = tracks[name] = NoteTrack()
+                chart.note_sections.append((name, track))
+            _read_notes(lines, name, track)
+
+    return chart
+
+
+def _open_section(lines, name: str):
+    """
+    Consume the opening brace of a section.
+
+    Args:
+        lines: Iterator of (line number, line) pairs, just past the section header
+        name (str): Section name, for error messages
+
+    Raises:
+        ChartParseError: If the next line isn't "{"
+    """
+    for line_no, line in lines:
+        line = line.strip()
+        if line == "{":
+            return
+        if line:
+            raise ChartParseError(f"line {line_no}: expected '{{' after [{name}]")
+    raise ChartParseError(f"[{name}] has no body")
+
+
+def _read_items(lines, name: str, timed: bool):
+    """
+    Read the "key = value" lines of a section up to its closing brace.
+
+    Args:
+        lines: Iterator of (line number, line) pairs, inside the section
+        name (str): Section name, for error messages
+        timed (bool): Parse the keys as chart ticks
+
+    Returns:
+        list: (key, value) pairs in file order
+
+    Raises:
+        ChartParseError: If a line isn't "key = value", a tick isn't a number, or a
+            tempo isn't a positive number
+    """
+    items = []
+    for line_no, line in lines:
+        line = line.strip()
+        if line == "}":
+            return items
+        if not line:
+            continue
+
+        key, sep, value = line.partition(" = ")
+        if not sep:
+            raise ChartParseError(f"line {line_no}: expected 'key = value' in [{name}]")
+        if timed:
+            try:
+                key = int(key)
+            except ValueError as e:
+                raise ChartParseError(f"line {line_no}: bad tick {key!r}") from e
+        if name == "SyncTrack" and value.startswith("B "):
+            _bpm(value[2:], f"line {line_no}")
+        items.append((key, value))
+    raise ChartParseError(f"[{name}] is never closed")
+
+
+def _read_notes(lines, name: str, track: NoteTrack):
+    """
+    Read the notes of a section up to its closing brace into a NoteTrack.
+
+    Notes in tick order, which is how .chart files are written, are appended to the
+    track's columns directly, and the others inserted in tick order. Either way a
+    cymbal marker flags the pad on the line right before it.
+
+    Args:
+        lines: Iterator of (line number, line) pairs, inside the section
+        name (str): Section name, for error messages
+        track (NoteTrack): Track the notes are added to
+
+    Raises:
+        ChartParseError: If a line isn't "key = value", or a note isn't numeric
+    """
+    ticks, notes, lengths, flags = track.ticks, track.notes, track.lengths, track.flags
+    last_tick = ticks[-1] if ticks else 0
+    # Row, note and tick of the pad a cymbal marker can still flag, note -1 if none
+    pad_row, pad, pad_tick = -1, -1, last_tick
+
+    for line_no, line in lines:
+        fields = line.split()
+        if len(fields) != 5 or fields[2] != "N" or fields[1] != "=":
+            line = line.strip()
+            if line == "}":
+                return
+            if line and " = " not in line:
+                raise ChartParseError(
+                    f"line {line_no}: expected 'key = value' in [{name}]"
+                )
+            continue
+
+        # "tick = N note length"
+        try:
+            tick = int(fields[0])
+            note = _NOTE_VALUES.get(fields[3])
+            if note is None:
+                note = int(fields[3])
+            length = 0 if fields[4] == "0" else int(fields[4])
+
+            if (
+                note >= CYMBAL_MARKER
+                and note - CYMBAL_OFFSET == pad
+                and tick == pad_tick
+            ):
+                flags[pad_row] |= CYMBAL
+                track.cymbals += 1
+                pad = -1
+            elif tick < last_tick:
+                # Inserted where `NoteTrack.append` puts it
+                pad_row = bisect_right(ticks, tick)
+                track.append(tick, note, length)
+                pad, pad_tick = note, tick
+            else:
+                ticks.append(tick)
+                notes.append(note)
+                lengths.append(length)
+                flags.append(0)
+                last_tick = tick
+                pad_row, pad, pad_tick = len(ticks) - 1, note, tick
+        except (ValueError, OverflowError) as e:
+            raise ChartParseError(f"line {line_no}: bad note {line.strip()!r}") from e
+    raise ChartParseError(f"[{name}] is never closed")
+
+
+def load_chart(path: str):
+    """
+    Read a .chart file from disk.
+
+    Args:
+        path (str): Path of the .chart file. A UTF-8 byte order mark is skipped
+
+    Returns:
+        Chart: The parsed chart
+
+    Raises:
+        ChartParseError: If the file isn't a well-formed .chart file
+    """
+    with open(path, encoding="utf-8-sig") as f:
+        return read_chart(f)
@@ -0,0 +1,35 @@
+"""
+Module for serializing Clone Hero .chart files.
+Streams each section straight to a file handle instead of building the chart text in memory.
+"""
+
+
+def write_section(f, name: str, items):
+    """
+    Write one .chart section to an open text file handle.
+
+    Args:
+        f: Writable text file handle
+        name (str): Section name without brackets, e.g. "ExpertDrums"
+        items: Iterable of (key, value) pairs, written in order as "  key = value"
+    """
+    f.write(f"[{name}]\n{{\n")
+    f.writelines(f"  {key} = {value}\n" for key, value in items)
+    f.write("}")
+
+
+def write_chart(f, sections):
+    """
+    Stream a complete .chart file to an open text file handle in one pass.
+
+    Sections are separated by newlines and the file ends with the closing brace of
+    the last section, matching the layout Clone Hero and Moonscraper expect.
+
+    Args:
+        f: Writable text file handle
+        sections: Iterable of (name, items) pairs, see `write_section`
+    """
+    for i, (name, items) in enumerate(sections):
+        if i:
+            f.write("\n")
+        write_section(f, name, items)
@@ -3,42 +3,278 @@ Module for converting and processing MIDI files into Clone Hero chart files.
 Handles drum track extraction, .chart file generation, and audio conversion.
 """
 
+import functools
+import heapq
+import io
 import logging
 import os
-import sys
-from collections import defaultdict
+import shutil
+import tempfile
+import wave
+from contextlib import ExitStack, nullcontext
+from operator import itemgetter
 
 import mido
 from mido import MetaMessage, MidiFile, MidiTrack
 from rich import print
 
+from ace import drum_renderer, midi_scanner, parallel_render, vectorized
+from ace.cache import CACHE_VERSION, OutputCache, file_digest, midi_digest_of, tmp_path
+from ace.catalog import Catalog
+from ace.chart_reader import read_chart
+from ace.chart_writer import write_chart
+from ace.difficulty import DIFFICULTIES, reduce_drums
+from ace.instruments import INSTRUMENTS, PartRouter
+from ace.mapping import CHART_RESOLUTION, CYMBAL_MAPPING, DRUM_CHANNEL, DRUM_MAPPING
+from ace.metrics import StageMetrics
+from ace.midi_scanner import MidiScanError
+from ace.note_track import CYMBAL, NoteTrack
+from ace.package import PACKAGE_FORMATS, open_member, open_package, song_ini_values
+from ace.preview import DEFAULT_PREVIEW_LENGTH, cut_midi, densest_window, scan_timing
+from ace.quantize import grid_ticks, merge_hits, snap_tick
+from ace.tempo_map import TempoMap
+
 logger = logging.getLogger(__name__)
 
 
+def _is_drum_message(msg):
+    """
+    Check whether a message belongs in the drum track.
+
+    Keeps the same messages as the raw byte scanner, so both extraction paths build
+    the same drum track.
+
+    Args:
+        msg: mido message
+
+    Returns:
+        bool: True for drum channel messages and tempo and time signature events
+    """
+    if msg.is_meta:
+        return msg.type in ("set_tempo", "time_signature")
+    # Sysex messages have no channel
+    return getattr(msg, "channel", None) == DRUM_CHANNEL
+
+
+def _timed_messages(track, keep=None):
+    """
+    Yield the messages of a track with absolute times.
+
+    Args:
+        track: Iterable of mido messages with delta times
+        keep (callable, optional): Predicate selecting the messages to yield
+
+    Yields:
+        tuple: (abs_time, msg) for every kept message, in track order
+    """
+    current_time = 0
+    for msg in track:
+        current_time += msg.time
+        if keep is None or keep(msg):
+            yield current_time, msg
+
+
+class _TeeWriter(io.RawIOBase):
+    """
+    Writes the same bytes to several binary files, counting them.
+
+    Args:
+        files (list): Binary file handles to write to, left open on close
+    """
+
+    def __init__(self, files: list):
+        self.files = files
+        self.written = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        for f in self.files:
+            f.write(data)
+        self.written += len(data)
+        return len(data)
+
+
+RENDERERS = ("fluidsynth", "numpy")
+
+# Files of a song package besides song.ini, in the order they're written
+PACKAGE_FILES = ("notes.chart", "song.wav")
+
+SOUNDFONT_URL = "https://github.com/ryan-w-roche/auto-chart-engine/releases/download/v2.0.0/FluidR3_GM.sf2"
+
+
 class Charter:
     """
     Processes MIDI files to create Clone Hero compatible chart files.
 
     Extracts drum tracks from MIDI files, generates .chart format files,
     and converts MIDI to audio for use in Clone Hero.
+
+    Args:
+        use_numpy (bool, optional): Map drum events with the NumPy-backed path.
+            Defaults to using it whenever NumPy is installed
+        use_scanner (bool): Read input MIDI files with the raw byte scanner instead
+            of building a mido message for every event
+        cache (OutputCache, optional): Cache that `convert` reuses charts and audio
+            from, skipping unchanged songs
+        renderer (str): "fluidsynth" renders each song with the FluidSynth command line
+            for the highest fidelity, "numpy" mixes cached one-shot samples far faster
+        metrics (StageMetrics, optional): Records the time, memory, events and bytes
+            written of each stage, and profiles the chart stage if it has a profiler
+        difficulties: Lower drum difficulties to chart besides Expert, keys of
+            `ace.difficulty.DIFFICULTIES`. Defaults to Hard, Medium and Easy
+        instruments: Pitched parts to chart next to the drums in `convert`, keys of
+            `ace.instruments.INSTRUMENTS`. Defaults to none
+        catalog (Catalog, optional): Song catalog that `convert` records each
+            conversion in
+        package (str, optional): Make `convert` stream each song into one "zip" or
+            "sng" archive instead of writing a song folder of loose files
+        preview: Make `convert` render an audition clip as preview.wav and write its
+            bounds to the chart. "auto" picks the window of `preview_length`
+            seconds with the most drum notes, a (start, end) pair in seconds is
+            used as given. Defaults to no preview
+        preview_length (float): Seconds of the automatically picked preview
+        preview_only (bool): Only render the preview, not the full song.wav
+        quantize (int, optional): Snap the drum notes to this subdivision of a whole
+            note, e.g. 16 or 12 for sixteenths or eighth note triplets, rounding to
+            the nearest grid line instead of truncating to a chart tick. Duplicate
+            hits that land together are merged
+        flam_ticks (int, optional): Merge hits on one lane at most this many chart
+            ticks apart into their first hit, 0 merging only duplicates on the same
+            tick. Defaults to charting every hit, unless quantizing
+        render_jobs (int): FluidSynth processes that render a long song at the same
+            time, each taking one time segment of it. Needs NumPy to stitch the
+            segments. Defaults to 1, rendering each song in one piece
     """
 
-    def split_midi(self, in_file_dir: str, out_dir: str):
+    def __init__(
+        self,
+        use_numpy: bool = None,
+        use_scanner: bool = True,
+        cache: OutputCache = None,
+        renderer: str = "fluidsynth",
+        metrics: StageMetrics = None,
+        difficulties=tuple(DIFFICULTIES),
+        instruments=(),
+        catalog: Catalog = None,
+        package: str = None,
+        preview=None,
+        preview_length: float = DEFAULT_PREVIEW_LENGTH,
+        preview_only: bool = False,
+        quantize: int = None,
+        flam_ticks: int = None,
+        render_jobs: int = 1,
+    ):
+        if use_numpy is None:
+            use_numpy = vectorized.HAS_NUMPY
+        elif use_numpy and not vectorized.HAS_NUMPY:
+            raise ImportError("NumPy is required for use_numpy=True")
+        self.use_numpy = use_numpy
+        self.use_scanner = use_scanner
+        self.cache = cache
+
+        if renderer not in RENDERERS:
+            raise ValueError(
+                f"Unknown renderer {renderer!r}, expected one of {RENDERERS}"
+            )
+        if renderer == "numpy" and not vectorized.HAS_NUMPY:
+            raise ImportError('NumPy is required for renderer="numpy"')
+        self.renderer = renderer
+        self.metrics = metrics
+
+        for difficulty in difficulties:
+            if difficulty not in DIFFICULTIES:
+                raise ValueError(
+                    f"Unknown difficulty {difficulty!r}, expected one of {tuple(DIFFICULTIES)}"
+                )
+        self.difficulties = tuple(difficulties)
+
+        for instrument in instruments:
+            if instrument not in INSTRUMENTS:
+                raise ValueError(
+                    f"Unknown instrument {instrument!r}, expected one of {tuple(INSTRUMENTS)}"
+                )
+        self.instruments = tuple(instruments)
+        self.catalog = catalog
+
+        if package is not None and package not in PACKAGE_FORMATS:
+            raise ValueError(
+                f"Unknown package format {package!r}, expected one of {PACKAGE_FORMATS}"
+            )
+        self.package = package
+
+        if preview not in (None, "auto"):
+            start, end = preview
+            if not 0 <= start < end:
+                raise ValueError(f"Invalid preview window {preview!r}")
+            preview = (float(start), float(end))
+        if preview_only and preview is None:
+            raise ValueError("preview_only needs a preview")
+        self.preview = preview
+        self.preview_length = preview_length
+        self.preview_only = preview_only
+
+        self.quantize = quantize
+        self.grid = None if quantize is None else grid_ticks(quantize)
+        if flam_ticks is None and quantize is not None:
+            flam_ticks = 0
+        if flam_ticks is not None and flam_ticks < 0:
+            raise ValueError(f"flam_ticks must not be negative, got {flam_ticks!r}")
+        self.flam_ticks = flam_ticks
+
+        if render_jobs < 1:
+            raise ValueError(f"render_jobs must be at least 1, got {render_jobs!r}")
+        self.render_jobs = render_jobs
+
+    def _stage(self, name: str):
         """
-        Extract drum tracks from a MIDI file and save to a new MIDI file.
+        Measure a stage when metrics are being recorded.
 
-        Splits the input MIDI file by extracting only the drum channel (channel 9)
-        and saves it as a new file with "_DRUMS" appended to the filename.
+        Args:
+            name (str): Stage name, see `ace.metrics.STAGES`
+
+        Returns:
+            Context manager yielding the stage record, or a throwaway dict
+        """
+        if self.metrics is None:
+            return nullcontext({"events": 0, "bytes_written": 0})
+        return self.metrics.stage(name)
+
+    def _count_written(self, stage: dict, path: str):
+        """
+        Add the size of a written file to a stage record.
 
         Args:
-            in_file_dir (str): Path to the input MIDI file
-            out_dir (str): Directory where the split MIDI file will be saved
+            stage (dict): Record from `_stage`
+            path (str): The written file, skipped if it wasn't created
+        """
+        try:
+            stage["bytes_written"] += os.path.getsize(path)
+        except OSError:
+            pass
+
+    def _profile(self):
+        """
+        Profile a block when metrics are being recorded with a profiler.
 
         Returns:
-            str: The key (filename) of the created split MIDI file
+            Context manager
+        """
+        if self.metrics is None:
+            return nullcontext()
+        return self.metrics.profile()
+
+    def _check_paths(self, in_file_dir: str, out_dir: str):
+        """
+        Check that the input MIDI file and the output directory exist.
+
+        Args:
+            in_file_dir (str): Path to the input MIDI file
+            out_dir (str): Directory where output files will be saved
 
         Raises:
-            SystemExit: If the input file or output directory doesn't exist
+            FileNotFoundError: If the input file or output directory doesn't exist
         """
         # Check if the input file exists
         if not os.path.exists(in_file_dir):
@@ -46,7 +282,7 @@ class Charter:
             print(
                 f"[bold red]Error:[/bold red] Input file does not exist: [cyan]{in_file_dir}[/cyan]"
             )
-            sys.exit(1)
+            raise FileNotFoundError(f"Input file does not exist: {in_file_dir}")
 
         # Check if the output directory exists
         if not os.path.exists(out_dir):
@@ -54,54 +290,185 @@ class Charter:
             print(
                 f"[bold red]Error:[/bold red] Output directory does not exist: [cyan]{out_dir}[/cyan]"
             )
-            sys.exit(1)
+            raise FileNotFoundError(f"Output directory does not exist: {out_dir}")
+
+    def split_file_key(self, in_file_dir: str):
+        """
+        Build the filename of the split MIDI file for an input MIDI file.
+
+        Args:
+            in_file_dir (str): Path to the input MIDI file
 
+        Returns:
+            str: The input filename, lowercased with "_DRUMS" appended
+        """
         in_file_key = os.path.basename(in_file_dir)
         base, ext = os.path.splitext(in_file_key)
         formatted_base = base.lower().replace(" ", "_")
-        out_file_key = f"{formatted_base}_DRUMS{ext}"
-        output_file_dir = os.path.join(out_dir, out_file_key)
+        return f"{formatted_base}_DRUMS{ext}"
+
+    def song_folder(self, in_file_dir: str):
+        """
+        Build the Clone Hero song folder name for an input MIDI file.
+
+        Args:
+            in_file_dir (str): Path to the input MIDI file
+
+        Returns:
+            str: The folder name, formatted as "artist - <Song Name> (ACE)"
+        """
+        base = os.path.splitext(os.path.basename(in_file_dir))[0]
+        song_name = base.replace("_", " ").title()
+        return f"artist - {song_name} (ACE)"
+
+    def extract_drums(self, in_file_dir: str, parts: PartRouter = None):
+        """
+        Parse a MIDI file and extract its drum channel into an in-memory MIDI file.
+
+        Keeps the drum channel (channel 9) notes along with tempo and time signature
+        events, merged into a single delta-timed track. The file is read with the raw
+        byte scanner, falling back to mido for anything the scanner can't read.
+
+        Args:
+            in_file_dir (str): Path to the input MIDI file
+            parts (PartRouter, optional): Receives the events of the other channels
+                in the same pass, to chart their instruments
+
+        Returns:
+            MidiFile: A single-track MIDI file containing only the drum events. When
+                the scanner reads it with `use_numpy`, the file also carries
+                `drum_arrays`, the note and tempo arrays of its track from
+                `vectorized.decode_events`, so charting doesn't decode its messages
+        """
+        if self.use_scanner:
+            try:
+                return self._extract_drums_scanned(in_file_dir, parts)
+            except (MidiScanError, OSError) as e:
+                logger.warning(f"Falling back to mido for {in_file_dir}: {e}")
+                if parts is not None:
+                    parts.clear()
+
+        return self._extract_drums_mido(in_file_dir, parts)
 
+    def _extract_drums_scanned(self, in_file_dir: str, parts: PartRouter = None):
+        """
+        Extract the drum channel with the raw byte scanner.
+
+        Only the kept events are turned into mido messages. An end_of_track event is
+        placed at the end of the longest input track so the song length is preserved.
+
+        Args:
+            in_file_dir (str): Path to the input MIDI file
+            parts (PartRouter, optional): Receives the events of the other channels
+
+        Returns:
+            MidiFile: A single-track MIDI file containing only the drum events
+
+        Raises:
+            MidiScanError: If the file is not a well-formed MIDI file
+        """
+        with self._stage("parse") as stage:
+            ticks_per_beat, tracks, end_tick = midi_scanner.scan_file(
+                in_file_dir, DRUM_CHANNEL if parts is None else None
+            )
+            stage["events"] += sum(map(len, tracks))
+
+        with self._stage("split") as stage:
+            out_mid = MidiFile(ticks_per_beat=ticks_per_beat)
+
+            # Create drum track
+            drum_track = MidiTrack()
+            out_mid.tracks.append(drum_track)
+
+            # Merge the time-ordered tracks and convert to delta times
+            last_time = 0
+            drum_events = []
+
+            for event in heapq.merge(*tracks, key=itemgetter(0)):
+                abs_time, status, a, b = event
+                # Other channels are only scanned for the instrument parts
+                if status < 0xF0 and status & 0x0F != DRUM_CHANNEL:
+                    parts.route(abs_time, status, a, b)
+                    continue
+                drum_events.append(event)
+                drum_track.append(
+                    midi_scanner.to_message(status, a, b, time=abs_time - last_time)
+                )
+                last_time = abs_time
+
+            drum_track.append(MetaMessage("end_of_track", time=end_tick - last_time))
+            if self.use_numpy:
+                # Hand the scanned events to the chart as arrays, not mido messages
+                out_mid.drum_arrays = vectorized.decode_events(drum_events)
+            stage["events"] += len(drum_track)
+
+        return out_mid
+
+    def _extract_drums_mido(self, in_file_dir: str, parts: PartRouter = None):
+        """
+        Extract the drum channel by parsing every message with mido.
+
+        Keeps the same events as `_extract_drums_scanned`, ending at the end of the
+        longest input track.
+
+        Args:
+            in_file_dir (str): Path to the input MIDI file
+            parts (PartRouter, optional): Receives the events of the other channels
+
+        Returns:
+            MidiFile: A single-track MIDI file containing only the drum events
+        """
         # Initialize MIDI files
-        in_mid = MidiFile(in_file_dir)
-        out_mid = MidiFile(ticks_per_beat=in_mid.ticks_per_beat)
-
-        # Create drum track
-        drum_track = MidiTrack()
-        out_mid.tracks.append(drum_track)
-
-        # Collect messages with absolute times
-        all_messages = []
-        current_time = 0
-
-        # Process each track
-        for track in in_mid.tracks:
-            current_time = 0
-            for msg in track:
-                current_time += msg.time
-                # Check if the note is in the drum channel and append it to the new midi if it is
-                if (
-                    (
-                        isinstance(msg, MetaMessage)
-                        and msg.type in ("set_tempo", "time_signature")
-                    )
-                    or (msg.type in ("note_on", "note_off") and msg.channel == 9)
-                    or (msg.type not in ("note_on", "note_off"))
-                ):
-                    all_messages.append((current_time, msg))
+        with self._stage("parse") as stage:
+            in_mid = MidiFile(in_file_dir)
+            stage["events"] += sum(map(len, in_mid.tracks))
+
+        with self._stage("split") as stage:
+            out_mid = MidiFile(ticks_per_beat=in_mid.ticks_per_beat)
+            # Measured before the merge retimes the messages
+            end_tick = max(
+                (sum(msg.time for msg in track) for track in in_mid.tracks), default=0
+            )
+
+            # Create drum track
+            drum_track = MidiTrack()
+            out_mid.tracks.append(drum_track)
+
+            # Each track is already time-ordered, so a k-way merge keeps memory bounded
+            # by the track count. Ties keep track order, the same as a stable sort would
+            keep = _is_drum_message if parts is None else None
+            merged = heapq.merge(
+                *(_timed_messages(track, keep) for track in in_mid.tracks),
+                key=itemgetter(0),
+            )
+            last_time = 0
+
+            for abs_time, msg in merged:
+                if parts is not None:
+                    parts.route_message(abs_time, msg)
+                    if not _is_drum_message(msg):
+                        continue
+                # The input file is discarded, so retime its messages instead of copying
+                msg.time = abs_time - last_time
+                drum_track.append(msg)
+                last_time = abs_time
 
-        # Sort and convert to delta times
-        all_messages.sort(key=lambda x: x[0])
-        last_time = 0
+            drum_track.append(MetaMessage("end_of_track", time=end_tick - last_time))
+            stage["events"] += len(drum_track)
 
-        for abs_time, msg in all_messages:
-            delta = abs_time - last_time
-            new_msg = msg.copy(time=delta)
-            drum_track.append(new_msg)
-            last_time = abs_time
+        return out_mid
 
-        # Write chart file to local directory
-        out_mid.save(output_file_dir)
+    def _save_midi(self, midi: MidiFile, output_file_dir: str):
+        """
+        Write an in-memory MIDI file to disk and report the result.
+
+        Args:
+            midi (MidiFile): The MIDI file to save
+            output_file_dir (str): Path of the MIDI file to create
+        """
+        with self._stage("split") as stage:
+            midi.save(output_file_dir)
+            self._count_written(stage, output_file_dir)
 
         if os.path.exists(output_file_dir):
             logger.info(f"Successfully created MIDI file at: {output_file_dir}")
@@ -112,28 +479,708 @@ class Charter:
             logger.error("Error: Failed to create MIDI file")
             print("[bold red]Error: Failed to create MIDI file[/bold red]")
 
+    def split_midi(self, in_file_dir: str, out_dir: str):
+        """
+        Extract drum tracks from a MIDI file and save to a new MIDI file.
+
+        Splits the input MIDI file by extracting only the drum channel (channel 9)
+        and saves it as a new file with "_DRUMS" appended to the filename.
+
+        Args:
+            in_file_dir (str): Path to the input MIDI file
+            out_dir (str): Directory where the split MIDI file will be saved
+
+        Returns:
+            str: The key (filename) of the created split MIDI file
+
+        Raises:
+            FileNotFoundError: If the input file or output directory doesn't exist
+        """
+        self._check_paths(in_file_dir, out_dir)
+
+        out_file_key = self.split_file_key(in_file_dir)
+        output_file_dir = os.path.join(out_dir, out_file_key)
+
+        # Extract the drums and write the split MIDI file to local directory
+        out_mid = self.extract_drums(in_file_dir)
+        self._save_midi(out_mid, output_file_dir)
+
         return out_file_key
 
-    def generate_chart_file(self, in_file_key: str, out_dir: str, ch_out_dir: str):
+    def convert(
+        self,
+        in_file_dir: str,
+        out_dir: str,
+        ch_out_dir: str,
+        save_split_midi: bool = False,
+    ):
         """
-        Generate a Clone Hero compatible .chart file from a MIDI file.
+        Convert a MIDI file into a Clone Hero song folder with a single parse.
 
-        Creates a .chart file from the input MIDI file with drum mappings for Clone Hero.
-        Saves the chart file both in the output directory and in a Clone Hero specific
-        directory structure with 'notes.chart' filename.
+        The input MIDI file is parsed once and the extracted drum track is passed
+        in memory to chart generation and audio rendering, instead of being written
+        to "<name>_DRUMS.mid" and read back by each stage. With a cache, outputs of
+        an earlier conversion of the same song and settings are reused, and the MIDI
+        file isn't parsed at all when both the chart and the audio are cached. The
+        audio is also reused after edits that leave the extracted drum track as it
+        was, e.g. to the other instruments. With a catalog, the conversion is
+        recorded once its outputs are in place. With a package format, the song
+        folder is written as "<ch_out_dir>.zip" or "<ch_out_dir>.sng" instead.
 
         Args:
-            in_file_key (str): Filename of the split MIDI file located in out_dir
-            out_dir (str): Directory where the chart file will be saved
-            ch_out_dir (str): Clone Hero specific directory name for the chart
+            in_file_dir (str): Path to the input MIDI file
+            out_dir (str): Directory where all output files will be saved
+            ch_out_dir (str): Clone Hero specific directory name for the song
+            save_split_midi (bool): Also write the split "_DRUMS" MIDI file to out_dir
 
         Returns:
-            None
+            str: The key (filename) of the split MIDI file, whether or not it was saved
+
+        Raises:
+            FileNotFoundError: If the input file or output directory doesn't exist
+        """
+        self._check_paths(in_file_dir, out_dir)
+
+        split_midi_key = self.split_file_key(in_file_dir)
+
+        midi_digest = None
+        if self.cache is not None or self.catalog is not None:
+            midi_digest = file_digest(in_file_dir)
+
+        if self.package is not None:
+            self._convert_package(
+                in_file_dir, out_dir, ch_out_dir, save_split_midi, midi_digest
+            )
+            return split_midi_key
+
+        os.makedirs(os.path.join(out_dir, ch_out_dir), exist_ok=True)
+        wav_out_fp = os.path.join(out_dir, ch_out_dir, "song.wav")
+        preview_fp = os.path.join(out_dir, ch_out_dir, "preview.wav")
+        outputs = {
+            "chart": self._chart_out_fp(split_midi_key, out_dir),
+            "notes_chart": os.path.join(out_dir, ch_out_dir, "notes.chart"),
+            "wav": preview_fp if self.preview_only else wav_out_fp,
+        }
+
+        # Reuse the outputs of an earlier conversion of the same song and settings.
+        # Outputs that aren't wanted count as cached
+        chart_key = wav_key = preview_key = None
+        chart_cached = False
+        wav_cached = self.preview_only
+        preview_cached = self.preview is None
+        if self.cache is not None:
+            chart_key, wav_key, wav_parts = self._cache_keys(
+                midi_digest, split_midi_key
+            )
+            chart_cached = self._fetch_cached(
+                chart_key, [outputs["chart"], outputs["notes_chart"]]
+            )
+            if not wav_cached:
+                wav_cached = self._fetch_cached(wav_key, [wav_out_fp], link=True)
+            if not preview_cached:
+                preview_key = self._preview_key(midi_digest, wav_parts)
+                preview_cached = self._fetch_cached(
+                    preview_key, [preview_fp], link=True
+                )
+            if chart_cached and wav_cached and preview_cached and not save_split_midi:
+                self._record_conversion(in_file_dir, midi_digest, outputs)
+                return split_midi_key
+
+        # The instrument parts are routed while the drums are extracted
+        parts = PartRouter(self.instruments) if self.instruments else None
+        midi = self.extract_drums(in_file_dir, parts)
+        preview_window = self._preview_window(midi)
+
+        # Rendering can reuse the split MIDI file when it is written anyway
+        wav_midi = midi
+        if save_split_midi:
+            self._save_midi(midi, os.path.join(out_dir, split_midi_key))
+            wav_midi = None
+
+        if not chart_cached:
+            self.generate_chart_file(
+                in_file_key=split_midi_key,
+                out_dir=out_dir,
+                ch_out_dir=ch_out_dir,
+                midi=midi,
+                parts=parts,
+                preview_window=preview_window,
+            )
+            if chart_key is not None:
+                self.cache.store(chart_key, outputs["notes_chart"])
+
+        drum_key = None
+        if not wav_cached and wav_key is not None:
+            # The audio only depends on the drum track, so look it up by its contents
+            drum_key = self.cache.make_key(midi_digest_of(midi), "wav", *wav_parts)
+            if self._fetch_cached(drum_key, [wav_out_fp], link=True):
+                self.cache.store(wav_key, wav_out_fp, link=True)
+                wav_cached = True
+
+        if not wav_cached:
+            self.generate_wav_file(
+                in_file_key=split_midi_key,
+                out_dir=out_dir,
+                ch_out_dir=ch_out_dir,
+                midi=wav_midi,
+            )
+            if wav_key is not None:
+                # song.wav is never edited in place, so share it with the cache
+                self.cache.store(wav_key, wav_out_fp, link=True)
+                self.cache.store(drum_key, wav_out_fp, link=True)
+
+        if not preview_cached and preview_window is not None:
+            self.generate_preview_file(
+                in_file_key=split_midi_key,
+                out_dir=out_dir,
+                ch_out_dir=ch_out_dir,
+                midi=midi,
+                preview_window=preview_window,
+            )
+            if preview_key is not None:
+                self.cache.store(preview_key, preview_fp, link=True)
+
+        self._record_conversion(in_file_dir, midi_digest, outputs)
+        return split_midi_key
+
+    def _convert_package(
+        self,
+        in_file_dir: str,
+        out_dir: str,
+        ch_out_dir: str,
+        save_split_midi: bool,
+        midi_digest: str = None,
+    ):
+        """
+        Convert a MIDI file straight into a song package.
+
+        The chart and the audio are streamed into the archive as they're generated,
+        and into the cache on a miss, so no loose chart or song.wav is written. Only
+        the split MIDI file is, when asked for. Cached outputs are copied in.
+
+        Args:
+            in_file_dir (str): Path to the input MIDI file
+            out_dir (str): Directory where the package will be saved
+            ch_out_dir (str): Clone Hero specific directory name, which names the package
+            save_split_midi (bool): Also write the split "_DRUMS" MIDI file to out_dir
+            midi_digest (str, optional): Hex SHA-256 digest of the input MIDI file,
+                required with a cache or a catalog
         """
-        chart_out_fp = os.path.join(
-            out_dir, f"{os.path.splitext(in_file_key)[0]}.chart"
+        split_midi_key = self.split_file_key(in_file_dir)
+        package_fp = os.path.join(out_dir, f"{ch_out_dir}.{self.package}")
+        files = ["notes.chart"]
+        if not self.preview_only:
+            files.append("song.wav")
+        if self.preview is not None:
+            files.append("preview.wav")
+
+        with ExitStack() as stack:
+            # Cache key and open cache entry of each file
+            keys = {}
+            cached = {}
+            if self.cache is not None:
+                chart_key, wav_key, wav_parts = self._cache_keys(
+                    midi_digest, split_midi_key
+                )
+                keys = {"notes.chart": chart_key, "song.wav": wav_key}
+                if self.preview is not None:
+                    keys["preview.wav"] = self._preview_key(midi_digest, wav_parts)
+                for name in files:
+                    entry = self.cache.open(keys[name])
+                    if entry is not None:
+                        cached[name] = stack.enter_context(entry)
+
+            midi = parts = None
+            if len(cached) < len(files) or save_split_midi:
+                parts = PartRouter(self.instruments) if self.instruments else None
+                midi = self.extract_drums(in_file_dir, parts)
+                if save_split_midi:
+                    self._save_midi(midi, os.path.join(out_dir, split_midi_key))
+
+            drum_key = None
+            wav_missing = "song.wav" in files and "song.wav" not in cached
+            if self.cache is not None and wav_missing:
+                # The audio only depends on the drum track, so look it up by its contents
+                drum_key = self.cache.make_key(midi_digest_of(midi), "wav", *wav_parts)
+                entry = self.cache.open(drum_key)
+                if entry is not None:
+                    cached["song.wav"] = stack.enter_context(entry)
+                    self.cache.alias(wav_key, drum_key)
+                    drum_key = None
+
+            if midi is None:
+                # Everything is cached, including the chart with the preview bounds
+                preview_window = None
+                song_metadata = self._cached_song_metadata(cached["notes.chart"])
+            else:
+                preview_window = self._preview_window(midi)
+                song_metadata = self._song_metadata(split_midi_key, preview_window)
+                if preview_window is None and "preview.wav" not in cached:
+                    files = [name for name in files if name != "preview.wav"]
+
+            with open_package(
+                package_fp, self.package, song_ini_values(song_metadata), files
+            ) as package:
+                for name in files:
+                    with package.open(name) as member:
+                        if name in cached:
+                            shutil.copyfileobj(cached[name], member, 1 << 20)
+                        elif name == "notes.chart":
+                            self._package_chart(
+                                member, keys.get(name), midi, parts, song_metadata
+                            )
+                        elif name == "song.wav":
+                            self._package_audio(
+                                member, keys.get(name), split_midi_key, midi
+                            )
+                        else:
+                            self._package_audio(
+                                member,
+                                keys.get(name),
+                                split_midi_key,
+                                cut_midi(
+                                    midi,
+                                    *preview_window,
+                                    self._song_timing(midi)[0],
+                                ),
+                                preview_window[1] - preview_window[0],
+                            )
+
+        if drum_key is not None:
+            self.cache.alias(drum_key, wav_key)
+
+        logger.info(f"Successfully created song package at: {package_fp}")
+        print(
+            f"[bold green]✔ Successfully created song package at:[/bold green] [cyan]{package_fp}[/cyan]"
         )
-        out_file_key = os.path.basename(chart_out_fp)
+
+        self._record_conversion(
+            in_file_dir,
+            midi_digest,
+            dict.fromkeys(("chart", "notes_chart", "wav"), package_fp),
+        )
+
+    def _cached_song_metadata(self, chart_f):
+        """
+        Read the [Song] section of a cached chart, then rewind it.
+
+        Args:
+            chart_f: Binary file handle of the chart
+
+        Returns:
+            dict: [Song] values as raw text
+        """
+        text = io.TextIOWrapper(chart_f, encoding="utf-8-sig")
+        song = read_chart(text).song
+        text.detach()
+        chart_f.seek(0)
+        return song
+
+    def _package_chart(
+        self,
+        member,
+        chart_key: str,
+        midi: MidiFile,
+        parts: PartRouter,
+        song_metadata: dict,
+    ):
+        """
+        Generate the chart into a song package member, and into the cache if there is one.
+
+        Args:
+            member: Binary file handle of the "notes.chart" member
+            chart_key (str): Cache key of the chart, or None without a cache
+            midi (MidiFile): In-memory split MIDI from `extract_drums`
+            parts (PartRouter): Instrument notes routed by `extract_drums`, or None
+            song_metadata (dict): [Song] section values, from `_song_metadata`
+        """
+        with ExitStack() as stack:
+            out = _TeeWriter([member])
+            if chart_key is not None:
+                out.files.append(stack.enter_context(self.cache.writer(chart_key)))
+            with io.TextIOWrapper(
+                io.BufferedWriter(out), encoding="utf-8", newline="\n"
+            ) as f:
+                self._write_chart(
+                    f,
+                    midi.tracks[0],
+                    midi.ticks_per_beat,
+                    parts,
+                    song_metadata,
+                    vars(midi).get("drum_arrays"),
+                )
+
+        with self._stage("chart_write") as stage:
+            stage["bytes_written"] += out.written
+
+    def _package_audio(
+        self,
+        member,
+        key: str,
+        in_file_key: str,
+        midi: MidiFile,
+        length: float = None,
+    ):
+        """
+        Render audio into a song package member, and into the cache if there is one.
+
+        Args:
+            member: Binary file handle of the "song.wav" or "preview.wav" member
+            key (str): Cache key of the audio, or None without a cache
+            in_file_key (str): Filename of the split MIDI file
+            midi (MidiFile): Drum MIDI to render
+            length (float, optional): Seconds of audio to keep, see `_render`
+        """
+        sound_font = self._fetch_soundfont()
+        with ExitStack() as stack:
+            out = _TeeWriter([member])
+            if key is not None:
+                out.files.append(stack.enter_context(self.cache.writer(key)))
+
+            with self._stage("render") as stage:
+                stage["events"] += self._render(
+                    midi, out, in_file_key, sound_font, length
+                )
+                stage["bytes_written"] += out.written
+
+    def _render(
+        self,
+        midi: MidiFile,
+        wav_out,
+        in_file_key: str,
+        sound_font: str,
+        length: float = None,
+    ):
+        """
+        Render an in-memory drum MIDI file to WAV audio.
+
+        The "numpy" renderer writes the WAV data straight to wav_out. FluidSynth can
+        only write to a file path, so for a file handle its output goes through a
+        temporary file. With `render_jobs` above 1, FluidSynth renders a long song
+        in parallel time segments, see `ace.parallel_render`. The soundfont is
+        fetched by the caller, so its download isn't timed as part of the render.
+
+        Args:
+            midi (MidiFile): Drum MIDI to render
+            wav_out: Path of the WAV file to create, or a raw binary writer such as
+                `_TeeWriter`, which is closed once the audio is written
+            in_file_key (str): Filename of the split MIDI file, which names the copy
+                FluidSynth reads
+            sound_font (str): Path of the soundfont, from `_fetch_soundfont`
+            length (float, optional): Seconds of audio to keep, cutting off the ring
+                of the last notes or padding with silence. Defaults to all of it
+
+        Returns:
+            int: Number of events rendered
+        """
+        if self.renderer == "numpy":
+            samples = self._drum_samples(sound_font)
+            if isinstance(wav_out, str):
+                return drum_renderer.render_wav(midi, wav_out, samples, length)
+            with io.BufferedWriter(wav_out, 1 << 20) as f:
+                return drum_renderer.render_wav(midi, f, samples, length)
+
+        boundaries = []
+        if self.render_jobs > 1 and vectorized.HAS_NUMPY:
+            timing = self._song_timing(midi)
+            boundaries = parallel_render.plan_segments(
+                midi, self.render_jobs, timing=timing
+            )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            wav_fp = wav_out
+            if not isinstance(wav_out, str) or length is not None:
+                wav_fp = os.path.join(tmp_dir, "song.wav")
+
+            if len(boundaries) > 2:
+                audio = parallel_render.render_segments(
+                    midi,
+                    boundaries,
+                    functools.partial(self._run_fluidsynth, sound_font),
+                    tmp_dir,
+                    self.render_jobs,
+                    timing[0],
+                )
+                drum_renderer.write_wav(wav_fp, audio)
+            else:
+                midi_fp = os.path.join(tmp_dir, in_file_key)
+                midi.save(midi_fp)
+                self._run_fluidsynth(sound_font, midi_fp, wav_fp)
+
+            if length is not None:
+                # FluidSynth renders on past the window until the last notes ring out
+                if isinstance(wav_out, str):
+                    drum_renderer.copy_wav(wav_fp, wav_out, length)
+                else:
+                    with io.BufferedWriter(wav_out, 1 << 20) as f:
+                        drum_renderer.copy_wav(wav_fp, f, length)
+            elif wav_fp is not wav_out:
+                with open(wav_fp, "rb") as wav:
+                    shutil.copyfileobj(wav, wav_out, 1 << 20)
+        return len(midi.tracks[0])
+
+    def _song_timing(self, midi: MidiFile):
+        """
+        Scan a drum MIDI file for its tempo map and drum onsets, once per file.
+
+        The preview and the render segments of a song share the result, which is
+        kept on the file as `timing`.
+
+        Args:
+            midi (MidiFile): Drum MIDI from `extract_drums`
+
+        Returns:
+            tuple: (tempo_map, onset_ticks, end_tick), see `preview.scan_timing`
+        """
+        timing = vars(midi).get("timing")
+        if timing is None:
+            timing = midi.timing = scan_timing(midi)
+        return timing
+
+    def _preview_window(self, midi: MidiFile):
+        """
+        Pick the preview window of a song.
+
+        Args:
+            midi (MidiFile): Drum MIDI from `extract_drums`
+
+        Returns:
+            tuple | None: (start, end) in seconds, or None without a preview
+        """
+        if self.preview == "auto":
+            window = densest_window(midi, self.preview_length, self._song_timing(midi))
+            if window is None:
+                logger.info("No drum notes to preview, skipping preview.wav")
+            return window
+        return self.preview
+
+    def _preview_key(self, midi_digest: str, wav_parts: list):
+        """
+        Build the cache key of the preview audio of an input MIDI file.
+
+        Args:
+            midi_digest (str): Hex SHA-256 digest of the input MIDI file
+            wav_parts (list): Key parts of the full song audio, from `_cache_keys`
+
+        Returns:
+            str: The cache key
+        """
+        return self.cache.make_key(
+            midi_digest, "preview", *wav_parts, self._preview_parts()
+        )
+
+    def _preview_parts(self):
+        """
+        Describe the preview settings for cache keys and the catalog.
+
+        Returns:
+            dict: JSON-serializable preview settings
+        """
+        window = self.preview
+        if window != "auto":
+            window = list(window)
+        return {"window": window, "length": self.preview_length}
+
+    def _cache_keys(self, midi_digest: str, in_file_key: str):
+        """
+        Build the cache keys of the chart and the audio of an input MIDI file.
+
+        Args:
+            midi_digest (str): Hex SHA-256 digest of the input MIDI file
+            in_file_key (str): Filename of the split MIDI file
+
+        Returns:
+            tuple: (chart_key, wav_key, wav_parts), where wav_parts are the key
+                parts besides the input that the audio depends on
+        """
+        chart_key = self.cache.make_key(
+            midi_digest, "chart", *self._chart_cache_parts(in_file_key)
+        )
+        wav_parts = [
+            self.renderer,
+            self._soundfont_id(self._fetch_soundfont()),
+            sorted(DRUM_MAPPING),
+        ]
+        if self.renderer == "fluidsynth" and self.render_jobs > 1:
+            # Stitched segments differ slightly from a song rendered in one piece
+            wav_parts.append({"render_jobs": self.render_jobs})
+        wav_key = self.cache.make_key(midi_digest, "wav", *wav_parts)
+        return chart_key, wav_key, wav_parts
+
+    def settings(self):
+        """
+        Describe the settings that shape the outputs of a conversion.
+
+        Returns:
+            dict: JSON-serializable settings, as recorded in the song catalog
+        """
+        settings = {
+            "output_version": CACHE_VERSION,
+            "resolution": CHART_RESOLUTION,
+            "renderer": self.renderer,
+            "difficulties": list(self.difficulties),
+            "instruments": list(self.instruments),
+        }
+        if self.package is not None:
+            settings["package"] = self.package
+        if self.preview is not None:
+            settings["preview"] = self._preview_parts()
+            settings["preview_only"] = self.preview_only
+        if self.flam_ticks is not None:
+            settings["cleanup"] = self._cleanup_parts()
+        return settings
+
+    def _open_output(self, path: str, name: str):
+        """
+        Open a written output for reading.
+
+        Args:
+            path (str): Path of the output, or of the song package holding it
+            name (str): Filename inside the song folder
+
+        Returns:
+            Context manager yielding a binary file handle
+        """
+        if self.package is None:
+            return open(path, "rb")
+        return open_member(path, name)
+
+    def _record_conversion(self, in_file_dir: str, midi_digest: str, outputs: dict):
+        """
+        Record a finished conversion in the catalog, if there is one.
+
+        The note counts are read back from the written chart, so songs served from
+        the output cache are recorded the same way as generated ones.
+
+        Args:
+            in_file_dir (str): Path to the input MIDI file
+            midi_digest (str): Hex SHA-256 digest of the input MIDI file
+            outputs (dict): Paths of the "chart", "notes_chart" and "wav" outputs,
+                all the song package when there is one
+        """
+        if self.catalog is None:
+            return
+
+        with self._open_output(outputs["notes_chart"], "notes.chart") as f:
+            chart = read_chart(io.TextIOWrapper(f, encoding="utf-8-sig"))
+        note_counts = {name: notes.num_events() for name, notes in chart.note_sections}
+
+        duration = None
+        if not self.preview_only:
+            try:
+                with self._open_output(outputs["wav"], "song.wav") as f:
+                    with wave.open(f, "rb") as wav:
+                        duration = wav.getnframes() / wav.getframerate()
+            except (OSError, EOFError, wave.Error):
+                pass
+        if duration is None:
+            # No readable song audio, so measure up to the last charted note instead
+            last_tick = max(
+                (notes.ticks[-1] for _, notes in chart.note_sections if notes),
+                default=0,
+            )
+            duration = chart.tempo_map().tick_to_seconds(last_tick)
+
+        self.catalog.record(
+            in_file_dir, midi_digest, self.settings(), outputs, note_counts, duration
+        )
+
+    def _chart_out_fp(self, in_file_key: str, out_dir: str):
+        """
+        Build the path of the .chart file generated from a split MIDI file.
+
+        Args:
+            in_file_key (str): Filename of the split MIDI file
+            out_dir (str): Directory where the chart file will be saved
+
+        Returns:
+            str: Path of the "<name>_DRUMS.chart" file
+        """
+        return os.path.join(out_dir, f"{os.path.splitext(in_file_key)[0]}.chart")
+
+    def _chart_cache_parts(self, in_file_key: str):
+        """
+        List everything besides the input MIDI that the generated chart depends on.
+
+        Args:
+            in_file_key (str): Filename of the split MIDI file, which names the song
+
+        Returns:
+            list: JSON-serializable cache key parts
+        """
+        parts = [
+            in_file_key,
+            CHART_RESOLUTION,
+            DRUM_MAPPING,
+            CYMBAL_MAPPING,
+            {difficulty: DIFFICULTIES[difficulty] for difficulty in self.difficulties},
+            {instrument: INSTRUMENTS[instrument] for instrument in self.instruments},
+        ]
+        # The preview bounds are written to the chart
+        if self.preview is not None:
+            parts.append(self._preview_parts())
+        if self.preview_only:
+            parts.append("preview_only")
+        if self.flam_ticks is not None:
+            parts.append(self._cleanup_parts())
+        return parts
+
+    def _cleanup_parts(self):
+        """
+        Describe the quantization and hit merging for cache keys and the catalog.
+
+        Returns:
+            dict: JSON-serializable cleanup settings
+        """
+        return {"quantize": self.quantize, "flam_ticks": self.flam_ticks}
+
+    def _soundfont_id(self, sound_font: str):
+        """
+        Identify a soundfont file without hashing its contents.
+
+        Args:
+            sound_font (str): Path of the soundfont
+
+        Returns:
+            list: Filename, size and modification time of the soundfont
+        """
+        stat = os.stat(sound_font)
+        return [os.path.basename(sound_font), stat.st_size, stat.st_mtime_ns]
+
+    def _fetch_cached(self, key: str, out_fps: list, link: bool = False):
+        """
+        Place a cached output at its output paths and report the hit.
+
+        Args:
+            key (str): Cache key of the output
+            out_fps (list): Paths to write the cached file to
+            link (bool): Hard link the cached file instead of copying it
+
+        Returns:
+            bool: True if the output was cached
+        """
+        if not self.cache.fetch(key, out_fps, link=link):
+            return False
+
+        for out_fp in out_fps:
+            logger.info(f"Reused cached file at: {out_fp}")
+            print(
+                f"[bold green]✔ Reused cached file at:[/bold green] [cyan]{out_fp}[/cyan]"
+            )
+        return True
+
+    def _song_metadata(self, in_file_key: str, preview_window: tuple = None):
+        """
+        Build the [Song] section of the chart generated from a split MIDI file.
+
+        Args:
+            in_file_key (str): Filename of the split MIDI file, which names the song
+            preview_window (tuple, optional): (start, end) of the preview in seconds
+
+        Returns:
+            dict: [Song] values, strings quoted as they're written to the chart
+        """
+        out_file_key = os.path.basename(self._chart_out_fp(in_file_key, ""))
 
         # Extract the song name from the file key
         song_name = (
@@ -142,35 +1189,9 @@ class Charter:
             else out_file_key
         )
         song_name = song_name.replace("_", " ").title()
+        preview_start, preview_end = preview_window or (0, 0)
 
-        # Constants
-        DRUM_MAPPING = {
-            35: (0, "K"),  # Acoustic Bass Drum
-            36: (0, "K"),  # Bass Drum (Kick)
-            37: (1, "R"),  # Side Stick
-            38: (1, "R"),  # Acoustic Snare
-            39: (1, "R"),  # Hand Clap
-            40: (1, "R"),  # Electric Snare
-            41: (4, "G"),  # Low Floor Tom
-            42: (2, "Y"),  # Closed Hi-Hat
-            43: (4, "G"),  # High Floor Tom
-            44: (2, "Y"),  # Pedal Hi-Hat
-            45: (4, "G"),  # Low Tom
-            46: (3, "B"),  # Open Hi-Hat
-            47: (3, "B"),  # Mid Tom
-            48: (2, "Y"),  # High Mid Tom
-            49: (4, "G"),  # Crash Cymbal 1
-            50: (2, "Y"),  # High Tom
-            51: (3, "B"),  # Ride Cymbal
-            52: (4, "G"),  # Chinese Cymbal
-            53: (3, "B"),  # Ride Bell
-            55: (2, "Y"),  # Splash Cymbal
-            57: (4, "G"),  # Crash Cymbal 2
-            59: (3, "B"),  # Ride Cymbal 2
-        }
-        CHART_RESOLUTION = 192
-
-        song_metadata = {
+        metadata = {
             "Name": f'"{song_name}"',
             "Artist": '"Unknown"',
             "Charter": '"ACE"',
@@ -180,88 +1201,76 @@ class Charter:
             "Resolution": CHART_RESOLUTION,
             "Player2": '"bass"',
             "Difficulty": 0,
-            "PreviewStart": 0,
-            "PreviewEnd": 0,
+            "PreviewStart": preview_start,
+            "PreviewEnd": preview_end,
             "Genre": '"Rock"',
             "MediaType": '"cd"',
             "MusicStream": '"song.wav"',
         }
+        if self.preview_only:
+            # No song.wav is written for the chart to point at
+            del metadata["MusicStream"]
+        return metadata
 
-        chart_data = {
-            "Song": song_metadata,
-            "SyncTrack": defaultdict(list),
-            "Events": {},
-            "ExpertDrums": defaultdict(list),
-        }
-
-        # Read split MIDI file from local directory
-        in_file_fp = os.path.join(out_dir, in_file_key)
-        midi = MidiFile(in_file_fp)
-
-        # Merge tracks to get length
-        merged_track = mido.merge_tracks(midi.tracks)
-
-        # Initialize chart file
-        chart_data["SyncTrack"][0].append("TS 4")
-
-        current_tick = 0
-        for msg in merged_track:
-            current_tick += msg.time
-            chart_tick = int(current_tick * CHART_RESOLUTION / midi.ticks_per_beat)
-
-            if msg.type == "set_tempo":
-                midi_tempo = msg.tempo
-                bpm = int(mido.tempo2bpm(midi_tempo))
-                ch_tempo = bpm * 1000
-                chart_data["SyncTrack"][chart_tick].append(f"B {ch_tempo}")
+    def generate_chart_file(
+        self,
+        in_file_key: str,
+        out_dir: str,
+        ch_out_dir: str,
+        midi: MidiFile = None,
+        parts: PartRouter = None,
+        preview_window: tuple = None,
+    ):
+        """
+        Generate a Clone Hero compatible .chart file from a MIDI file.
 
-            if msg.type == "note_on" and msg.velocity > 0:
-                if (
-                    hasattr(msg, "channel")
-                    and msg.channel == 9
-                    and msg.note in DRUM_MAPPING
-                ):
-                    note_num, flag = DRUM_MAPPING[msg.note]
-                    note_str = f"N {note_num} 0{' ' + flag if flag else ''}"
-                    chart_data["ExpertDrums"][chart_tick].append(note_str)
-
-                    # Apply cymbals to expert notes
-                    if msg.note in [42, 44, 55]:  # Yellow cymbal
-                        chart_data["ExpertDrums"][chart_tick].append(
-                            f"N 66 0{' ' + flag if flag else ''}"
-                        )
-                    elif msg.note in [46, 51, 53, 59]:  # Blue cymbal
-                        chart_data["ExpertDrums"][chart_tick].append(
-                            f"N 67 0{' ' + flag if flag else ''}"
-                        )
-                    elif msg.note in [49, 57, 52]:  # Green cymbal
-                        chart_data["ExpertDrums"][chart_tick].append(
-                            f"N 68 0{' ' + flag if flag else ''}"
-                        )
+        Creates a .chart file from the input MIDI file with drum mappings for Clone Hero.
+        Streams the chart file to the output directory, then copies it into a Clone Hero
+        specific directory structure with 'notes.chart' filename.
 
-        # Build the .chart file text
-        chart_text = "[Song]\n{\n"
-        for key, value in chart_data["Song"].items():
-            chart_text += f"  {key} = {value if isinstance(value, (int, float)) else f'{value}'}\n"
-        chart_text += "}\n"
+        Args:
+            in_file_key (str): Filename of the split MIDI file located in out_dir
+            out_dir (str): Directory where the chart file will be saved
+            ch_out_dir (str): Clone Hero specific directory name for the chart
+            midi (MidiFile, optional): In-memory split MIDI from `extract_drums`.
+                When given, the split MIDI file is not read from out_dir
+            parts (PartRouter, optional): Instrument notes routed by `extract_drums`,
+                charted after the drums
+            preview_window (tuple, optional): (start, end) of the preview in seconds,
+                written as PreviewStart and PreviewEnd
 
-        chart_text += "[SyncTrack]\n{\n"
-        for tick in sorted(chart_data["SyncTrack"].keys()):
-            for event in chart_data["SyncTrack"][tick]:
-                chart_text += f"  {tick} = {event}\n"
-        chart_text += "}\n"
+        Returns:
+            None
+        """
+        chart_out_fp = self._chart_out_fp(in_file_key, out_dir)
 
-        chart_text += "[Events]\n{\n}\n"
+        if midi is None:
+            # Read split MIDI file from local directory
+            with self._stage("parse") as stage:
+                in_file_fp = os.path.join(out_dir, in_file_key)
+                midi = MidiFile(in_file_fp)
 
-        chart_text += "[ExpertDrums]\n{\n"
-        for tick in sorted(chart_data["ExpertDrums"].keys()):
-            for note in chart_data["ExpertDrums"][tick]:
-                chart_text += f"  {tick} = {note[:-2]}\n"
-        chart_text += "}"
+                # Merge tracks to get length. Split files already hold a single track,
+                # which merging would only copy message by message
+                if len(midi.tracks) == 1:
+                    merged_track = midi.tracks[0]
+                else:
+                    merged_track = mido.merge_tracks(midi.tracks)
+                stage["events"] += len(merged_track)
+        else:
+            # `extract_drums` already merged everything into one delta-timed track
+            merged_track = midi.tracks[0]
 
-        # Write chart file to local directory
+        # Stream the .chart sections to the local directory in one pass
         with open(chart_out_fp, "w") as f:
-            f.write(chart_text)
+            self._write_chart(
+                f,
+                merged_track,
+                midi.ticks_per_beat,
+                parts,
+                self._song_metadata(in_file_key, preview_window),
+                vars(midi).get("drum_arrays"),
+            )
 
         if os.path.exists(chart_out_fp):
             logger.info(f"Successfully created chart file at: {chart_out_fp}")
@@ -272,10 +1281,12 @@ class Charter:
             logger.error("Error: Failed to create .chart file")
             print("[bold red]Error: Failed to create .chart file[/bold red]")
 
-        # Write `notes.chart` version to a new folder for Clone Hero importing
+        # Copy the chart as `notes.chart` to a new folder for Clone Hero importing
         ch_out_fp = os.path.join(out_dir, ch_out_dir, "notes.chart")
-        with open(ch_out_fp, "w") as f:
-            f.write(chart_text)
+        with self._stage("chart_write") as stage:
+            shutil.copyfile(chart_out_fp, ch_out_fp)
+            self._count_written(stage, chart_out_fp)
+            self._count_written(stage, ch_out_fp)
 
         if os.path.exists(ch_out_fp):
             logger.info(f"Successfully created chart file at: {ch_out_fp}")
@@ -288,39 +1299,173 @@ class Charter:
                 '[bold red]Error: Failed to create folder "notes.chart" file[/bold red]'
             )
 
-    def generate_wav_file(self, in_file_key: str, out_dir: str, ch_out_dir: str):
+    def _write_chart(
+        self,
+        f,
+        merged_track,
+        ticks_per_beat: int,
+        parts: PartRouter,
+        song_metadata: dict,
+        drum_arrays: tuple = None,
+    ):
         """
-        Convert a MIDI file to WAV audio format for Clone Hero.
+        Build the chart sections of a drum track and stream them to a text file.
 
-        Uses FluidSynth to synthesize audio from the MIDI file and saves it as song.wav
-        in the Clone Hero directory structure for audio playback during gameplay.
+        Args:
+            f: Writable text file
+            merged_track: Iterable of mido messages with delta times
+            ticks_per_beat (int): MIDI file resolution
+            parts (PartRouter): Instrument notes charted after the drums, or None
+            song_metadata (dict): [Song] section values, from `_song_metadata`
+            drum_arrays (tuple, optional): (notes, tempos) arrays of merged_track
+                for the NumPy path, as attached by `extract_drums`
+        """
+        with self._profile():
+            with self._stage("chart_build") as stage:
+                if self.use_numpy:
+                    # Decode and map the whole track with array operations
+                    sync_items, note_sections = vectorized.chart_sections(
+                        merged_track,
+                        ticks_per_beat,
+                        self.difficulties,
+                        self.grid,
+                        self.flam_ticks,
+                        drum_arrays,
+                    )
+                else:
+                    sync_items, note_sections = self._chart_sections(
+                        merged_track, ticks_per_beat, self.difficulties
+                    )
+                if parts is not None:
+                    note_sections.extend(parts.sections(ticks_per_beat))
+                stage["events"] += len(merged_track)
+
+            with self._stage("chart_write") as stage:
+                sections = [
+                    ("Song", song_metadata.items()),
+                    ("SyncTrack", sync_items),
+                    ("Events", ()),
+                ]
+                # Note text is only formatted here, as each section is written
+                sections.extend((name, notes.items()) for name, notes in note_sections)
+                write_chart(f, sections)
+                stage["events"] += len(sync_items) + sum(
+                    notes.num_events() for _, notes in note_sections
+                )
+
+    def _chart_sections(self, merged_track, ticks_per_beat: int, difficulties=()):
+        """
+        Build the SyncTrack items and drum note tracks message by message.
 
         Args:
-            in_file_key (str): Filename of the split MIDI file located in out_dir
-            out_dir (str): Directory where the original MIDI file is located
-            ch_out_dir (str): Clone Hero specific directory where the WAV file will be saved
+            merged_track: Iterable of mido messages with delta times
+            ticks_per_beat (int): MIDI file resolution
+            difficulties: Lower difficulties to reduce ExpertDrums to, keys of DIFFICULTIES
 
         Returns:
-            None
+            tuple: (sync_items, drum_sections), where sync_items is a list of (tick, event)
+                pairs and drum_sections a list of (name, NoteTrack) pairs starting with
+                ExpertDrums
+        """
+        hits = []
+        tempo_changes = []
+        current_tick = 0
+        for msg in merged_track:
+            current_tick += msg.time
+
+            if msg.type == "set_tempo":
+                tempo_changes.append((current_tick, msg.tempo))
+
+            if msg.type == "note_on" and msg.velocity > 0:
+                if (
+                    hasattr(msg, "channel")
+                    and msg.channel == DRUM_CHANNEL
+                    and msg.note in DRUM_MAPPING
+                ):
+                    if self.grid is None:
+                        tick = int(current_tick * CHART_RESOLUTION / ticks_per_beat)
+                    else:
+                        tick = snap_tick(current_tick, ticks_per_beat, self.grid)
+                    # Cymbals are flagged on the lane note and get their marker on write
+                    hits.append(
+                        (
+                            tick,
+                            DRUM_MAPPING[msg.note][0],
+                            CYMBAL if msg.note in CYMBAL_MAPPING else 0,
+                        )
+                    )
+
+        if self.flam_ticks is not None:
+            hits = merge_hits(hits, self.flam_ticks)
+        expert_drums = NoteTrack()
+        for tick, lane, flags in hits:
+            expert_drums.append(tick, lane, flags=flags)
+
+        # Initialize chart file, then one B event per tempo change, keeping the
+        # sub-BPM precision of the tempo
+        sync_items = [(0, "TS 4")]
+        sync_items.extend(TempoMap(tempo_changes, ticks_per_beat).sync_items())
+
+        # Reduce the lower difficulties from the Expert notes instead of the messages
+        drum_sections = [("ExpertDrums", expert_drums)]
+        for difficulty in difficulties:
+            drum_sections.append(
+                (
+                    f"{difficulty}Drums",
+                    NoteTrack.from_events(
+                        reduce_drums(expert_drums.events(), difficulty)
+                    ),
+                )
+            )
+        return sync_items, drum_sections
+
+    def _fetch_soundfont(self):
+        """
+        Download the General MIDI soundfont on first use.
+
+        Returns:
+            str: Path of the cached soundfont
         """
-        import subprocess
         import urllib.request
 
-        SOUNDFONT_URL = "https://github.com/ryan-w-roche/auto-chart-engine/releases/download/v2.0.0/FluidR3_GM.sf2"
         soundfont_dir = os.path.join(os.path.expanduser("~"), ".ace", "soundfonts")
         sound_font = os.path.join(soundfont_dir, "FluidR3_GM.sf2")
 
         # Download soundfont on first use
-        if not os.path.exists(sound_font):
-            os.makedirs(soundfont_dir, exist_ok=True)
-            print("[cyan]Downloading soundfont on first use...[/cyan]")
-            urllib.request.urlretrieve(SOUNDFONT_URL, sound_font)
-            print("[bold green]✔ Soundfont downloaded[/bold green]")
+        with self._stage("soundfont_fetch") as stage:
+            if not os.path.exists(sound_font):
+                os.makedirs(soundfont_dir, exist_ok=True)
+                print("[cyan]Downloading soundfont on first use...[/cyan]")
+                # Download under a unique name so batch workers and service threads
+                # never see a partial file
+                tmp_fp = tmp_path(sound_font, ".part")
+                urllib.request.urlretrieve(SOUNDFONT_URL, tmp_fp)
+                os.replace(tmp_fp, sound_font)
+                self._count_written(stage, sound_font)
+                print("[bold green]✔ Soundfont downloaded[/bold green]")
 
-        split_midi_fp = os.path.join(out_dir, in_file_key)
-        wav_out_fp = os.path.join(out_dir, ch_out_dir, "song.wav")
+        return sound_font
+
+    def warm_up(self):
+        """
+        Fetch the soundfont, and load the one-shot drum samples of the "numpy"
+        renderer, ahead of the first conversion of a long-lived process.
+        """
+        sound_font = self._fetch_soundfont()
+        if self.renderer == "numpy":
+            self._drum_samples(sound_font)
+
+    def _run_fluidsynth(self, sound_font: str, midi_fp: str, wav_out_fp: str):
+        """
+        Synthesize a MIDI file to a WAV file with the FluidSynth command line.
+
+        Args:
+            sound_font (str): Path of the soundfont
+            midi_fp (str): Path of the MIDI file to render
+            wav_out_fp (str): Path of the WAV file to create
+        """
+        import subprocess
 
-        # Convert MIDI to WAV
         subprocess.run(
             [
                 "fluidsynth",
@@ -334,11 +1479,73 @@ class Charter:
                 "-r",
                 "44100",
                 sound_font,
-                split_midi_fp,
+                midi_fp,
             ],
             check=True,
         )
 
+    def _drum_samples(self, sound_font: str):
+        """
+        Load the one-shot drum samples of a soundfont for the "numpy" renderer.
+
+        The samples are rendered with FluidSynth the first time a soundfont is used,
+        then kept on disk and in memory for the following songs.
+
+        Args:
+            sound_font (str): Path of the soundfont
+
+        Returns:
+            dict: float32 sample array per GM drum note
+        """
+        return drum_renderer.load_samples(
+            lambda midi_fp, wav_fp: self._run_fluidsynth(sound_font, midi_fp, wav_fp),
+            self._soundfont_id(sound_font),
+        )
+
+    def generate_wav_file(
+        self,
+        in_file_key: str,
+        out_dir: str,
+        ch_out_dir: str,
+        midi: MidiFile = None,
+    ):
+        """
+        Convert a MIDI file to WAV audio format for Clone Hero.
+
+        Uses FluidSynth to synthesize audio from the MIDI file and saves it as song.wav
+        in the Clone Hero directory structure for audio playback during gameplay. With
+        the "numpy" renderer, the song is mixed from cached one-shot drum samples instead.
+
+        Args:
+            in_file_key (str): Filename of the split MIDI file located in out_dir
+            out_dir (str): Directory where the original MIDI file is located
+            ch_out_dir (str): Clone Hero specific directory where the WAV file will be saved
+            midi (MidiFile, optional): In-memory split MIDI from `extract_drums`.
+                When given, it is handed to FluidSynth through a temporary file
+
+        Returns:
+            None
+        """
+        sound_font = self._fetch_soundfont()
+        wav_out_fp = os.path.join(out_dir, ch_out_dir, "song.wav")
+
+        # Replace rather than overwrite an existing song.wav, it may be hard-linked to the cache
+        if os.path.exists(wav_out_fp):
+            os.remove(wav_out_fp)
+
+        with self._stage("render") as stage:
+            split_midi_fp = os.path.join(out_dir, in_file_key)
+            if midi is None and (self.renderer == "numpy" or self.render_jobs > 1):
+                midi = MidiFile(split_midi_fp)
+            if midi is None:
+                # Convert MIDI to WAV
+                self._run_fluidsynth(sound_font, split_midi_fp, wav_out_fp)
+            else:
+                stage["events"] += self._render(
+                    midi, wav_out_fp, in_file_key, sound_font
+                )
+            self._count_written(stage, wav_out_fp)
+
         if os.path.exists(wav_out_fp):
             logger.info(f"Successfully created wav file at: {wav_out_fp}")
             print(
@@ -347,3 +1554,54 @@ class Charter:
         else:
             logger.error('Error: Failed to create "song.wav" file')
             print('[bold red]Error: Failed to create "song.wav" file[/bold red]')
+
+    def generate_preview_file(
+        self,
+        in_file_key: str,
+        out_dir: str,
+        ch_out_dir: str,
+        midi: MidiFile,
+        preview_window: tuple,
+    ):
+        """
+        Render the preview window of a song as preview.wav for the song browser.
+
+        The drum track is cut down to the window first, so only its seconds are
+        synthesized instead of the whole song.
+
+        Args:
+            in_file_key (str): Filename of the split MIDI file
+            out_dir (str): Directory where all output files are saved
+            ch_out_dir (str): Clone Hero specific directory where the WAV file will be saved
+            midi (MidiFile): In-memory split MIDI from `extract_drums`
+            preview_window (tuple): (start, end) of the preview in seconds
+
+        Returns:
+            None
+        """
+        preview_fp = os.path.join(out_dir, ch_out_dir, "preview.wav")
+
+        # Replace rather than overwrite an existing preview.wav, it may be hard-linked to the cache
+        if os.path.exists(preview_fp):
+            os.remove(preview_fp)
+
+        sound_font = self._fetch_soundfont()
+        start, end = preview_window
+        with self._stage("render") as stage:
+            stage["events"] += self._render(
+                cut_midi(midi, start, end, self._song_timing(midi)[0]),
+                preview_fp,
+                in_file_key,
+                sound_font,
+                end - start,
+            )
+            self._count_written(stage, preview_fp)
+
+        if os.path.exists(preview_fp):
+            logger.info(f"Successfully created preview file at: {preview_fp}")
+            print(
+                f"[bold green]✔ Successfully created preview file at:[/bold green] [cyan]{preview_fp}[/cyan]"
+            )
+        else:
+            logger.error('Error: Failed to create "preview.wav" file')
+            print('[bold red]Error: Failed to create "preview.wav" file[/bold red]')
@@ -0,0 +1,87 @@
+"""
+Module for reducing ExpertDrums into the lower drum difficulties.
+Each difficulty thins the Expert chords on a beat grid, simplifies the kick pattern,
+limits the pads per chord and can drop the cymbal markers.
+"""
+
+from itertools import groupby
+from operator import itemgetter
+
+from ace.mapping import CHART_RESOLUTION, CYMBAL_MARKER, CYMBAL_OFFSET, KICK
+
+# Reduction settings per difficulty, in chart ticks:
+#   grid: only the first chord of each grid cell is kept
+#   kick_grid: only the first kick of each kick_grid cell is kept
+#   max_pads: pads kept per chord, lowest lanes (snare first) win
+#   cymbals: keep the cymbal markers of the kept pads
+#   kick_with_pads: keep kicks played together with a pad
+DIFFICULTIES = {
+    "Hard": {
+        "grid": CHART_RESOLUTION // 4,
+        "kick_grid": CHART_RESOLUTION // 2,
+        "max_pads": 2,
+        "cymbals": True,
+        "kick_with_pads": True,
+    },
+    "Medium": {
+        "grid": CHART_RESOLUTION // 2,
+        "kick_grid": CHART_RESOLUTION,
+        "max_pads": 2,
+        "cymbals": False,
+        "kick_with_pads": True,
+    },
+    "Easy": {
+        "grid": CHART_RESOLUTION,
+        "kick_grid": CHART_RESOLUTION * 2,
+        "max_pads": 1,
+        "cymbals": False,
+        "kick_with_pads": False,
+    },
+}
+
+
+def reduce_drums(events: list, difficulty: str):
+    """
+    Reduce ExpertDrums events to a lower difficulty.
+
+    Within a chord the kick comes first, then each pad in lane order followed by its
+    cymbal marker. `vectorized.reduce_drums` produces the same events from arrays.
+
+    Args:
+        events (list): ExpertDrums (chart_tick, note) pairs in chart order
+        difficulty (str): A key of DIFFICULTIES
+
+    Returns:
+        list: The reduced (chart_tick, note) pairs in chart order
+    """
+    settings = DIFFICULTIES[difficulty]
+    grid = settings["grid"]
+    kick_grid = settings["kick_grid"]
+
+    reduced = []
+    last_cell = last_kick_cell = None
+    for tick, chord in groupby(events, key=itemgetter(0)):
+        # Density thinning on the beat grid
+        cell = tick // grid
+        if cell == last_cell:
+            continue
+        last_cell = cell
+
+        notes = {note for _, note in chord}
+        pads = sorted(note for note in notes if KICK < note < CYMBAL_MARKER)
+        pads = pads[: settings["max_pads"]]
+
+        if (
+            KICK in notes
+            and (settings["kick_with_pads"] or not pads)
+            and tick // kick_grid != last_kick_cell
+        ):
+            reduced.append((tick, KICK))
+            last_kick_cell = tick // kick_grid
+
+        for pad in pads:
+            reduced.append((tick, pad))
+            if settings["cymbals"] and pad + CYMBAL_OFFSET in notes:
+                reduced.append((tick, pad + CYMBAL_OFFSET))
+
+    return reduced
@@ -0,0 +1,144 @@
+"""
+Module for charting the pitched instruments of a song next to the drums.
+Routes the note events of every channel to per-instrument buffers by their current
+GM program while the drum track is extracted, then maps each part's pitches to frets.
+"""
+
+from ace.mapping import CHART_RESOLUTION, DRUM_CHANNEL
+from ace.note_track import NoteTrack
+
+# Instrument -> .chart section and the GM programs (0-based) routed to it
+INSTRUMENTS = {
+    "guitar": {"section": "ExpertSingle", "programs": range(24, 32)},
+    "bass": {"section": "ExpertDoubleBass", "programs": range(32, 40)},
+    "keys": {"section": "ExpertKeyboard", "programs": [*range(0, 8), *range(16, 24)]},
+}
+
+# Frets of the guitar, bass and keys lanes
+NUM_FRETS = 5
+
+# Notes shorter than this many chart ticks (an 8th note) are charted without a sustain
+MIN_SUSTAIN = CHART_RESOLUTION // 2
+
+NOTE_OFF = 0x80
+NOTE_ON = 0x90
+PROGRAM_CHANGE = 0xC0
+
+
+class PartRouter:
+    """
+    Collects the notes of the requested instruments from a stream of channel events.
+
+    Events are routed by the program last selected on their channel (GM piano until
+    a program change), so one pass over the song fills every part, whatever the
+    number of instruments. Several channels playing one instrument share its part.
+
+    Args:
+        instruments: Keys of INSTRUMENTS to collect
+    """
+
+    def __init__(self, instruments):
+        self.instruments = tuple(instruments)
+        self.program_parts = [None] * 128
+        for name in self.instruments:
+            for program in INSTRUMENTS[name]["programs"]:
+                self.program_parts[program] = name
+        self.clear()
+
+    def clear(self):
+        """
+        Drop every collected note, e.g. before routing the song again.
+        """
+        self.programs = [0] * 16
+        self.sounding = {}
+        self.parts = {name: [] for name in self.instruments}
+
+    def route(self, abs_tick: int, status: int, a: int, b):
+        """
+        Route one channel event, in song order.
+
+        Args:
+            abs_tick (int): Absolute MIDI tick of the event
+            status (int): Status byte
+            a (int): First data byte
+            b: Second data byte, or None for one-byte messages
+        """
+        kind = status & 0xF0
+        channel = status & 0x0F
+        if channel == DRUM_CHANNEL:
+            return
+
+        if kind == PROGRAM_CHANGE:
+            self.programs[channel] = a
+        elif kind == NOTE_ON or kind == NOTE_OFF:
+            # A note ends at its note_off, or when the same key is struck again
+            started = self.sounding.pop((channel, a), None)
+            if started is not None:
+                part, start = started
+                self.parts[part].append((start, abs_tick, a))
+
+            if kind == NOTE_ON and b:
+                part = self.program_parts[self.programs[channel]]
+                if part is not None:
+                    self.sounding[channel, a] = (part, abs_tick)
+
+    def route_message(self, abs_tick: int, msg):
+        """
+        Route one mido message, in song order.
+
+        Args:
+            abs_tick (int): Absolute MIDI tick of the message
+            msg: mido message
+        """
+        if msg.type in ("note_on", "note_off"):
+            status = NOTE_ON if msg.type == "note_on" else NOTE_OFF
+            self.route(abs_tick, status | msg.channel, msg.note, msg.velocity)
+        elif msg.type == "program_change":
+            self.route(abs_tick, PROGRAM_CHANGE | msg.channel, msg.program, None)
+
+    def sections(self, ticks_per_beat: int):
+        """
+        Chart every collected part.
+
+        Args:
+            ticks_per_beat (int): MIDI file resolution
+
+        Returns:
+            list: (section name, NoteTrack) pairs of the parts that have notes
+        """
+        return [
+            (INSTRUMENTS[name]["section"], part_track(self.parts[name], ticks_per_beat))
+            for name in self.instruments
+            if self.parts[name]
+        ]
+
+
+def part_track(notes: list, ticks_per_beat: int):
+    """
+    Map the notes of one part to frets.
+
+    The pitch range of the part is split into NUM_FRETS equal bands, lowest pitches
+    on the first fret. Notes that land on the same fret and chart tick are merged.
+
+    Args:
+        notes (list): (start_tick, end_tick, pitch) MIDI notes of the part
+        ticks_per_beat (int): MIDI file resolution
+
+    Returns:
+        NoteTrack: The fretted notes, with sustains of at least MIN_SUSTAIN ticks
+    """
+    low = min(pitch for _, _, pitch in notes)
+    span = max(pitch for _, _, pitch in notes) - low + 1
+
+    # (chart tick, fret) -> longest sustain
+    frets = {}
+    for start, end, pitch in notes:
+        tick = start * CHART_RESOLUTION // ticks_per_beat
+        length = end * CHART_RESOLUTION // ticks_per_beat - tick
+        key = (tick, (pitch - low) * NUM_FRETS // span)
+        frets[key] = max(frets.get(key, 0), length if length >= MIN_SUSTAIN else 0)
+
+    track = NoteTrack()
+    for (tick, fret), length in sorted(frets.items()):
+        track.append(tick, fret, length)
+    return track
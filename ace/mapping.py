@@ -0,0 +1,56 @@
+"""
+Module holding the General MIDI to Clone Hero drum mapping shared by the chart generators.
+"""
+
+# Ticks per quarter note of the generated .chart files
+CHART_RESOLUTION = 192
+
+# MIDI channel reserved for percussion (channel 10 when counted from 1)
+DRUM_CHANNEL = 9
+
+# Clone Hero note numbers of the kick lane and of the first cymbal marker
+KICK = 0
+CYMBAL_MARKER = 66
+
+# Cymbal marker note = pad lane + CYMBAL_OFFSET, e.g. 66 marks the yellow pad (lane 2)
+CYMBAL_OFFSET = 64
+
+# GM drum note -> (Clone Hero lane, flag)
+DRUM_MAPPING = {
+    35: (0, "K"),  # Acoustic Bass Drum
+    36: (0, "K"),  # Bass Drum (Kick)
+    37: (1, "R"),  # Side Stick
+    38: (1, "R"),  # Acoustic Snare
+    39: (1, "R"),  # Hand Clap
+    40: (1, "R"),  # Electric Snare
+    41: (4, "G"),  # Low Floor Tom
+    42: (2, "Y"),  # Closed Hi-Hat
+    43: (4, "G"),  # High Floor Tom
+    44: (2, "Y"),  # Pedal Hi-Hat
+    45: (4, "G"),  # Low Tom
+    46: (3, "B"),  # Open Hi-Hat
+    47: (3, "B"),  # Mid Tom
+    48: (2, "Y"),  # High Mid Tom
+    49: (4, "G"),  # Crash Cymbal 1
+    50: (2, "Y"),  # High Tom
+    51: (3, "B"),  # Ride Cymbal
+    52: (4, "G"),  # Chinese Cymbal
+    53: (3, "B"),  # Ride Bell
+    55: (2, "Y"),  # Splash Cymbal
+    57: (4, "G"),  # Crash Cymbal 2
+    59: (3, "B"),  # Ride Cymbal 2
+}
+
+# GM drum note -> Clone Hero cymbal marker note
+CYMBAL_MAPPING = {
+    42: 66,  # Yellow cymbal
+    44: 66,
+    55: 66,
+    46: 67,  # Blue cymbal
+    51: 67,
+    53: 67,
+    59: 67,
+    49: 68,  # Green cymbal
+    57: 68,
+    52: 68,
+}
@@ -0,0 +1,264 @@
+"""
+Module for recording per-stage conversion metrics.
+Times each Charter stage, counts the events and bytes it handled, and can profile
+the chart stage with cProfile or a sampling profiler.
+"""
+
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from rich import print
+from rich.table import Table
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows has no resource module
+    resource = None
+
+STAGES = (
+    "parse",
+    "split",
+    "chart_build",
+    "chart_write",
+    "soundfont_fetch",
+    "render",
+)
+PROFILERS = ("cprofile", "sampling")
+
+
+def peak_rss_bytes():
+    """
+    Read the peak resident set size of this process so far.
+
+    Returns:
+        int | None: Peak RSS in bytes, or None where the platform doesn't report it
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler that samples the call stack of one thread from another.
+
+    Has the same enable/disable/dump_stats interface as cProfile.Profile, but adds
+    no overhead to the profiled code besides sharing the GIL with the sampler.
+    Stacks are dumped in the collapsed "frame;frame;frame count" format read by
+    flamegraph.pl and speedscope.
+
+    Args:
+        interval (float): Seconds between samples
+    """
+
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._target = None
+
+    def enable(self):
+        self._target = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def disable(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def dump_stats(self, path: str):
+        """
+        Write the collected stacks in collapsed format, most sampled first.
+
+        Args:
+            path (str): File to create
+        """
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class StageMetrics:
+    """
+    Wall time, CPU time, peak RSS, event counts and bytes written per conversion stage.
+
+    A stage entered several times, e.g. "parse" after a scanner fallback, adds up.
+    The RSS is not the memory of the stage itself: "process_peak_rss_bytes" is the
+    peak of the whole process up to the end of the stage, which includes earlier
+    stages, earlier songs and other threads.
+
+    Args:
+        profiler (str, optional): "cprofile" or "sampling" to profile the blocks
+            wrapped in `profile`
+    """
+
+    def __init__(self, profiler: str = None):
+        self.stages = {}
+        if profiler is None:
+            self.profiler = None
+        elif profiler == "cprofile":
+            self.profiler = cProfile.Profile()
+        elif profiler == "sampling":
+            self.profiler = SamplingProfiler()
+        else:
+            raise ValueError(
+                f"Unknown profiler {profiler!r}, expected one of {PROFILERS}"
+            )
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Measure a block of work as one stage.
+
+        Args:
+            name (str): Stage name, one of STAGES
+
+        Yields:
+            dict: The stage record; add to its "events" and "bytes_written" counts
+        """
+        record = self.stages.setdefault(
+            name,
+            {
+                "calls": 0,
+                "wall_seconds": 0.0,
+                "cpu_seconds": 0.0,
+                "process_peak_rss_bytes": None,
+                "events": 0,
+                "bytes_written": 0,
+            },
+        )
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        finally:
+            record["calls"] += 1
+            record["wall_seconds"] += time.perf_counter() - wall_start
+            record["cpu_seconds"] += time.process_time() - cpu_start
+            record["process_peak_rss_bytes"] = peak_rss_bytes()
+
+    @contextmanager
+    def profile(self):
+        """
+        Profile a block of work when a profiler was requested.
+        """
+        if self.profiler is None:
+            yield
+            return
+
+        self.profiler.enable()
+        try:
+            yield
+        finally:
+            self.profiler.disable()
+
+    def dump_profile(self, path: str):
+        """
+        Write the profile collected by `profile`.
+
+        Args:
+            path (str): File to create, in pstats format for "cprofile" and collapsed
+                stacks for "sampling"
+        """
+        self.profiler.dump_stats(path)
+
+    def to_dict(self):
+        """
+        Summarize the stages for JSON output.
+
+        Returns:
+            dict: Per-stage records in STAGES order, with the totals of the conversion.
+                Stages are never nested, so their times add up
+        """
+        stages = {name: self.stages[name] for name in STAGES if name in self.stages}
+        stages.update(self.stages)
+        return {
+            "wall_seconds": sum(s["wall_seconds"] for s in stages.values()),
+            "cpu_seconds": sum(s["cpu_seconds"] for s in stages.values()),
+            "process_peak_rss_bytes": peak_rss_bytes(),
+            "stages": stages,
+        }
+
+
+def write_metrics_json(path: str, songs: list):
+    """
+    Write the metrics of one or more conversions to a JSON file.
+
+    Args:
+        path (str): File to create
+        songs (list): One dict per song, from `StageMetrics.to_dict` plus its
+            "input" path and "error"
+    """
+    with open(path, "w") as f:
+        json.dump({"songs": songs}, f, indent=2)
+        f.write("\n")
+
+
+def print_metrics(songs: list):
+    """
+    Print the stage metrics summed over every song as a table.
+
+    Args:
+        songs (list): Song metrics, see `write_metrics_json`
+    """
+    totals = {}
+    for song in songs:
+        for name, record in song["stages"].items():
+            total = totals.setdefault(name, Counter())
+            for field in (
+                "calls",
+                "wall_seconds",
+                "cpu_seconds",
+                "events",
+                "bytes_written",
+            ):
+                total[field] += record[field]
+            total["process_peak_rss_bytes"] = max(
+                total["process_peak_rss_bytes"], record["process_peak_rss_bytes"] or 0
+            )
+
+    noun = "song" if len(songs) == 1 else "songs"
+    table = Table(title=f"Stage metrics ({len(songs)} {noun})")
+    table.add_column("Stage")
+    for column in (
+        "Calls",
+        "Wall s",
+        "CPU s",
+        "Events",
+        "Written",
+        "Process peak RSS MiB",
+    ):
+        table.add_column(column, justify="right")
+    for name in sorted(totals, key=lambda n: STAGES.index(n) if n in STAGES else 99):
+        total = totals[name]
+        table.add_row(
+            name,
+            f"{total['calls']:,}",
+            f"{total['wall_seconds']:.3f}",
+            f"{total['cpu_seconds']:.3f}",
+            f"{total['events']:,}",
+            f"{total['bytes_written']:,}",
+            f"{total['process_peak_rss_bytes'] / 2**20:.1f}",
+        )
+    print(table)
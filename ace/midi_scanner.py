@@ -0,0 +1,237 @@
+"""
+Module for scanning Standard MIDI Files without building a mido Message per event.
+Walks the MThd/MTrk chunks of a memory-mapped file, handling running status, and
+keeps only the drum channel (or every channel) messages and the tempo and time
+signature meta events.
+"""
+
+import mmap
+
+from mido import Message, MetaMessage
+
+from ace.mapping import DRUM_CHANNEL
+
+META = 0xFF
+META_SET_TEMPO = 0x51
+META_TIME_SIGNATURE = 0x58
+KEPT_META_TYPES = (META_SET_TEMPO, META_TIME_SIGNATURE)
+
+
+class MidiScanError(ValueError):
+    """Raised when a MIDI file can't be scanned and should be read with mido instead."""
+
+
+def scan_file(in_file_dir: str, channel: int = DRUM_CHANNEL):
+    """
+    Scan a MIDI file from disk through a read-only memory map.
+
+    Args:
+        in_file_dir (str): Path to the MIDI file
+        channel (int): MIDI channel to keep, or None to keep every channel
+
+    Returns:
+        tuple: See `scan_bytes`
+
+    Raises:
+        MidiScanError: If the file is empty or not a well-formed MIDI file
+    """
+    with open(in_file_dir, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as e:
+            raise MidiScanError(f"Can't map {in_file_dir}: {e}") from e
+
+        with mm:
+            view = memoryview(mm)
+            try:
+                return scan_bytes(view, channel)
+            finally:
+                view.release()
+
+
+def scan_bytes(data, channel: int = DRUM_CHANNEL):
+    """
+    Scan the chunks of a MIDI file held in memory.
+
+    Events are (abs_tick, status, a, b) tuples. For channel messages `a` and `b` are
+    the data bytes (`b` is None for one-byte messages); for meta events the status
+    is 0xFF, `a` is the meta type and `b` the raw meta data.
+
+    Args:
+        data: bytes, bytearray or memoryview of the whole file
+        channel (int): MIDI channel to keep, or None to keep every channel
+
+    Returns:
+        tuple: (ticks_per_beat, tracks, end_tick), where tracks holds one time-ordered
+            event list per MTrk chunk and end_tick is the tick of the last track end
+
+    Raises:
+        MidiScanError: If the data is not a well-formed MIDI file
+    """
+    if len(data) < 14 or bytes(data[:4]) != b"MThd":
+        raise MidiScanError("MThd not found. Probably not a MIDI file")
+
+    header_size = int.from_bytes(data[4:8], "big")
+    if header_size < 6:
+        raise MidiScanError("MThd chunk is too short")
+    num_tracks = int.from_bytes(data[10:12], "big")
+    ticks_per_beat = int.from_bytes(data[12:14], "big", signed=True)
+    if ticks_per_beat <= 0:
+        raise MidiScanError("SMPTE time division is not supported")
+
+    tracks = []
+    end_tick = 0
+    pos = 8 + header_size
+    for _ in range(num_tracks):
+        start = pos + 8
+        chunk_header = bytes(data[pos:start])
+        if len(chunk_header) < 8 or chunk_header[:4] != b"MTrk":
+            raise MidiScanError("no MTrk header at start of track")
+        size = int.from_bytes(chunk_header[4:], "big")
+        pos = start + size
+        if pos > len(data):
+            raise MidiScanError("MTrk chunk runs past the end of the file")
+
+        try:
+            events, track_end = _scan_track(data, start, pos, channel)
+        except IndexError as e:
+            raise MidiScanError("MTrk chunk ends in the middle of an event") from e
+        tracks.append(events)
+        end_tick = max(end_tick, track_end)
+
+    return ticks_per_beat, tracks, end_tick
+
+
+def _scan_track(data, pos: int, end: int, channel: int):
+    """
+    Scan the events of one MTrk chunk.
+
+    Args:
+        data: Buffer holding the file
+        pos (int): Offset of the first event
+        end (int): Offset just past the chunk
+        channel (int): MIDI channel to keep, or None to keep every channel
+
+    Returns:
+        tuple: (events, tick) with the kept events and the tick of the last event
+    """
+    events = []
+    tick = 0
+    running_status = None
+    all_channels = channel is None
+
+    while pos < end:
+        # Delta time
+        byte = data[pos]
+        pos += 1
+        delta = byte & 0x7F
+        while byte & 0x80:
+            byte = data[pos]
+            pos += 1
+            delta = (delta << 7) | (byte & 0x7F)
+        tick += delta
+
+        status = data[pos]
+        if status & 0x80:
+            pos += 1
+            if status < 0xF0:
+                running_status = status
+        elif running_status is None:
+            raise MidiScanError("running status without last_status")
+        else:
+            status = running_status
+
+        if status < 0xF0:
+            # Channel message: program change and channel pressure carry one data byte
+            if 0xC0 <= status < 0xE0:
+                if all_channels or status & 0x0F == channel:
+                    a = data[pos]
+                    if a > 0x7F:
+                        raise MidiScanError("data byte must be in range 0..127")
+                    events.append((tick, status, a, None))
+                pos += 1
+            else:
+                if all_channels or status & 0x0F == channel:
+                    a = data[pos]
+                    b = data[pos + 1]
+                    if a > 0x7F or b > 0x7F:
+                        raise MidiScanError("data byte must be in range 0..127")
+                    events.append((tick, status, a, b))
+                pos += 2
+        elif status == META:
+            meta_type = data[pos]
+            pos += 1
+            length, pos = _read_variable_int(data, pos)
+            data_end = pos + length
+            if meta_type in KEPT_META_TYPES:
+                events.append((tick, META, meta_type, bytes(data[pos:data_end])))
+            pos = data_end
+        elif status in (0xF0, 0xF7):
+            # Sysex cancels running status
+            length, pos = _read_variable_int(data, pos)
+            pos += length
+            running_status = None
+        else:
+            raise MidiScanError(f"undefined status byte 0x{status:02x}")
+
+    if pos != end:
+        raise MidiScanError("last event runs past the end of its MTrk chunk")
+
+    return events, tick
+
+
+def _read_variable_int(data, pos: int):
+    """
+    Read a variable-length quantity.
+
+    Args:
+        data: Buffer holding the file
+        pos (int): Offset of the first byte
+
+    Returns:
+        tuple: (value, pos) with the decoded value and the offset just past it
+    """
+    value = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value = (value << 7) | (byte & 0x7F)
+        if byte < 0x80:
+            return value, pos
+
+
+def to_message(status: int, a: int, b, time: int):
+    """
+    Build the mido message for a scanned event.
+
+    Args:
+        status (int): Status byte, 0xFF for meta events
+        a (int): First data byte, or the meta type
+        b: Second data byte, None, or the raw meta data
+        time (int): Delta time of the message
+
+    Returns:
+        Message | MetaMessage: The equivalent mido message
+
+    Raises:
+        MidiScanError: If a meta event has the wrong length
+    """
+    if status != META:
+        data = [status, a] if b is None else [status, a, b]
+        return Message.from_bytes(data, time=time)
+
+    if a == META_SET_TEMPO:
+        if len(b) != 3:
+            raise MidiScanError("set_tempo meta event must be 3 bytes")
+        return MetaMessage("set_tempo", tempo=int.from_bytes(b, "big"), time=time)
+
+    if len(b) != 4:
+        raise MidiScanError("time_signature meta event must be 4 bytes")
+    return MetaMessage(
+        "time_signature",
+        numerator=b[0],
+        denominator=2 ** b[1],
+        clocks_per_click=b[2],
+        notated_32nd_notes_per_beat=b[3],
+        time=time,
+    )
@@ -0,0 +1,174 @@
+"""
+Module for the compact note store of a chart section.
+Keeps notes as typed integer columns instead of a formatted string per note, and
+only formats the .chart text while the section is written.
+"""
+
+from array import array
+from bisect import bisect_right
+
+from ace.mapping import CYMBAL_MARKER, CYMBAL_OFFSET
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+# Note flags
+CYMBAL = 1
+
+
+def _orphan_marker_message(tick: int, note: int):
+    return f"Cymbal marker {note} at tick {tick} doesn't follow a pad"
+
+
+class NoteTrack:
+    """
+    Notes of one chart section, sorted by tick, stored as array-backed columns.
+
+    Each row is one note (tick, note, length, flags). A pad hit on a cymbal is a
+    single row with the CYMBAL flag, written as the lane note followed by its cymbal
+    marker. Notes on the same tick keep the order they were added in.
+    """
+
+    __slots__ = ("ticks", "notes", "lengths", "flags", "cymbals")
+
+    def __init__(self):
+        self.ticks = array("q")
+        self.notes = array("B")
+        self.lengths = array("L")
+        self.flags = array("B")
+        self.cymbals = 0
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def append(self, tick: int, note: int, length: int = 0, flags: int = 0):
+        """
+        Add a note, keeping the rows sorted by tick.
+
+        Args:
+            tick (int): Chart tick
+            note (int): Clone Hero note number
+            length (int): Sustain length in chart ticks
+            flags (int): Bitmask of note flags, e.g. CYMBAL
+        """
+        if self.ticks and tick < self.ticks[-1]:
+            # Out of order notes are inserted after the notes already on their tick
+            i = bisect_right(self.ticks, tick)
+            self.ticks.insert(i, tick)
+            self.notes.insert(i, note)
+            self.lengths.insert(i, length)
+            self.flags.insert(i, flags)
+        else:
+            self.ticks.append(tick)
+            self.notes.append(note)
+            self.lengths.append(length)
+            self.flags.append(flags)
+        if flags & CYMBAL:
+            self.cymbals += 1
+
+    @classmethod
+    def from_events(cls, events):
+        """
+        Build a track from chart note events.
+
+        Args:
+            events: Iterable of (chart_tick, note) pairs in chart order, where every
+                cymbal marker directly follows its pad
+
+        Returns:
+            NoteTrack: The notes, with the cymbal markers folded into CYMBAL flags
+
+        Raises:
+            ValueError: If a cymbal marker doesn't directly follow a pad
+        """
+        track = cls()
+        # Whether the last event is a pad a marker can flag
+        pad = False
+        for tick, note in events:
+            if note >= CYMBAL_MARKER:
+                if not pad:
+                    raise ValueError(_orphan_marker_message(tick, note))
+                track.flags[-1] |= CYMBAL
+                track.cymbals += 1
+                pad = False
+            else:
+                track.append(tick, note)
+                pad = True
+        return track
+
+    @classmethod
+    def from_arrays(cls, ticks, notes):
+        """
+        Build a track from NumPy arrays of chart note events.
+
+        Args:
+            ticks: Integer array of chart ticks in chart order
+            notes: Integer array of Clone Hero note numbers, where every cymbal
+                marker directly follows its pad
+
+        Returns:
+            NoteTrack: The notes, with the cymbal markers folded into CYMBAL flags
+
+        Raises:
+            ValueError: If a cymbal marker doesn't directly follow a pad, as in
+                `from_events`
+        """
+        is_marker = notes >= CYMBAL_MARKER
+        pads = np.flatnonzero(is_marker) - 1
+        # Index -1 would wrap around to the last row
+        orphans = pads[(pads < 0) | is_marker[pads]] + 1
+        if len(orphans):
+            i = orphans[0]
+            raise ValueError(_orphan_marker_message(int(ticks[i]), int(notes[i])))
+
+        flags = np.zeros(len(notes), dtype=np.uint8)
+        flags[pads] = CYMBAL
+        rows = ~is_marker
+
+        track = cls()
+        track.ticks = array("q", ticks[rows].astype(np.int64).tobytes())
+        track.notes = array("B", notes[rows].astype(np.uint8).tobytes())
+        track.lengths = array("L", bytes(track.lengths.itemsize * len(track.ticks)))
+        track.flags = array("B", flags[rows].tobytes())
+        track.cymbals = int(is_marker.sum())
+        return track
+
+    def num_events(self):
+        """
+        Count the .chart events the track writes.
+
+        Returns:
+            int: One per note plus one per cymbal marker
+        """
+        return len(self.ticks) + self.cymbals
+
+    def events(self):
+        """
+        Iterate the chart note events of the track.
+
+        Yields:
+            tuple: (chart_tick, note) pairs, each cymbal marker right after its pad
+        """
+        for tick, note, flags in zip(self.ticks, self.notes, self.flags):
+            yield tick, note
+            if flags & CYMBAL:
+                yield tick, note + CYMBAL_OFFSET
+
+    def items(self):
+        """
+        Format the track as .chart section items.
+
+        Yields:
+            tuple: (chart_tick, "N <note> <length>") pairs for `write_chart`
+        """
+        # Drum notes have no sustain, so their text is looked up instead of formatted
+        text = [f"N {note} 0" for note in range(256)]
+        for tick, note, length, flags in zip(
+            self.ticks, self.notes, self.lengths, self.flags
+        ):
+            yield tick, text[note] if not length else f"N {note} {length}"
+            if flags & CYMBAL:
+                marker = note + CYMBAL_OFFSET
+                yield tick, text[marker] if not length else f"N {marker} {length}"
@@ -0,0 +1,397 @@
+"""
+Module for packaging a Clone Hero song into a single archive.
+Streams the chart, the song.ini metadata and the audio straight into a zip file or
+a .sng container (https://github.com/mdsitton/SngFileFormat) instead of a folder of
+loose files, and reads single files back out of either.
+"""
+
+import io
+import os
+import struct
+import time
+import zipfile
+from contextlib import contextmanager
+
+from ace.cache import tmp_path
+
+PACKAGE_FORMATS = ("zip", "sng")
+
+# [Song] values of the chart copied to song.ini, by their song.ini name
+SONG_INI_KEYS = {
+    "name": "Name",
+    "artist": "Artist",
+    "charter": "Charter",
+    "album": "Album",
+    "year": "Year",
+    "genre": "Genre",
+}
+
+SNG_IDENTIFIER = b"SNGPKG"
+SNG_VERSION = 1
+
+# Bytes masked at a time, a multiple of the 256 byte period of the .sng mask
+MASK_BLOCK = 1 << 16
+
+# Members written without compression, audio barely shrinks and costs the most CPU
+STORED_EXTENSIONS = (".wav", ".ogg", ".opus", ".mp3")
+
+
+def _mask_key(xor_mask: bytes):
+    """
+    Expand a .sng XOR mask into one integer covering a whole mask block.
+
+    The mask of byte i of a member is xor_mask[i % 16] ^ (i & 0xFF), which repeats
+    every 256 bytes, so any aligned window of this key masks a block at once.
+    """
+    period = bytes(xor_mask[i % 16] ^ i for i in range(256))
+    return int.from_bytes(period * (MASK_BLOCK // 256), "little")
+
+
+def _mask(data: bytes, key: int, position: int):
+    """
+    XOR member contents with the mask, starting at a position inside the member.
+
+    Args:
+        data (bytes): Contents to mask or unmask
+        key (int): Mask from `_mask_key`
+        position (int): Offset of data inside the member
+
+    Returns:
+        bytes: The masked contents
+    """
+    masked = []
+    for start in range(0, len(data), MASK_BLOCK - 256):
+        chunk = data[start : start + MASK_BLOCK - 256]
+        shift = (position + start) % 256
+        window = (key >> (8 * shift)) & ((1 << (8 * len(chunk))) - 1)
+        value = int.from_bytes(chunk, "little") ^ window
+        masked.append(value.to_bytes(len(chunk), "little"))
+    return b"".join(masked)
+
+
+def song_ini_values(song: dict):
+    """
+    Build the song.ini metadata of a chart.
+
+    Args:
+        song (dict): [Song] section values of the chart, strings quoted as in the chart
+
+    Returns:
+        dict: song.ini values as text, keyed by song.ini name
+    """
+    values = {
+        ini_key: str(song[chart_key]).strip('"')
+        for ini_key, chart_key in SONG_INI_KEYS.items()
+        if chart_key in song
+    }
+    # The drum charts carry cymbal markers
+    values["pro_drums"] = "True"
+    # .chart previews are in seconds, song.ini ones in milliseconds
+    values["preview_start_time"] = str(round(float(song.get("PreviewStart", 0)) * 1000))
+    return values
+
+
+def song_ini_text(values: dict):
+    """
+    Format song.ini metadata.
+
+    Args:
+        values (dict): song.ini values keyed by name
+
+    Returns:
+        str: The song.ini file contents
+    """
+    return "[song]\n" + "".join(f"{key} = {value}\n" for key, value in values.items())
+
+
+class ZipPackage:
+    """
+    Song archive written as a zip file, with song.ini stored next to the other files.
+
+    The archive is written under a temporary name and only renamed to its path once
+    it's complete.
+
+    Args:
+        path (str): Path of the archive to create
+        metadata (dict): song.ini values keyed by name
+    """
+
+    def __init__(self, path: str, metadata: dict):
+        self.path = path
+        self._tmp_fp = tmp_path(path)
+        self._zip = zipfile.ZipFile(self._tmp_fp, "w", zipfile.ZIP_DEFLATED)
+        with self.open("song.ini") as f:
+            f.write(song_ini_text(metadata).encode())
+
+    def open(self, name: str):
+        """
+        Open a member of the archive for writing. Members are written one at a time.
+
+        Args:
+            name (str): Filename inside the song folder
+
+        Returns:
+            Binary file handle that adds the member when closed
+        """
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        if name.lower().endswith(STORED_EXTENSIONS):
+            info.compress_type = zipfile.ZIP_STORED
+            # Audio may pass the 2 GB zip limit, which has to be known up front
+            return self._zip.open(info, "w", force_zip64=True)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        return self._zip.open(info, "w")
+
+    def close(self):
+        self._zip.close()
+        os.replace(self._tmp_fp, self.path)
+
+    def abort(self):
+        self._zip.close()
+        os.remove(self._tmp_fp)
+
+
+class _SngMemberWriter(io.RawIOBase):
+    """
+    Masks and appends the contents of one .sng member to the file data section.
+    """
+
+    def __init__(self, package, name: str):
+        self._package = package
+        self._name = name
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        size = len(data)
+        package = self._package
+        package._f.write(_mask(bytes(data), package._mask_key, self._position))
+        self._position += size
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._package._sizes[self._name] = self._position
+        super().close()
+
+
+class _SngMemberReader(io.RawIOBase):
+    """
+    Reads and unmasks one .sng member on demand.
+    """
+
+    def __init__(self, f, size: int, offset: int, key: int):
+        self._f = f
+        self._size = size
+        self._offset = offset
+        self._key = key
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: self._size}
+        self._position = max(0, base[whence] + offset)
+        return self._position
+
+    def readinto(self, buffer):
+        size = max(0, min(len(buffer), self._size - self._position))
+        self._f.seek(self._offset + self._position)
+        data = self._f.read(size)
+        buffer[: len(data)] = _mask(data, self._key, self._position)
+        self._position += len(data)
+        return len(data)
+
+
+class SngPackage:
+    """
+    Song archive written as a .sng container, with the song.ini values as metadata.
+
+    The file index comes before the file data, so the members are declared up front
+    and their sizes filled in once the archive is complete. Member contents are
+    masked as they're written, a block at a time.
+
+    Args:
+        path (str): Path of the archive to create
+        metadata (dict): song.ini values keyed by name
+        files (list): Filenames of the members, in the order they're written
+    """
+
+    def __init__(self, path: str, metadata: dict, files: list):
+        self.path = path
+        self._tmp_fp = tmp_path(path)
+        self._files = list(files)
+        self._sizes = {}
+        self._xor_mask = os.urandom(16)
+        self._mask_key = _mask_key(self._xor_mask)
+
+        self._f = open(self._tmp_fp, "wb")
+        self._f.write(SNG_IDENTIFIER + struct.pack("<I", SNG_VERSION) + self._xor_mask)
+
+        pairs = b"".join(
+            _sng_string(key, "<i") + _sng_string(value, "<i")
+            for key, value in metadata.items()
+        )
+        self._f.write(struct.pack("<QQ", len(pairs) + 8, len(metadata)) + pairs)
+
+        # Placeholder index, rewritten by close()
+        self._index_pos = self._f.tell()
+        self._f.write(self._index())
+        self._f.write(struct.pack("<Q", 0))
+        self._data_pos = self._f.tell()
+
+    def _index(self, offsets: dict = None):
+        entries = b"".join(
+            _sng_string(name, "<B")
+            + struct.pack("<QQ", self._sizes.get(name, 0), (offsets or {}).get(name, 0))
+            for name in self._files
+        )
+        return struct.pack("<QQ", len(entries) + 8, len(self._files)) + entries
+
+    def open(self, name: str):
+        """
+        Open the next member of the archive for writing.
+
+        Args:
+            name (str): Filename inside the song folder, the next one of `files`
+
+        Returns:
+            Binary file handle that masks the contents as they're written
+
+        Raises:
+            ValueError: If members are written out of order
+        """
+        expected = self._files[len(self._sizes)]
+        if name != expected:
+            raise ValueError(f"Expected .sng member {expected!r}, got {name!r}")
+        return io.BufferedWriter(_SngMemberWriter(self, name), MASK_BLOCK)
+
+    def close(self):
+        if len(self._sizes) != len(self._files):
+            raise ValueError(f"Missing .sng members: {self._files[len(self._sizes):]}")
+
+        offsets = {}
+        offset = self._data_pos
+        for name in self._files:
+            offsets[name] = offset
+            offset += self._sizes[name]
+        self._f.seek(self._index_pos)
+        self._f.write(self._index(offsets))
+        self._f.write(struct.pack("<Q", offset - self._data_pos))
+        self._f.close()
+        os.replace(self._tmp_fp, self.path)
+
+    def abort(self):
+        self._f.close()
+        os.remove(self._tmp_fp)
+
+
+def _sng_string(text: str, length_format: str):
+    data = text.encode()
+    return struct.pack(length_format, len(data)) + data
+
+
+@contextmanager
+def open_package(path: str, package_format: str, metadata: dict, files: list):
+    """
+    Create a song archive, removing the partial file if writing fails.
+
+    Args:
+        path (str): Path of the archive to create
+        package_format (str): "zip" or "sng"
+        metadata (dict): song.ini values keyed by name
+        files (list): Filenames of the members besides song.ini, in the order
+            they're written
+
+    Yields:
+        ZipPackage | SngPackage: The archive, whose `open` method adds a member
+    """
+    if package_format == "zip":
+        package = ZipPackage(path, metadata)
+    elif package_format == "sng":
+        package = SngPackage(path, metadata, files)
+    else:
+        raise ValueError(
+            f"Unknown package format {package_format!r}, expected one of {PACKAGE_FORMATS}"
+        )
+
+    try:
+        yield package
+    except BaseException:
+        package.abort()
+        raise
+    package.close()
+
+
+def read_sng_header(f):
+    """
+    Read the header, metadata and file index of a .sng container.
+
+    Args:
+        f: Binary file handle at the start of the container
+
+    Returns:
+        tuple: (xor_mask, metadata dict, {filename: (size, offset)})
+
+    Raises:
+        ValueError: If the file isn't a .sng container
+    """
+    if f.read(6) != SNG_IDENTIFIER:
+        raise ValueError("Not a .sng file")
+    (version,) = struct.unpack("<I", f.read(4))
+    if version != SNG_VERSION:
+        raise ValueError(f"Unsupported .sng version {version}")
+    xor_mask = f.read(16)
+
+    def read_string(length_format):
+        (length,) = struct.unpack(length_format, f.read(struct.calcsize(length_format)))
+        return f.read(length).decode()
+
+    _, count = struct.unpack("<QQ", f.read(16))
+    metadata = {}
+    for _ in range(count):
+        key = read_string("<i")
+        metadata[key] = read_string("<i")
+
+    _, count = struct.unpack("<QQ", f.read(16))
+    files = {}
+    for _ in range(count):
+        name = read_string("<B")
+        files[name] = struct.unpack("<QQ", f.read(16))
+    return xor_mask, metadata, files
+
+
+@contextmanager
+def open_member(path: str, name: str):
+    """
+    Open a file of a song archive for reading.
+
+    Args:
+        path (str): Path of a zip or .sng archive
+        name (str): Filename inside the song folder
+
+    Yields:
+        Binary file handle with the unmasked contents
+
+    Raises:
+        KeyError: If the archive has no such file
+    """
+    if not path.endswith(".sng"):
+        with zipfile.ZipFile(path) as archive, archive.open(name) as f:
+            yield f
+        return
+
+    with open(path, "rb") as f:
+        xor_mask, _, files = read_sng_header(f)
+        size, offset = files[name]
+        reader = _SngMemberReader(f, size, offset, _mask_key(xor_mask))
+        with io.BufferedReader(reader, MASK_BLOCK) as member:
+            yield member
@@ -0,0 +1,161 @@
+"""
+Module for rendering long songs in parallel time segments.
+Splits the drum track into overlapping segments at quiet points between notes,
+renders the segments concurrently with one synthesizer process each, and crossfades
+them back together at sample-accurate offsets. Requires NumPy.
+"""
+
+import logging
+import math
+import os
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+
+from mido import MidiFile
+
+from ace.drum_renderer import SAMPLE_RATE, SAMPLE_SPACING, read_wav
+from ace.preview import cut_ticks, scan_timing
+from ace.tempo_map import TempoMap
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Shortest segment worth its own synthesizer process
+MIN_SEGMENT_SECONDS = 30.0
+
+# Reverb FluidSynth adds past the ring of the longest hit
+REVERB_SECONDS = 2.0
+
+# Notes started this long before a segment are rendered with it, so that the ring of
+# earlier hits, crashes included, is already sounding in full where it's crossfaded
+# with the previous segment
+PREROLL_SECONDS = SAMPLE_SPACING + REVERB_SECONDS
+
+# Length of the crossfade centered on each segment boundary
+CROSSFADE_SECONDS = 0.05
+
+
+def plan_segments(
+    midi: MidiFile,
+    jobs: int,
+    min_seconds: float = MIN_SEGMENT_SECONDS,
+    timing: tuple = None,
+):
+    """
+    Pick the boundaries of the time segments of a drum track.
+
+    The song is split into up to `jobs` segments of roughly equal length, none
+    shorter than min_seconds. Each boundary is moved to the middle of the gap
+    between the two drum notes around it, where only the ring of earlier hits is
+    crossfaded.
+
+    Args:
+        midi (MidiFile): Drum MIDI from `Charter.extract_drums` or a split MIDI file
+        jobs (int): Largest number of segments
+        min_seconds (float): Shortest segment length in seconds
+        timing (tuple, optional): Timing of midi from `preview.scan_timing`
+
+    Returns:
+        list: Increasing absolute MIDI ticks, from 0 to the end of the track. A song
+            too short to split gives [0, end]
+    """
+    tempo_map, onsets, end_tick = timing or scan_timing(midi)
+    song_length = tempo_map.tick_to_seconds(end_tick)
+    count = max(1, min(jobs, int(song_length // min_seconds)))
+
+    boundaries = [0]
+    for k in range(1, count):
+        target = tempo_map.seconds_to_tick(song_length * k / count)
+        i = bisect_left(onsets, target)
+        if 0 < i < len(onsets):
+            tick = (onsets[i - 1] + onsets[i]) // 2
+        else:
+            tick = round(target)
+        if boundaries[-1] < tick < end_tick:
+            boundaries.append(tick)
+    boundaries.append(end_tick)
+    return boundaries
+
+
+def render_segments(
+    midi: MidiFile,
+    boundaries: list,
+    render,
+    tmp_dir: str,
+    jobs: int = None,
+    tempo_map: TempoMap = None,
+):
+    """
+    Render a drum track segment by segment in parallel, then stitch the segments.
+
+    Each segment is cut from PREROLL_SECONDS before its start boundary to
+    CROSSFADE_SECONDS past its end boundary, with the tempo state in effect at its
+    start, and rendered by its own call of `render`. Segments are placed at the
+    sample their first tick falls on and crossfaded linearly over CROSSFADE_SECONDS
+    around each boundary.
+
+    Args:
+        midi (MidiFile): Drum MIDI from `Charter.extract_drums` or a split MIDI file
+        boundaries (list): Segment boundaries in MIDI ticks, from `plan_segments`
+        render (callable): Renders a MIDI file path to a 16-bit WAV file path at
+            SAMPLE_RATE, e.g. by running FluidSynth. Called from worker threads
+        tmp_dir (str): Directory for the segment MIDI and WAV files
+        jobs (int, optional): Number of segments rendered at the same time.
+            Defaults to the CPU count
+        tempo_map (TempoMap, optional): Tempo map of midi, e.g. from
+            `preview.scan_timing`
+
+    Returns:
+        ndarray: float32 samples of the whole song, shaped (frames, channels)
+    """
+    if tempo_map is None:
+        track = midi.tracks[0] if len(midi.tracks) == 1 else midi.merged_track
+        tempo_map = TempoMap.from_track(track, midi.ticks_per_beat)
+
+    def frame(tick):
+        return round(tempo_map.tick_to_seconds(tick) * SAMPLE_RATE)
+
+    def tick_at(seconds):
+        return math.ceil(tempo_map.seconds_to_tick(max(0.0, seconds)))
+
+    # Cut and save the segments here, only the renders run in the pool
+    segments = []
+    last = len(boundaries) - 2
+    for k in range(last + 1):
+        start, end = boundaries[k], boundaries[k + 1]
+        if k > 0:
+            start = tick_at(tempo_map.tick_to_seconds(start) - PREROLL_SECONDS)
+        if k < last:
+            end = tick_at(tempo_map.tick_to_seconds(end) + CROSSFADE_SECONDS)
+        midi_fp = os.path.join(tmp_dir, f"segment_{k}.mid")
+        wav_fp = os.path.join(tmp_dir, f"segment_{k}.wav")
+        cut_ticks(midi, start, end).save(midi_fp)
+        segments.append((frame(start), midi_fp, wav_fp))
+
+    def render_segment(segment):
+        _, midi_fp, wav_fp = segment
+        render(midi_fp, wav_fp)
+        return read_wav(wav_fp)
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        audios = list(executor.map(render_segment, segments))
+    logger.info(f"Rendered {len(segments)} segments in parallel")
+
+    half_fade = max(1, round(CROSSFADE_SECONDS * SAMPLE_RATE) // 2)
+    frames = max(offset + len(audio) for (offset, _, _), audio in zip(segments, audios))
+    out = np.zeros((frames, max(audio.shape[1] for audio in audios)), np.float32)
+    for k, ((offset, _, _), audio) in enumerate(zip(segments, audios)):
+        positions = np.arange(offset, offset + len(audio), dtype=np.float32)
+        gain = np.ones(len(audio), dtype=np.float32)
+        if k > 0:
+            fade_in = frame(boundaries[k]) - half_fade
+            gain *= np.clip((positions - fade_in) / (2 * half_fade), 0, 1)
+        if k < last:
+            fade_out = frame(boundaries[k + 1]) - half_fade
+            gain *= np.clip(1 - (positions - fade_out) / (2 * half_fade), 0, 1)
+        out[offset : offset + len(audio)] += audio * gain[:, None]
+    return out
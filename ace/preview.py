@@ -0,0 +1,170 @@
+"""
+Module for the audition clips of the song browser.
+Picks the preview window of a song, from its densest stretch of drum notes or a
+given time range, and cuts the drum track down to that window so only those
+seconds are rendered.
+"""
+
+import math
+
+from mido import MetaMessage, MidiFile, MidiTrack
+
+from ace.mapping import DRUM_CHANNEL, DRUM_MAPPING
+from ace.tempo_map import TempoMap
+
+# Seconds of audio in an automatically picked preview
+DEFAULT_PREVIEW_LENGTH = 30.0
+
+# Messages whose latest value before the window still applies inside it
+_STATE_TYPES = ("set_tempo", "time_signature", "program_change", "control_change")
+
+
+def _state_key(msg):
+    if msg.type == "control_change":
+        return msg.type, msg.channel, msg.control
+    return msg.type, getattr(msg, "channel", None)
+
+
+def scan_timing(midi: MidiFile):
+    """
+    Scan a drum MIDI file once for the timing of its preview and render segments.
+
+    `Charter` scans each song once and hands the result to `densest_window`,
+    `cut_midi` and `ace.parallel_render`, which otherwise scan the track themselves.
+
+    Args:
+        midi (MidiFile): Drum MIDI from `Charter.extract_drums` or a split MIDI file
+
+    Returns:
+        tuple: (tempo_map, onset_ticks, end_tick), the TempoMap of the track, the
+            sorted absolute ticks at which its charted drum notes start and the
+            absolute tick of its end
+    """
+    track = midi.tracks[0] if len(midi.tracks) == 1 else midi.merged_track
+    tempo_changes = []
+    onset_ticks = []
+    abs_tick = 0
+    for msg in track:
+        abs_tick += msg.time
+        if msg.type == "set_tempo":
+            tempo_changes.append((abs_tick, msg.tempo))
+        elif (
+            msg.type == "note_on"
+            and msg.velocity > 0
+            and msg.channel == DRUM_CHANNEL
+            and msg.note in DRUM_MAPPING
+        ):
+            onset_ticks.append(abs_tick)
+
+    return TempoMap(tempo_changes, midi.ticks_per_beat), onset_ticks, abs_tick
+
+
+def densest_window(
+    midi: MidiFile, length: float = DEFAULT_PREVIEW_LENGTH, timing: tuple = None
+):
+    """
+    Pick the preview window holding the most drum notes.
+
+    The window starts on the first note of the densest stretch, moved back if that
+    would run past the end of the song.
+
+    Args:
+        midi (MidiFile): Drum MIDI from `Charter.extract_drums` or a split MIDI file
+        length (float): Seconds of the window
+        timing (tuple, optional): Timing of midi from `scan_timing`
+
+    Returns:
+        tuple | None: (start, end) of the window in seconds, rounded to
+            milliseconds, or None for a track without drum notes or length
+    """
+    tempo_map, onset_ticks, end_tick = timing or scan_timing(midi)
+    onsets = [tempo_map.tick_to_seconds(tick) for tick in onset_ticks]
+    song_length = tempo_map.tick_to_seconds(end_tick)
+    if not onsets or song_length <= 0:
+        return None
+    if song_length <= length:
+        return 0.0, round(song_length, 3)
+
+    # Two pointers over the sorted onsets: [onsets[first], onsets[first] + length)
+    best_start, best_count = 0.0, 0
+    first = 0
+    for last, onset in enumerate(onsets):
+        while onset - onsets[first] >= length:
+            first += 1
+        if last - first + 1 > best_count:
+            best_start, best_count = onsets[first], last - first + 1
+
+    # Round down so the first note of the stretch stays inside the window
+    start = math.floor(min(best_start, song_length - length) * 1000) / 1000
+    return start, round(start + length, 3)
+
+
+def cut_midi(midi: MidiFile, start: float, end: float, tempo_map: TempoMap = None):
+    """
+    Cut a drum MIDI file down to the messages of a time window.
+
+    Args:
+        midi (MidiFile): Drum MIDI from `Charter.extract_drums` or a split MIDI file
+        start (float): Start of the window in seconds
+        end (float): End of the window in seconds
+        tempo_map (TempoMap, optional): Tempo map of midi, e.g. from `scan_timing`
+
+    Returns:
+        MidiFile: A single-track MIDI file ending at the end of the window, see
+            `cut_ticks`
+    """
+    if tempo_map is None:
+        track = midi.tracks[0] if len(midi.tracks) == 1 else midi.merged_track
+        tempo_map = TempoMap.from_track(track, midi.ticks_per_beat)
+    # Ticks are exact at note times, so only round up past float error
+    start_tick = math.ceil(tempo_map.seconds_to_tick(start) - 1e-6)
+    end_tick = max(start_tick, math.ceil(tempo_map.seconds_to_tick(end) - 1e-6))
+    return cut_ticks(midi, start_tick, end_tick)
+
+
+def cut_ticks(midi: MidiFile, start_tick: int, end_tick: int):
+    """
+    Cut a drum MIDI file down to the messages of a range of ticks.
+
+    The range starts at tick 0 of the cut track, with the tempo, time signature and
+    controller state in effect at its start, so it plays back at the same speed
+    and sound as in the full song.
+
+    Args:
+        midi (MidiFile): Drum MIDI from `Charter.extract_drums` or a split MIDI file
+        start_tick (int): First absolute MIDI tick of the range
+        end_tick (int): Absolute MIDI tick the range ends before
+
+    Returns:
+        MidiFile: A single-track MIDI file ending at end_tick
+    """
+    track = midi.tracks[0] if len(midi.tracks) == 1 else midi.merged_track
+    state = {}
+    window = []
+    abs_tick = 0
+    for msg in track:
+        abs_tick += msg.time
+        if abs_tick >= end_tick:
+            break
+        if msg.type == "end_of_track":
+            continue
+        if abs_tick < start_tick:
+            if msg.type in _STATE_TYPES:
+                state[_state_key(msg)] = msg
+        else:
+            window.append((abs_tick - start_tick, msg))
+
+    out_mid = MidiFile(ticks_per_beat=midi.ticks_per_beat)
+    cut_track = MidiTrack()
+    out_mid.tracks.append(cut_track)
+    for msg in state.values():
+        cut_track.append(msg.copy(time=0))
+
+    last_tick = 0
+    for tick, msg in window:
+        cut_track.append(msg.copy(time=tick - last_tick))
+        last_tick = tick
+    cut_track.append(
+        MetaMessage("end_of_track", time=end_tick - start_tick - last_tick)
+    )
+    return out_mid
@@ -0,0 +1,77 @@
+"""
+Module for cleaning up humanized drum hits before they are charted.
+Snaps the hits to a note subdivision, rounding to the nearest grid line, and merges
+duplicate and flammed hits on the same lane into one note. `vectorized` holds the
+array versions used by the NumPy path.
+"""
+
+from ace.mapping import CHART_RESOLUTION
+
+
+def grid_ticks(subdivision: int):
+    """
+    Size of the grid of a note subdivision in chart ticks.
+
+    Args:
+        subdivision (int): Notes per whole note, e.g. 16 for sixteenth notes or 12
+            for eighth note triplets
+
+    Returns:
+        int: Chart ticks between grid lines
+
+    Raises:
+        ValueError: If the subdivision doesn't fit the chart resolution
+    """
+    if subdivision < 1 or CHART_RESOLUTION * 4 % subdivision:
+        raise ValueError(
+            f"Can't quantize to 1/{subdivision} notes at {CHART_RESOLUTION} ticks per beat"
+        )
+    return CHART_RESOLUTION * 4 // subdivision
+
+
+def snap_tick(abs_tick: int, ticks_per_beat: int, grid: int):
+    """
+    Rescale an absolute MIDI tick to the nearest grid line in chart ticks.
+
+    Exactly halfway between two grid lines rounds to the later one.
+
+    Args:
+        abs_tick (int): Absolute MIDI tick
+        ticks_per_beat (int): MIDI file resolution
+        grid (int): Grid size in chart ticks, from `grid_ticks`
+
+    Returns:
+        int: The chart tick of the grid line
+    """
+    cell = ticks_per_beat * grid
+    return (2 * abs_tick * CHART_RESOLUTION + cell) // (2 * cell) * grid
+
+
+def merge_hits(hits: list, flam_ticks: int = 0):
+    """
+    Merge the duplicate and flammed hits of each lane.
+
+    Each run of hits on one lane that are at most flam_ticks apart becomes one note
+    at the tick of its first hit, a cymbal if any hit of the run was. With
+    flam_ticks 0 only hits on the same tick are merged.
+    `vectorized.merge_hits` merges the same hits from arrays.
+
+    Args:
+        hits (list): (chart_tick, lane, flags) triples in chart order
+        flam_ticks (int): Largest gap in chart ticks between merged hits
+
+    Returns:
+        list: The merged (chart_tick, lane, flags) triples in chart order
+    """
+    last_tick = {}
+    first = {}
+    merged = []
+    for tick, lane, flags in hits:
+        if lane in last_tick and tick - last_tick[lane] <= flam_ticks:
+            i = first[lane]
+            merged[i] = (merged[i][0], lane, merged[i][2] | flags)
+        else:
+            first[lane] = len(merged)
+            merged.append((tick, lane, flags))
+        last_tick[lane] = tick
+    return merged
@@ -0,0 +1,327 @@
+"""
+Module for the long-lived local conversion service.
+Keeps Charters, the imports and the soundfont state resident in one process and
+serves conversion jobs over localhost HTTP from a bounded queue, so tools send a
+request per song instead of starting `python -m ace` each time.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from rich import print
+
+from ace.charter import Charter
+from ace.client import DEFAULT_HOST, DEFAULT_PORT
+
+logger = logging.getLogger(__name__)
+
+# Jobs waiting for a worker before new ones are turned away
+DEFAULT_QUEUE_SIZE = 16
+
+# Largest request body accepted, a job is a few paths
+MAX_REQUEST_BYTES = 64 * 1024
+
+# Names the service answers to besides the address it listens on. Requests naming
+# any other host come from a page whose DNS name was rebound to this machine
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+
+class _Job:
+    __slots__ = ("request", "done", "result")
+
+    def __init__(self, request: dict):
+        self.request = request
+        self.done = threading.Event()
+        self.result = None
+
+
+class ConversionService:
+    """
+    Pool of worker threads converting queued jobs with resident Charters.
+
+    Each worker keeps one Charter for its whole life. The soundfont is fetched, and
+    the one-shot drum samples of the "numpy" renderer loaded, before the first job,
+    so no job pays for them.
+
+    Args:
+        out_dir (str): Default directory for the outputs of jobs that don't name one
+        charter_options (dict, optional): Keyword arguments for the Charters
+        workers (int): Number of conversions run at the same time
+        queue_size (int): Number of jobs that can wait for a worker
+    """
+
+    def __init__(
+        self,
+        out_dir: str,
+        charter_options: dict = None,
+        workers: int = 1,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+    ):
+        if workers < 1 or queue_size < 1:
+            raise ValueError("workers and queue_size must be at least 1")
+        self.out_dir = out_dir
+        self.charter_options = charter_options or {}
+        self.workers = workers
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.completed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        """
+        Warm up the shared state, then start the worker threads.
+        """
+        Charter(**self.charter_options).warm_up()
+
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f"ace-worker-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """
+        Let the workers finish the queued jobs, then stop them.
+        """
+        for _ in self._threads:
+            self.jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, request: dict):
+        """
+        Queue a conversion job.
+
+        Args:
+            request (dict): "input" MIDI file path, and optionally "output_dir" and
+                "save_split_midi"
+
+        Returns:
+            _Job: The queued job, whose `done` event is set once `result` is filled
+
+        Raises:
+            ValueError: If the request is malformed
+            queue.Full: If the queue is full
+        """
+        if not isinstance(request.get("input"), str):
+            raise ValueError('"input" must be the path of a MIDI file')
+        if not isinstance(request.get("output_dir", ""), str):
+            raise ValueError('"output_dir" must be a directory path')
+        if not isinstance(request.get("save_split_midi", False), bool):
+            raise ValueError('"save_split_midi" must be true or false')
+
+        job = _Job(request)
+        self.jobs.put_nowait(job)
+        return job
+
+    def status(self):
+        """
+        Describe the load of the service.
+
+        Returns:
+            dict: Worker count, queued jobs and completed and failed conversions
+        """
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queued": self.jobs.qsize(),
+                "queue_size": self.jobs.maxsize,
+                "completed": self.completed,
+                "failed": self.failed,
+            }
+
+    def _work(self):
+        charter = Charter(**self.charter_options)
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            job.result = self._convert(charter, job.request)
+            with self._lock:
+                self.completed += 1
+                self.failed += job.result["error"] is not None
+            job.done.set()
+
+    def _convert(self, charter: Charter, request: dict):
+        in_file_dir = request["input"]
+        start = time.perf_counter()
+        error = None
+        try:
+            charter.convert(
+                in_file_dir=in_file_dir,
+                out_dir=request.get("output_dir") or self.out_dir,
+                ch_out_dir=charter.song_folder(in_file_dir),
+                save_split_midi=request.get("save_split_midi", False),
+            )
+        except Exception as e:
+            logger.exception(f"Error: Failed to convert {in_file_dir}")
+            error = f"{type(e).__name__}: {e}"
+
+        return {
+            "input": in_file_dir,
+            "song_folder": charter.song_folder(in_file_dir),
+            "error": error,
+            "seconds": time.perf_counter() - start,
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    JSON endpoints: POST /convert, GET /status and POST /shutdown.
+
+    Only requests naming a local host, or the address the server listens on, are
+    served, and POST bodies must be sent as application/json, so web pages can't
+    reach the endpoints through the browser.
+    """
+
+    server_version = "ACE"
+
+    def log_message(self, format, *args):
+        logger.info(f"{self.address_string()} {format % args}")
+
+    def _reply(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _host_allowed(self, value: str):
+        try:
+            hostname = urlsplit(f"//{value}").hostname
+        except ValueError:
+            return False
+        return hostname in LOCAL_HOSTS or hostname == self.server.server_address[0]
+
+    def _check_origin(self):
+        """
+        Turn away requests a web page could have sent: ones naming a foreign Host,
+        for DNS rebinding, and ones from a foreign Origin.
+
+        Returns:
+            bool: True if the request may be served, otherwise it's been answered
+        """
+        if not self._host_allowed(self.headers.get("Host", "")):
+            self._reply(403, {"message": "Host not allowed"})
+            return False
+        origin = self.headers.get("Origin")
+        if origin is not None and not self._host_allowed(urlsplit(origin).netloc):
+            self._reply(403, {"message": "Origin not allowed"})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._check_origin():
+            return
+        if self.path == "/status":
+            self._reply(200, self.server.service.status())
+        else:
+            self._reply(404, {"message": f"Unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        if not self._check_origin():
+            return
+        # Pages can only send JSON cross-origin after a CORS preflight, which the
+        # service never grants, so form and text/plain posts are turned away here
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip()
+        if content_type.lower() != "application/json":
+            self._reply(415, {"message": "Content-Type must be application/json"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_REQUEST_BYTES:
+            self._reply(413, {"message": "Request body too large"})
+            return
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("expected a JSON object")
+        except ValueError as e:
+            self._reply(400, {"message": f"Invalid JSON: {e}"})
+            return
+
+        if self.path == "/convert":
+            try:
+                job = self.server.service.submit(request)
+            except ValueError as e:
+                self._reply(400, {"message": str(e)})
+                return
+            except queue.Full:
+                self._reply(503, {"message": "Job queue is full, retry later"})
+                return
+            job.done.wait()
+            self._reply(200 if job.result["error"] is None else 500, job.result)
+        elif self.path == "/shutdown":
+            self._reply(200, {"message": "Shutting down"})
+            # shutdown() waits for serve_forever(), so it can't run on this thread
+            threading.Thread(target=self.server.shutdown).start()
+        else:
+            self._reply(404, {"message": f"Unknown endpoint {self.path}"})
+
+
+def make_server(
+    service: ConversionService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT
+):
+    """
+    Bind the HTTP server of a service.
+
+    Args:
+        service (ConversionService): Service that runs the jobs
+        host (str): Address to listen on. Keep it on localhost: any client that can
+            reach the port can read and write files as the service's user
+        port (int): Port to listen on, 0 for any free port
+
+    Returns:
+        ThreadingHTTPServer: The bound server, with the service as `server.service`
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def serve(
+    out_dir: str,
+    charter_options: dict = None,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    workers: int = 1,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+):
+    """
+    Run the conversion service until it's stopped with Ctrl+C or POST /shutdown.
+
+    Args:
+        out_dir (str): Default directory for the outputs of jobs that don't name one
+        charter_options (dict, optional): Keyword arguments for the Charters
+        host (str): Address to listen on
+        port (int): Port to listen on
+        workers (int): Number of conversions run at the same time
+        queue_size (int): Number of jobs that can wait for a worker
+    """
+    if not os.path.isdir(out_dir):
+        raise FileNotFoundError(f"Output directory does not exist: {out_dir}")
+
+    service = ConversionService(out_dir, charter_options, workers, queue_size)
+    service.start()
+    with make_server(service, host, port) as server:
+        host, port = server.server_address[:2]
+        logger.info(f"Serving conversions on http://{host}:{port}")
+        print(
+            f"[bold green]✔ Serving conversions on:[/bold green] [cyan]http://{host}:{port}[/cyan]"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    service.stop()
+    logger.info("Stopped serving conversions")
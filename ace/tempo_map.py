@@ -0,0 +1,182 @@
+"""
+Module for the tempo map of a song.
+Indexes the tempo changes once, so MIDI ticks, seconds and chart ticks can be
+converted into each other with a binary search instead of rescanning the messages.
+"""
+
+from bisect import bisect_right
+
+from ace.mapping import CHART_RESOLUTION
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+# Microseconds per beat before the first set_tempo, 120 BPM
+DEFAULT_TEMPO = 500000
+
+
+def chart_bpm(tempo: int):
+    """
+    Convert a MIDI tempo to a .chart "B" value, rounded to the nearest 0.001 BPM.
+
+    Args:
+        tempo (int): Microseconds per beat
+
+    Returns:
+        int: BPM x 1000
+    """
+    return (60_000_000_000 + tempo // 2) // tempo
+
+
+class TempoMap:
+    """
+    Sorted tempo changes of a song with the time in seconds at which each starts.
+
+    Ticks before the first tempo change play at DEFAULT_TEMPO. When several tempo
+    changes share a tick, the last one wins.
+
+    Args:
+        changes: Iterable of (abs_tick, tempo) pairs in tick order
+        ticks_per_beat (int): MIDI file resolution
+    """
+
+    def __init__(self, changes, ticks_per_beat: int):
+        self.ticks_per_beat = ticks_per_beat
+
+        # Tempo changes that are in the song, one per tick
+        self.changes = []
+        for abs_tick, tempo in changes:
+            if self.changes and self.changes[-1][0] == abs_tick:
+                self.changes[-1] = (abs_tick, tempo)
+            else:
+                self.changes.append((abs_tick, tempo))
+
+        # Segments covering every tick from 0, each starting at ticks[i] and seconds[i]
+        self.ticks = [0]
+        self.tempos = [DEFAULT_TEMPO]
+        self.seconds = [0.0]
+        for abs_tick, tempo in self.changes:
+            if abs_tick == 0:
+                self.tempos[0] = tempo
+                continue
+            self.seconds.append(self.tick_to_seconds(abs_tick))
+            self.ticks.append(abs_tick)
+            self.tempos.append(tempo)
+
+        self._arrays = None
+
+    @classmethod
+    def from_track(cls, track, ticks_per_beat: int):
+        """
+        Build the tempo map of a delta-timed track.
+
+        Args:
+            track: Iterable of mido messages with delta times
+            ticks_per_beat (int): MIDI file resolution
+
+        Returns:
+            TempoMap: The tempo map of the track
+        """
+        changes = []
+        abs_tick = 0
+        for msg in track:
+            abs_tick += msg.time
+            if msg.type == "set_tempo":
+                changes.append((abs_tick, msg.tempo))
+        return cls(changes, ticks_per_beat)
+
+    def tick_to_seconds(self, tick):
+        """
+        Convert an absolute MIDI tick to seconds.
+
+        Args:
+            tick: Absolute MIDI tick, may be fractional
+
+        Returns:
+            float: Time of the tick in seconds
+        """
+        i = bisect_right(self.ticks, tick) - 1
+        return self.seconds[i] + (tick - self.ticks[i]) * self.tempos[i] / (
+            self.ticks_per_beat * 1e6
+        )
+
+    def seconds_to_tick(self, seconds: float):
+        """
+        Convert seconds to an absolute MIDI tick.
+
+        Args:
+            seconds (float): Time in seconds, clamped to 0
+
+        Returns:
+            float: The MIDI tick at that time, fractional between ticks
+        """
+        i = max(0, bisect_right(self.seconds, seconds) - 1)
+        return self.ticks[i] + max(0.0, seconds - self.seconds[i]) * (
+            self.ticks_per_beat * 1e6 / self.tempos[i]
+        )
+
+    def to_chart_tick(self, tick, resolution: int = CHART_RESOLUTION):
+        """
+        Rescale an absolute MIDI tick to a chart tick.
+
+        Args:
+            tick: Absolute MIDI tick
+            resolution (int): Chart ticks per beat
+
+        Returns:
+            int: The chart tick, truncated
+        """
+        return int(tick * resolution // self.ticks_per_beat)
+
+    def seconds_to_chart_tick(self, seconds: float, resolution: int = CHART_RESOLUTION):
+        """
+        Convert seconds to a chart tick.
+
+        Args:
+            seconds (float): Time in seconds
+            resolution (int): Chart ticks per beat
+
+        Returns:
+            int: The chart tick at that time, truncated
+        """
+        return self.to_chart_tick(self.seconds_to_tick(seconds), resolution)
+
+    def sync_items(self, resolution: int = CHART_RESOLUTION):
+        """
+        List the SyncTrack "B" events of the tempo changes in the song.
+
+        Args:
+            resolution (int): Chart ticks per beat
+
+        Returns:
+            list: (chart_tick, "B <value>") pairs in tick order
+        """
+        return [
+            (self.to_chart_tick(abs_tick, resolution), f"B {chart_bpm(tempo)}")
+            for abs_tick, tempo in self.changes
+        ]
+
+    def ticks_to_seconds(self, abs_ticks):
+        """
+        Convert an array of absolute MIDI ticks to seconds. Requires NumPy.
+
+        Args:
+            abs_ticks: Integer array of absolute MIDI ticks
+
+        Returns:
+            ndarray: Time of each tick in seconds
+        """
+        if self._arrays is None:
+            self._arrays = (
+                np.asarray(self.ticks, dtype=np.int64),
+                np.asarray(self.tempos, dtype=np.float64),
+                np.asarray(self.seconds, dtype=np.float64),
+            )
+        ticks, tempos, seconds = self._arrays
+
+        seg = np.searchsorted(ticks, abs_ticks, side="right") - 1
+        return seconds[seg] + (abs_ticks - ticks[seg]) * tempos[seg] / (
+            self.ticks_per_beat * 1e6
+        )
@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from ace.batch import convert_file, find_midi_files, run_batch
+from ace.charter import Charter
+from ace.tests.test_translate import _write_sample_midi
+
+
+class TestBatch(unittest.TestCase):
+    """Tests for batch conversion."""
+
+    def setUp(self):
+        """Set up a small MIDI library."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.library = os.path.join(self.tmp_dir.name, "library")
+        self.out_dir = os.path.join(self.tmp_dir.name, "out")
+        os.makedirs(os.path.join(self.library, "album"))
+        os.makedirs(self.out_dir)
+
+        self.good = os.path.join(self.library, "album", "good_song.mid")
+        self.bad = os.path.join(self.library, "bad_song.MID")
+        _write_sample_midi(self.good)
+        with open(self.bad, "wb") as f:
+            f.write(b"not a midi file")
+        with open(os.path.join(self.library, "notes.txt"), "w") as f:
+            f.write("ignored")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_find_midi_files(self):
+        """Test that directories, files and globs are expanded without duplicates."""
+        self.assertEqual(find_midi_files([self.library]), [self.bad, self.good])
+        self.assertEqual(
+            find_midi_files([os.path.join(self.library, "**", "*.mid"), self.good]),
+            [self.good],
+        )
+        self.assertEqual(find_midi_files([os.path.join(self.library, "*.txt")]), [])
+
+    def test_song_folder_drops_any_midi_extension(self):
+        """Test that .midi inputs get the same song folder as .mid ones."""
+        charter = Charter()
+        self.assertEqual(
+            charter.song_folder("lib/my_song.midi"), "artist - My Song (ACE)"
+        )
+        self.assertEqual(
+            charter.song_folder("lib/My Song.MID"), "artist - My Song (ACE)"
+        )
+
+    def test_convert_file_reports_error(self):
+        """Test that a missing input is reported instead of exiting."""
+        missing = os.path.join(self.library, "missing.mid")
+        in_file_dir, error, metrics = convert_file(missing, self.out_dir)
+
+        self.assertEqual(in_file_dir, missing)
+        self.assertIn("FileNotFoundError", error)
+        self.assertIsNone(metrics)
+
+    @patch("ace.charter.Charter.generate_wav_file")
+    @patch("ace.batch.ProcessPoolExecutor", ThreadPoolExecutor)
+    def test_run_batch_continues_after_failure(self, mock_generate_wav):
+        """Test that one bad file doesn't stop the rest of the batch."""
+        failures = run_batch([self.library], self.out_dir, jobs=2)
+
+        self.assertEqual(list(failures), [self.bad])
+        self.assertTrue(
+            os.path.exists(
+                os.path.join(self.out_dir, "artist - Good Song (ACE)", "notes.chart")
+            )
+        )
+
+    @patch("ace.charter.Charter.generate_wav_file")
+    @patch("ace.batch.ProcessPoolExecutor", ThreadPoolExecutor)
+    def test_same_name_in_two_directories_fails(self, mock_generate_wav):
+        """Test that a file whose outputs would overwrite another's is a failure."""
+        other = os.path.join(self.library, "other", "Good_Song.midi")
+        os.makedirs(os.path.dirname(other))
+        _write_sample_midi(other)
+
+        failures = run_batch([self.library, other], self.out_dir, jobs=2)
+
+        self.assertEqual(list(failures), [other, self.bad])
+        self.assertIn("OutputCollision", failures[other])
+        self.assertIn(self.good, failures[other])
+        self.assertEqual(mock_generate_wav.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+
+from ace import vectorized
+from ace.mapping import DRUM_CHANNEL
+from benchmarks.run import compare, run_scenario
+from benchmarks.synthetic import count_events, generate_midi
+
+TINY = {
+    "seconds": 4,
+    "tracks": 3,
+    "notes_per_second": 10,
+    "tempo_changes": 3,
+    "ticks_per_beat": 96,
+}
+
+
+class TestSyntheticMidi(unittest.TestCase):
+    """Tests for the synthetic MIDI generator."""
+
+    def test_generate_midi(self):
+        """Test that the song has the requested shape."""
+        mid = generate_midi(**TINY)
+
+        self.assertEqual(mid.ticks_per_beat, 96)
+        self.assertEqual(len(mid.tracks), 4)
+        tempos = [msg for msg in mid.tracks[0] if msg.type == "set_tempo"]
+        self.assertEqual(len(tempos), 4)
+
+        for index, track in enumerate(mid.tracks[1:], start=1):
+            note_ons = [msg for msg in track if msg.type == "note_on"]
+            self.assertEqual(len(note_ons), 40)
+            channels = {msg.channel for msg in note_ons}
+            if index % 2:
+                self.assertEqual(channels, {DRUM_CHANNEL})
+            else:
+                self.assertNotIn(DRUM_CHANNEL, channels)
+
+    def test_generate_midi_is_seeded(self):
+        """Test that the same seed gives the same song."""
+        self.assertEqual(generate_midi(**TINY).tracks, generate_midi(**TINY).tracks)
+        self.assertNotEqual(
+            generate_midi(**TINY).tracks, generate_midi(**TINY, seed=1).tracks
+        )
+        self.assertEqual(count_events(generate_midi(**TINY)), 7 + 3 * (3 + 80))
+
+
+class TestBenchmarks(unittest.TestCase):
+    """Tests for the stage benchmarks."""
+
+    def test_run_scenario(self):
+        """Test that every stage reports its measurements."""
+        audio = "numpy" if vectorized.HAS_NUMPY else "none"
+        results = run_scenario(TINY, {}, audio, repeats=1)
+
+        self.assertEqual(list(results), ["split", "chart", "audio"][: len(results)])
+        self.assertEqual(
+            results["split"]["events"], count_events(generate_midi(**TINY))
+        )
+        for result in results.values():
+            self.assertGreater(result["events_per_second"], 0)
+            self.assertGreater(result["peak_bytes"], 0)
+
+    def test_compare(self):
+        """Test that slowdowns and memory growth past the limit are reported."""
+        baseline = {
+            "small": {
+                "split": {"events_per_second": 1000, "peak_bytes": 100},
+                "chart": {"events_per_second": 1000, "peak_bytes": 100},
+            }
+        }
+        results = {
+            "small": {
+                "split": {"events_per_second": 900, "peak_bytes": 110},
+                "chart": {"events_per_second": 500, "peak_bytes": 300},
+                "audio": {"events_per_second": 1, "peak_bytes": 1},
+            }
+        }
+
+        regressions = compare(results, baseline, max_slowdown=1.5)
+
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all(r.startswith("small/chart") for r in regressions))
+
+
+if __name__ == "__main__":
+    unittest.main()
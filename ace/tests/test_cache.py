@@ -0,0 +1,196 @@
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from mido import MidiFile
+
+from ace.cache import OutputCache, file_digest
+from ace.charter import Charter
+from ace.tests.test_instruments import _write_band_midi
+from ace.tests.test_translate import _write_sample_midi
+
+
+def _write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+class TestOutputCache(unittest.TestCase):
+    """Tests for the content-addressed output cache."""
+
+    def setUp(self):
+        """Set up an empty cache in a temporary directory."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = OutputCache(os.path.join(self.tmp_dir.name, "cache"), max_bytes=25)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _file(self, name, data):
+        path = os.path.join(self.tmp_dir.name, name)
+        _write(path, data)
+        return path
+
+    def test_make_key(self):
+        """Test that keys only depend on their parts."""
+        self.assertEqual(
+            self.cache.make_key("abc", {1: (0, "K")}),
+            self.cache.make_key("abc", {1: (0, "K")}),
+        )
+        self.assertNotEqual(
+            self.cache.make_key("abc", {1: (0, "K")}),
+            self.cache.make_key("abc", {1: (1, "R")}),
+        )
+
+    def test_fetch_and_store(self):
+        """Test a miss, a store, then a hit copied to every output path."""
+        key = self.cache.make_key(file_digest(self._file("a.mid", b"midi")))
+        out_fps = [
+            os.path.join(self.tmp_dir.name, "out1"),
+            os.path.join(self.tmp_dir.name, "out2"),
+        ]
+
+        self.assertFalse(self.cache.fetch(key, out_fps))
+        self.cache.store(key, self._file("notes.chart", b"chart"))
+        self.assertTrue(self.cache.fetch(key, out_fps, link=True))
+
+        for out_fp in out_fps:
+            with open(out_fp, "rb") as f:
+                self.assertEqual(f.read(), b"chart")
+
+    def test_repeated_links_leave_no_temporary_files(self):
+        """Test that linking onto a path that is already the same file is skipped."""
+        key = self.cache.make_key("song")
+        other_key = self.cache.make_key("same drums")
+        src_fp = self._file("song.wav", b"wav")
+        out_fp = os.path.join(self.tmp_dir.name, "out.wav")
+
+        for _ in range(3):
+            self.cache.store(key, src_fp, link=True)
+            self.assertTrue(self.cache.alias(other_key, key))
+            self.assertTrue(self.cache.fetch(key, [out_fp], link=True))
+
+        for root, _, names in os.walk(self.tmp_dir.name):
+            self.assertEqual([name for name in names if name.endswith(".tmp")], [])
+        self.assertTrue(os.path.samefile(out_fp, src_fp))
+
+    def test_threads_write_the_same_key(self):
+        """Test that threads writing one entry at once never share a temporary file."""
+        key = self.cache.make_key("song")
+        barrier = threading.Barrier(8)
+
+        def write(i):
+            with self.cache.writer(key) as f:
+                barrier.wait()
+                f.write(bytes([i]) * 8)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(write, range(8)))
+
+        with open(self.cache._entry_fp(key), "rb") as f:
+            data = f.read()
+        self.assertIn(data, [bytes([i]) * 8 for i in range(8)])
+        entry_dir = os.path.dirname(self.cache._entry_fp(key))
+        self.assertEqual(os.listdir(entry_dir), [os.path.basename(f.name)])
+
+    def test_evicts_least_recently_used(self):
+        """Test that the oldest entries are evicted once max_bytes is exceeded."""
+        keys = [self.cache.make_key(i) for i in range(3)]
+        for i, key in enumerate(keys):
+            self.cache.store(key, self._file(f"{i}.wav", b"x" * 10))
+            # Give each entry a distinct modification time
+            os.utime(self.cache._entry_fp(key), ns=(i, i))
+        self.cache.evict()
+
+        out_fp = os.path.join(self.tmp_dir.name, "out")
+        self.assertFalse(self.cache.fetch(keys[0], [out_fp]))
+        self.assertTrue(self.cache.fetch(keys[1], [out_fp]))
+        self.assertTrue(self.cache.fetch(keys[2], [out_fp]))
+
+
+class TestConvertCache(unittest.TestCase):
+    """Tests for Charter.convert with an output cache."""
+
+    @patch("ace.charter.Charter.generate_wav_file")
+    @patch("ace.charter.Charter._fetch_soundfont")
+    def test_convert_skips_cached_song(self, mock_fetch_soundfont, mock_generate_wav):
+        """Test that a second conversion of the same song reuses every output."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            in_file_dir = os.path.join(tmp_dir, "song.mid")
+            _write_sample_midi(in_file_dir)
+            mock_fetch_soundfont.return_value = os.path.join(tmp_dir, "font.sf2")
+            _write(mock_fetch_soundfont.return_value, b"soundfont")
+
+            def fake_render(in_file_key, out_dir, ch_out_dir, midi=None):
+                _write(os.path.join(out_dir, ch_out_dir, "song.wav"), b"RIFF")
+
+            mock_generate_wav.side_effect = fake_render
+
+            cache = OutputCache(os.path.join(tmp_dir, "cache"))
+            for out_name in ("first", "second"):
+                out_dir = os.path.join(tmp_dir, out_name)
+                os.makedirs(out_dir)
+                charter = Charter(cache=cache)
+                with patch.object(
+                    charter, "extract_drums", wraps=charter.extract_drums
+                ) as mock_extract:
+                    charter.convert(in_file_dir, out_dir, "ch")
+
+            # Only the first conversion parsed and rendered anything
+            self.assertEqual(mock_extract.call_count, 0)
+            self.assertEqual(mock_generate_wav.call_count, 1)
+
+            for name in ("notes.chart", "song.wav"):
+                with open(os.path.join(tmp_dir, "first", "ch", name), "rb") as f:
+                    first = f.read()
+                with open(os.path.join(tmp_dir, "second", "ch", name), "rb") as f:
+                    self.assertEqual(f.read(), first)
+            self.assertTrue(
+                os.path.exists(os.path.join(tmp_dir, "second", "song_DRUMS.chart"))
+            )
+
+    @patch("ace.charter.Charter.generate_wav_file")
+    @patch("ace.charter.Charter._fetch_soundfont")
+    def test_convert_reuses_audio_of_same_drums(
+        self, mock_fetch_soundfont, mock_generate_wav
+    ):
+        """Test that an edit outside the drum channel re-charts without re-rendering."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            in_file_dir = os.path.join(tmp_dir, "band.mid")
+            _write_band_midi(in_file_dir)
+            mock_fetch_soundfont.return_value = os.path.join(tmp_dir, "font.sf2")
+            _write(mock_fetch_soundfont.return_value, b"soundfont")
+
+            def fake_render(in_file_key, out_dir, ch_out_dir, midi=None):
+                _write(os.path.join(out_dir, ch_out_dir, "song.wav"), b"RIFF")
+
+            mock_generate_wav.side_effect = fake_render
+
+            cache = OutputCache(os.path.join(tmp_dir, "cache"))
+            charter = Charter(cache=cache, instruments=("guitar",))
+            charts = []
+            for out_name in ("first", "second"):
+                out_dir = os.path.join(tmp_dir, out_name)
+                os.makedirs(out_dir)
+                charter.convert(in_file_dir, out_dir, "ch")
+                with open(os.path.join(out_dir, "ch", "notes.chart")) as f:
+                    charts.append(f.read())
+
+                # Move the first guitar note up to the top fret
+                midi = MidiFile(in_file_dir)
+                for msg in midi.tracks[2][1:3]:
+                    msg.note = 55
+                midi.save(in_file_dir)
+
+            self.assertEqual(mock_generate_wav.call_count, 1)
+            self.assertNotEqual(charts[0], charts[1])
+            self.assertTrue(
+                os.path.exists(os.path.join(tmp_dir, "second", "ch", "song.wav"))
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
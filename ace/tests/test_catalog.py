@@ -0,0 +1,155 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from ace.batch import run_batch
+from ace.cache import file_digest
+from ace.catalog import Catalog
+from ace.charter import Charter
+from ace.tests.test_translate import _write_sample_midi
+
+SETTINGS = {"renderer": "fluidsynth", "difficulties": []}
+
+
+def _fake_render(in_file_key, out_dir, ch_out_dir, midi=None):
+    """Write two seconds of silence as song.wav."""
+    with wave.open(os.path.join(out_dir, ch_out_dir, "song.wav"), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(8000)
+        wav.writeframes(bytes(2 * 16000))
+
+
+class TestCatalog(unittest.TestCase):
+    """Tests for the SQLite song catalog."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.catalog = Catalog(os.path.join(self.tmp_dir.name, "ace", "catalog.db"))
+
+    def tearDown(self):
+        self.catalog.close()
+        self.tmp_dir.cleanup()
+
+    def _record(self, source_path, content_hash, notes=10):
+        outputs = {}
+        for name in ("chart", "notes_chart", "wav"):
+            outputs[name] = os.path.join(self.tmp_dir.name, f"{source_path}.{name}")
+            with open(outputs[name], "w") as f:
+                f.write(name)
+        self.catalog.record(
+            source_path, content_hash, SETTINGS, outputs, {"ExpertDrums": notes}, 1.5
+        )
+        return outputs
+
+    def test_record_and_find(self):
+        """Test that a reconversion replaces the row of the same file and settings."""
+        self._record("a.mid", "h1")
+        self._record("a.mid", "h2", notes=12)
+
+        rows = self.catalog.find("a.mid")
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["source_path"], os.path.abspath("a.mid"))
+        self.assertEqual(rows[0]["content_hash"], "h2")
+        self.assertEqual(rows[0]["settings"], SETTINGS)
+        self.assertEqual(rows[0]["note_counts"], {"ExpertDrums": 12})
+        self.assertEqual(rows[0]["notes"], 12)
+        self.assertEqual(rows[0]["duration"], 1.5)
+
+    def test_known_and_duplicates(self):
+        """Test that known contents are found under any name while their outputs exist."""
+        self._record("a.mid", "h1")
+        outputs = self._record("b.mid", "h1")
+        self._record("c.mid", "h2")
+
+        self.assertEqual(
+            self.catalog.known("h1", SETTINGS, "a.mid")["source_path"],
+            os.path.abspath("a.mid"),
+        )
+        self.assertIsNone(self.catalog.known("h1", {"renderer": "numpy"}))
+        self.assertEqual(
+            self.catalog.duplicates(),
+            {"h1": [os.path.abspath("a.mid"), os.path.abspath("b.mid")]},
+        )
+        self.assertEqual(len(self.catalog.songs()), 3)
+
+        os.remove(outputs["wav"])
+        self.assertEqual(
+            self.catalog.known("h1", SETTINGS, "b.mid")["source_path"],
+            os.path.abspath("a.mid"),
+        )
+
+    def test_pickle(self):
+        """Test that a catalog is sent to workers without its connection."""
+        self._record("a.mid", "h1")
+        catalog = pickle.loads(pickle.dumps(self.catalog))
+        self.assertEqual(len(catalog.songs()), 1)
+        catalog.close()
+
+    def test_broken_database(self):
+        """Test that a database that can't be written doesn't raise."""
+        os.makedirs(os.path.join(self.tmp_dir.name, "broken.db"))
+        catalog = Catalog(os.path.join(self.tmp_dir.name, "broken.db"))
+        self.assertFalse(catalog.record("a.mid", "h1", SETTINGS, {}, {}))
+
+
+@patch("ace.charter.Charter.generate_wav_file", side_effect=_fake_render)
+class TestCatalogConversions(unittest.TestCase):
+    """Tests for cataloging conversions."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.library = os.path.join(self.tmp_dir.name, "library")
+        self.out_dir = os.path.join(self.tmp_dir.name, "out")
+        os.makedirs(self.library)
+        os.makedirs(self.out_dir)
+        self.song = os.path.join(self.library, "song.mid")
+        _write_sample_midi(self.song)
+        self.catalog = Catalog(os.path.join(self.tmp_dir.name, "catalog.db"))
+
+    def tearDown(self):
+        self.catalog.close()
+        self.tmp_dir.cleanup()
+
+    def test_convert_records_song(self, mock_generate_wav):
+        """Test that a conversion is recorded with its outputs, notes and length."""
+        charter = Charter(catalog=self.catalog, difficulties=("Easy",))
+        charter.convert(self.song, self.out_dir, "ch")
+
+        (row,) = self.catalog.find(self.song)
+        self.assertEqual(row["content_hash"], file_digest(self.song))
+        self.assertEqual(row["settings"], charter.settings())
+        self.assertEqual(
+            row["notes_chart_path"],
+            os.path.abspath(os.path.join(self.out_dir, "ch", "notes.chart")),
+        )
+        self.assertEqual(row["note_counts"], {"ExpertDrums": 12, "EasyDrums": 4})
+        self.assertEqual(row["notes"], 16)
+        self.assertEqual(row["duration"], 2.0)
+
+    @patch("ace.batch.ProcessPoolExecutor", ThreadPoolExecutor)
+    def test_batch_skips_known_files(self, mock_generate_wav):
+        """Test that unchanged files and their duplicates aren't converted again."""
+        options = {"catalog": self.catalog}
+        self.assertEqual(run_batch([self.library], self.out_dir, 2, False, options), {})
+        self.assertEqual(mock_generate_wav.call_count, 1)
+
+        shutil.copyfile(self.song, os.path.join(self.library, "copy.mid"))
+        run_batch([self.library], self.out_dir, 2, False, options, skip_known=True)
+        self.assertEqual(mock_generate_wav.call_count, 1)
+        self.assertEqual(self.catalog.duplicates(), {})
+
+        # A different setting converts everything again
+        options["difficulties"] = ()
+        run_batch([self.library], self.out_dir, 2, False, options, skip_known=True)
+        self.assertEqual(mock_generate_wav.call_count, 3)
+        self.assertEqual(len(self.catalog.duplicates()[file_digest(self.song)]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
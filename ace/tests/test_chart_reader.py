@@ -0,0 +1,142 @@
+import io
+import os
+import re
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from ace.chart_reader import ChartParseError, load_chart, read_chart
+from ace.chart_writer import write_chart
+from ace.charter import Charter
+from ace.note_track import CYMBAL
+from ace.tests.test_instruments import _write_band_midi
+
+NOTES_CHART = """[Song]
+{
+  Resolution = 480
+  Name = "Song"
+}
+[SyncTrack]
+{
+  0 = TS 4
+  0 = B 120000
+  960 = B 60000
+}
+[Events]
+{
+}
+[ExpertDrums]
+{
+  0 = N 0 0
+  0 = N 2 0
+  0 = N 66 0
+  0 = S 2 480
+  240 = N 67 0
+  480 = N 3 0
+  480 = N 67 0
+  480 = N 67 0
+}
+[ExpertSingle]
+{
+  0 = N 1 240
+}"""
+
+
+class TestChartReader(unittest.TestCase):
+    """Tests for reading .chart files."""
+
+    def test_read_chart(self):
+        """Test that notes, cymbals and metadata are loaded into the chart model."""
+        chart = read_chart(io.StringIO(NOTES_CHART))
+
+        self.assertEqual(chart.song, {"Resolution": "480", "Name": '"Song"'})
+        self.assertEqual(chart.resolution, 480)
+        self.assertEqual(
+            chart.sync_items, [(0, "TS 4"), (0, "B 120000"), (960, "B 60000")]
+        )
+        self.assertEqual(chart.events, [])
+        self.assertEqual(
+            [name for name, _ in chart.note_sections], ["ExpertDrums", "ExpertSingle"]
+        )
+
+        # The star power phrase is skipped, and so are the markers without their pad
+        drums = chart.note_sections[0][1]
+        self.assertEqual(list(drums.ticks), [0, 0, 240, 480, 480])
+        self.assertEqual(list(drums.notes), [0, 2, 67, 3, 67])
+        self.assertEqual(list(drums.flags), [0, CYMBAL, 0, CYMBAL, 0])
+        self.assertEqual(list(chart.note_sections[1][1].lengths), [240])
+
+    def test_out_of_order_cymbals(self):
+        """Test that a marker folds into its pad whether or not the pad is in order."""
+        body = (
+            "  480 = N 0 0\n  0 = N 2 0\n  0 = N 66 0\n  240 = N 3 0\n  240 = N 67 0\n"
+        )
+        drums = read_chart(io.StringIO(f"[ExpertDrums]\n{{\n{body}}}")).note_sections
+        drums = drums[0][1]
+
+        self.assertEqual(list(drums.ticks), [0, 240, 480])
+        self.assertEqual(list(drums.notes), [2, 3, 0])
+        self.assertEqual(list(drums.flags), [CYMBAL, CYMBAL, 0])
+        self.assertEqual(drums.num_events(), 5)
+
+    def test_tempo_map(self):
+        """Test that the SyncTrack is turned into a tempo map in chart ticks."""
+        tempo_map = read_chart(io.StringIO(NOTES_CHART)).tempo_map()
+
+        self.assertEqual(tempo_map.changes, [(0, 500000), (960, 1000000)])
+        self.assertAlmostEqual(tempo_map.tick_to_seconds(1440), 2.0)
+
+        # Charts built in memory are checked when their tempo map is
+        chart = read_chart(io.StringIO(NOTES_CHART))
+        chart.sync_items.append((1920, "B 0"))
+        with self.assertRaisesRegex(ChartParseError, "tick 1920: bad tempo"):
+            chart.tempo_map()
+
+    def test_round_trip(self):
+        """Test that a generated chart is written back byte for byte."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            in_file_dir = os.path.join(tmp_dir, "band.mid")
+            _write_band_midi(in_file_dir)
+            with patch("ace.charter.Charter.generate_wav_file"):
+                Charter(instruments=("guitar", "bass", "keys")).convert(
+                    in_file_dir, tmp_dir, "ch"
+                )
+
+            chart_fp = os.path.join(tmp_dir, "ch", "notes.chart")
+            chart = load_chart(chart_fp)
+            with open(chart_fp) as f:
+                expected = f.read()
+
+        out = io.StringIO()
+        write_chart(out, chart.sections())
+        self.assertEqual(out.getvalue(), expected)
+        self.assertEqual(len(chart.note_sections), 7)
+
+    def test_byte_order_mark(self):
+        """Test that a UTF-8 byte order mark is skipped."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            chart_fp = os.path.join(tmp_dir, "notes.chart")
+            with open(chart_fp, "w", encoding="utf-8-sig") as f:
+                f.write(NOTES_CHART)
+            self.assertEqual(load_chart(chart_fp).resolution, 480)
+
+    def test_malformed(self):
+        """Test that grammar and number errors are reported with their line."""
+        for text, message in (
+            ("Resolution = 192", "line 1: expected a [section] header"),
+            ("[Song]\nResolution = 192", "line 2: expected '{'"),
+            ("[Song]\n{\n  Resolution\n}", "line 3: expected 'key = value'"),
+            ("[SyncTrack]\n{\n  x = B 120000\n}", "line 3: bad tick"),
+            ("[SyncTrack]\n{\n  0 = B 0\n}", "line 3: bad tempo 'B 0'"),
+            ("[SyncTrack]\n{\n  0 = B -120000\n}", "line 3: bad tempo"),
+            ("[SyncTrack]\n{\n  0 = B fast\n}", "line 3: bad tempo"),
+            ("[ExpertDrums]\n{\n  0 = N 300 0\n}", "line 3: bad note"),
+            ("[ExpertDrums]\n{\n  0 = N 0 0\n", "[ExpertDrums] is never closed"),
+        ):
+            with self.subTest(text=text):
+                with self.assertRaisesRegex(ChartParseError, re.escape(message)):
+                    read_chart(io.StringIO(text))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import io
+import unittest
+
+from ace.chart_writer import write_chart
+
+
+class TestChartWriter(unittest.TestCase):
+    """Tests for the streaming .chart writer."""
+
+    def test_write_chart(self):
+        """Test that sections are streamed in the .chart layout."""
+        f = io.StringIO()
+        write_chart(
+            f,
+            [
+                ("Song", {"Name": '"Song"', "Resolution": 192}.items()),
+                ("SyncTrack", iter([(0, "TS 4"), (0, "B 120000")])),
+                ("Events", []),
+                ("ExpertDrums", ((tick, "N 0 0") for tick in (0, 192))),
+            ],
+        )
+
+        self.assertEqual(
+            f.getvalue(),
+            "[Song]\n{\n"
+            '  Name = "Song"\n'
+            "  Resolution = 192\n"
+            "}\n"
+            "[SyncTrack]\n{\n"
+            "  0 = TS 4\n"
+            "  0 = B 120000\n"
+            "}\n"
+            "[Events]\n{\n}\n"
+            "[ExpertDrums]\n{\n"
+            "  0 = N 0 0\n"
+            "  192 = N 0 0\n"
+            "}",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
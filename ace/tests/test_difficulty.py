@@ -0,0 +1,114 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from ace import vectorized
+from ace.charter import Charter
+from ace.difficulty import DIFFICULTIES, reduce_drums
+from ace.tests.test_translate import _write_sample_midi
+
+
+class TestReduceDrums(unittest.TestCase):
+    """Tests for reducing ExpertDrums to the lower difficulties."""
+
+    def test_density_thinning(self):
+        """Test that only the first chord of each grid cell is kept."""
+        # Two 16th notes and a 32nd note on the snare
+        events = [(0, 1), (24, 1), (48, 1), (72, 1)]
+
+        self.assertEqual(reduce_drums(events, "Hard"), [(0, 1), (48, 1)])
+        self.assertEqual(reduce_drums(events, "Medium"), [(0, 1)])
+
+    def test_kick_simplification(self):
+        """Test that kicks are thinned on their own grid and dropped under Easy pads."""
+        events = [(0, 0), (0, 2), (48, 0), (96, 0), (192, 0), (384, 0)]
+
+        self.assertEqual(
+            reduce_drums(events, "Hard"),
+            [(0, 0), (0, 2), (96, 0), (192, 0), (384, 0)],
+        )
+        self.assertEqual(
+            reduce_drums(events, "Medium"), [(0, 0), (0, 2), (192, 0), (384, 0)]
+        )
+        self.assertEqual(reduce_drums(events, "Easy"), [(0, 2), (192, 0), (384, 0)])
+
+    def test_chords_and_cymbals(self):
+        """Test that chords keep the lowest pads and only Hard keeps cymbal markers."""
+        # Kick, hi-hat, snare and crash in Expert order, with a duplicate hi-hat
+        events = [(0, 0), (0, 2), (0, 66), (0, 1), (0, 4), (0, 68), (0, 2), (0, 66)]
+
+        self.assertEqual(
+            reduce_drums(events, "Hard"), [(0, 0), (0, 1), (0, 2), (0, 66)]
+        )
+        self.assertEqual(reduce_drums(events, "Medium"), [(0, 0), (0, 1), (0, 2)])
+        self.assertEqual(reduce_drums(events, "Easy"), [(0, 1)])
+
+    @unittest.skipUnless(vectorized.HAS_NUMPY, "NumPy is not installed")
+    def test_vectorized_matches_python(self):
+        """Test that the array reduction matches the Python one on random charts."""
+        import numpy as np
+
+        rng = random.Random(0)
+        codes = [0, 1, 2, 3, 4, 66, 67, 68]
+        for _ in range(50):
+            events = sorted(
+                (rng.randrange(0, 2000, rng.choice((1, 12, 24))), rng.choice(codes))
+                for _ in range(rng.randrange(0, 200))
+            )
+            ticks = np.array([tick for tick, _ in events], dtype=np.int64)
+            notes = np.array([note for _, note in events], dtype=np.int16)
+
+            for difficulty in DIFFICULTIES:
+                reduced_ticks, reduced_notes = vectorized.reduce_drums(
+                    ticks, notes, difficulty
+                )
+                self.assertEqual(
+                    list(zip(reduced_ticks.tolist(), reduced_notes.tolist())),
+                    reduce_drums(events, difficulty),
+                )
+
+
+@patch("ace.charter.Charter.generate_wav_file")
+class TestChartDifficulties(unittest.TestCase):
+    """Tests for the drum difficulties written to the chart."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.in_file_dir = os.path.join(self.tmp_dir.name, "song.mid")
+        _write_sample_midi(self.in_file_dir)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _chart(self, **charter_options):
+        Charter(**charter_options).convert(self.in_file_dir, self.tmp_dir.name, "ch")
+        with open(os.path.join(self.tmp_dir.name, "ch", "notes.chart")) as f:
+            return f.read()
+
+    def test_all_difficulties_by_default(self, mock_generate_wav):
+        """Test that every difficulty is written after ExpertDrums."""
+        chart = self._chart()
+
+        sections = [line for line in chart.splitlines() if line.startswith("[")]
+        self.assertEqual(
+            sections[3:],
+            ["[ExpertDrums]", "[HardDrums]", "[MediumDrums]", "[EasyDrums]"],
+        )
+
+    def test_expert_only(self, mock_generate_wav):
+        """Test that no difficulties leaves only ExpertDrums."""
+        chart = self._chart(difficulties=())
+
+        self.assertIn("[ExpertDrums]", chart)
+        self.assertNotIn("[HardDrums]", chart)
+
+    def test_unknown_difficulty(self, mock_generate_wav):
+        """Test that an unknown difficulty is rejected."""
+        with self.assertRaises(ValueError):
+            Charter(difficulties=("Expert+",))
+
+
+if __name__ == "__main__":
+    unittest.main()
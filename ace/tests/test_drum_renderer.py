@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+
+from mido import Message, MetaMessage, MidiFile, MidiTrack
+
+from ace import drum_renderer, vectorized
+from ace.mapping import DRUM_CHANNEL
+
+if vectorized.HAS_NUMPY:
+    import numpy as np
+
+
+@unittest.skipUnless(vectorized.HAS_NUMPY, "NumPy is not installed")
+class TestDrumRenderer(unittest.TestCase):
+    """Tests for the NumPy one-shot sample drum renderer."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        drum_renderer._loaded_samples.clear()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_mix(self):
+        """Test that overlapping hits are summed and scaled by velocity."""
+        samples = {
+            36: np.ones((3, 2), dtype=np.float32),
+            38: np.full((2, 2), 0.5, dtype=np.float32),
+        }
+        audio = drum_renderer.mix(
+            np.array([0, 2, 2]),
+            np.array([36, 36, 38]),
+            np.array([127, 127, 127]),
+            samples,
+        )
+
+        np.testing.assert_allclose(audio[:, 0], [1.0, 1.0, 2.5, 1.5, 1.0])
+        np.testing.assert_allclose(audio[:, 0], audio[:, 1])
+
+    def test_render_wav(self):
+        """Test rendering a drum MIDI file to a WAV file."""
+        mid = MidiFile(ticks_per_beat=480)
+        track = MidiTrack()
+        track.append(MetaMessage("set_tempo", tempo=500000, time=0))
+        track.append(Message("note_on", note=36, velocity=127, channel=DRUM_CHANNEL))
+        track.append(Message("note_on", note=36, velocity=0, time=480, channel=9))
+        track.append(Message("note_on", note=60, velocity=127, channel=DRUM_CHANNEL))
+        track.append(Message("note_on", note=38, velocity=127, channel=DRUM_CHANNEL))
+        mid.tracks.append(track)
+
+        samples = {
+            36: np.full((10, 2), 0.25, dtype=np.float32),
+            38: np.full((10, 2), 0.5, dtype=np.float32),
+        }
+        wav_fp = os.path.join(self.tmp_dir.name, "song.wav")
+        self.assertEqual(drum_renderer.render_wav(mid, wav_fp, samples), 2)
+
+        audio = drum_renderer.read_wav(wav_fp)
+        onset = drum_renderer.SAMPLE_RATE // 2
+        self.assertEqual(audio.shape, (onset + 10, 2))
+        self.assertAlmostEqual(float(audio[0, 0]), 0.25, places=3)
+        self.assertAlmostEqual(float(audio[onset, 0]), 0.5, places=3)
+        self.assertEqual(float(audio[10, 0]), 0.0)
+
+    def test_load_samples_caches_render(self):
+        """Test that samples are rendered once and then read from the cache."""
+        renders = []
+
+        def fake_render(midi_fp, wav_fp):
+            renders.append(midi_fp)
+            notes = [
+                msg.note for msg in MidiFile(midi_fp).tracks[0] if msg.type == "note_on"
+            ]
+            step = drum_renderer.SAMPLE_SPACING * drum_renderer.SAMPLE_RATE
+            audio = np.zeros((step * len(notes), 2), dtype=np.float32)
+            for i, note in enumerate(notes):
+                audio[i * step : i * step + 5] = note / 200
+            drum_renderer.write_wav(wav_fp, audio)
+
+        samples_dir = os.path.join(self.tmp_dir.name, "samples")
+        first = drum_renderer.load_samples(fake_render, ["font", 1], samples_dir)
+        drum_renderer._loaded_samples.clear()
+        second = drum_renderer.load_samples(fake_render, ["font", 1], samples_dir)
+
+        self.assertEqual(len(renders), 1)
+        self.assertEqual(sorted(first), sorted(second))
+        for note, sample in first.items():
+            self.assertEqual(sample.shape, (5, 2))
+            self.assertAlmostEqual(float(sample[0, 0]), note / 200, places=3)
+            np.testing.assert_array_equal(sample, second[note])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from mido import Message, MetaMessage, MidiFile, MidiTrack
+
+from ace.charter import Charter
+from ace.instruments import PartRouter, part_track
+
+
+def _write_band_midi(path):
+    """Write a MIDI file with drums, guitar, bass and a keys part left on piano."""
+    mid = MidiFile(ticks_per_beat=480)
+    meta = MidiTrack()
+    meta.append(MetaMessage("set_tempo", tempo=500000, time=0))
+    mid.tracks.append(meta)
+
+    for channel, program, pitches in (
+        (9, None, [36, 38, 42, 36]),
+        (0, 29, [40, 45, 50, 55]),
+        (1, 33, [28, 28, 31, 33]),
+        (2, None, [60, 64, 67, 72]),
+    ):
+        track = MidiTrack()
+        if program is not None:
+            track.append(Message("program_change", program=program, channel=channel))
+        for pitch in pitches:
+            track.append(Message("note_on", note=pitch, velocity=90, channel=channel))
+            track.append(Message("note_off", note=pitch, channel=channel, time=480))
+        mid.tracks.append(track)
+    mid.save(path)
+
+
+class TestPartRouter(unittest.TestCase):
+    """Tests for routing channel events to instrument parts."""
+
+    def test_route(self):
+        """Test that notes follow the program of their channel."""
+        router = PartRouter(("guitar", "bass"))
+        router.route(0, 0xC0, 25, None)  # guitar on channel 0
+        router.route(0, 0x90, 40, 100)
+        router.route(0, 0x91, 60, 100)  # piano on channel 1, not collected
+        router.route(0, 0x99, 36, 100)  # drums are never routed
+        router.route(100, 0x80, 40, 0)
+        router.route(100, 0xC0, 34, None)  # channel 0 switches to bass
+        router.route(100, 0x90, 30, 100)
+        router.route(150, 0x90, 30, 100)  # struck again before its note_off
+        router.route(200, 0x90, 30, 0)
+
+        self.assertEqual(
+            router.parts,
+            {"guitar": [(0, 100, 40)], "bass": [(100, 150, 30), (150, 200, 30)]},
+        )
+
+        router.clear()
+        self.assertEqual(router.parts, {"guitar": [], "bass": []})
+
+    def test_part_track(self):
+        """Test that pitches are spread over the frets and short notes lose their sustain."""
+        notes = [(0, 480, 40), (480, 520, 44), (960, 1440, 49), (960, 1440, 40)]
+        track = part_track(notes, 480)
+
+        self.assertEqual(list(track.ticks), [0, 192, 384, 384])
+        self.assertEqual(list(track.notes), [0, 2, 0, 4])
+        self.assertEqual(list(track.lengths), [192, 0, 192, 192])
+
+
+@patch("ace.charter.Charter.generate_wav_file")
+class TestChartInstruments(unittest.TestCase):
+    """Tests for charting instruments next to the drums."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.in_file_dir = os.path.join(self.tmp_dir.name, "band.mid")
+        _write_band_midi(self.in_file_dir)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _chart(self, name, **charter_options):
+        out_dir = os.path.join(self.tmp_dir.name, name)
+        os.makedirs(out_dir)
+        Charter(**charter_options).convert(self.in_file_dir, out_dir, "ch")
+        with open(os.path.join(out_dir, "ch", "notes.chart")) as f:
+            return f.read()
+
+    def test_instrument_sections(self, mock_generate_wav):
+        """Test that the parts are charted after the drums, which don't change."""
+        drums = self._chart("drums", difficulties=())
+        chart = self._chart(
+            "band", difficulties=(), instruments=("guitar", "bass", "keys")
+        )
+
+        self.assertTrue(chart.startswith(drums))
+        sections = [line for line in chart.splitlines() if line.startswith("[")]
+        self.assertEqual(
+            sections[4:], ["[ExpertSingle]", "[ExpertDoubleBass]", "[ExpertKeyboard]"]
+        )
+        self.assertIn("  0 = N 0 192\n", chart)
+
+    def test_scanner_and_mido_agree(self, mock_generate_wav):
+        """Test that both extraction paths route the same notes."""
+        options = {"instruments": ("guitar", "bass", "keys")}
+        self.assertEqual(
+            self._chart("scanned", **options),
+            self._chart("mido", use_scanner=False, **options),
+        )
+
+    def test_unknown_instrument(self, mock_generate_wav):
+        """Test that an unknown instrument is rejected."""
+        with self.assertRaises(ValueError):
+            Charter(instruments=("kazoo",))
+
+
+if __name__ == "__main__":
+    unittest.main()
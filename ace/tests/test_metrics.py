@@ -0,0 +1,191 @@
+import json
+import os
+import pstats
+import tempfile
+import time
+import unittest
+import wave
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from ace.batch import convert_file
+from ace.charter import Charter
+from ace.metrics import SamplingProfiler, StageMetrics, write_metrics_json
+from ace.tests.test_translate import _write_sample_midi
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestStageMetrics(unittest.TestCase):
+    """Tests for per-stage metrics."""
+
+    def test_stage_accumulates(self):
+        """Test that entering a stage twice adds up its measurements."""
+        metrics = StageMetrics()
+        for _ in range(2):
+            with metrics.stage("render") as stage:
+                stage["events"] += 3
+                stage["bytes_written"] += 10
+        with metrics.stage("parse"):
+            pass
+
+        summary = metrics.to_dict()
+        self.assertEqual(list(summary["stages"]), ["parse", "render"])
+        render = summary["stages"]["render"]
+        self.assertEqual(
+            (render["calls"], render["events"], render["bytes_written"]), (2, 6, 20)
+        )
+        self.assertGreaterEqual(render["wall_seconds"], 0)
+        self.assertAlmostEqual(
+            summary["wall_seconds"],
+            render["wall_seconds"] + summary["stages"]["parse"]["wall_seconds"],
+        )
+
+    def test_stage_records_failures(self):
+        """Test that a stage that raises is still measured."""
+        metrics = StageMetrics()
+        with self.assertRaises(RuntimeError):
+            with metrics.stage("parse"):
+                raise RuntimeError("bad file")
+        self.assertEqual(metrics.stages["parse"]["calls"], 1)
+
+    def test_unknown_profiler(self):
+        """Test that an unknown profiler is rejected."""
+        with self.assertRaises(ValueError):
+            StageMetrics(profiler="perf")
+
+    def test_sampling_profiler(self):
+        """Test that the sampling profiler writes collapsed stacks of the profiled code."""
+        profiler = SamplingProfiler(interval=0.001)
+        profiler.enable()
+        _busy(0.1)
+        profiler.disable()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "chart.folded")
+            profiler.dump_stats(path)
+            with open(path) as f:
+                lines = f.read().splitlines()
+
+        self.assertTrue(lines)
+        stack, count = lines[0].rsplit(" ", 1)
+        self.assertIn("test_metrics.py:_busy", stack)
+        self.assertGreater(int(count), 0)
+
+
+@patch("ace.charter.Charter.generate_wav_file")
+class TestConvertMetrics(unittest.TestCase):
+    """Tests for the metrics recorded by a conversion."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.in_file_dir = os.path.join(self.tmp_dir.name, "song.mid")
+        _write_sample_midi(self.in_file_dir)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_convert_records_stages(self, mock_generate_wav):
+        """Test that every chart stage is measured, with the bytes it wrote."""
+        metrics = StageMetrics(profiler="cprofile")
+        Charter(metrics=metrics).convert(
+            self.in_file_dir, self.tmp_dir.name, "ch", save_split_midi=True
+        )
+
+        stages = metrics.to_dict()["stages"]
+        self.assertEqual(list(stages), ["parse", "split", "chart_build", "chart_write"])
+        for name in ("parse", "split", "chart_build", "chart_write"):
+            self.assertGreater(stages[name]["events"], 0, name)
+
+        split_fp = os.path.join(self.tmp_dir.name, "song_DRUMS.mid")
+        chart_fp = os.path.join(self.tmp_dir.name, "ch", "notes.chart")
+        self.assertEqual(stages["split"]["bytes_written"], os.path.getsize(split_fp))
+        self.assertEqual(
+            stages["chart_write"]["bytes_written"], 2 * os.path.getsize(chart_fp)
+        )
+
+        # The profile only covers the chart stage
+        profile_fp = os.path.join(self.tmp_dir.name, "chart.prof")
+        metrics.dump_profile(profile_fp)
+        functions = {name for _, _, name in pstats.Stats(profile_fp).stats}
+        self.assertIn("write_chart", functions)
+        self.assertNotIn("scan_file", functions)
+
+    def test_convert_file_collects_metrics(self, mock_generate_wav):
+        """Test that batch workers return the metrics of their song."""
+        out_dir = os.path.join(self.tmp_dir.name, "out")
+        os.makedirs(out_dir)
+        in_file_dir, error, song = convert_file(
+            self.in_file_dir, out_dir, collect_metrics=True
+        )
+
+        self.assertIsNone(error)
+        self.assertEqual(song["input"], self.in_file_dir)
+        self.assertIn("chart_write", song["stages"])
+
+        metrics_fp = os.path.join(self.tmp_dir.name, "metrics.json")
+        write_metrics_json(metrics_fp, [song])
+        with open(metrics_fp) as f:
+            self.assertEqual(json.load(f)["songs"][0]["input"], self.in_file_dir)
+
+
+class _NestingMetrics(StageMetrics):
+    """Stage metrics that remember every stage entered while another was open."""
+
+    def __init__(self):
+        super().__init__()
+        self.open = []
+        self.nested = []
+
+    @contextmanager
+    def stage(self, name):
+        if self.open:
+            self.nested.append((self.open[-1], name))
+        self.open.append(name)
+        try:
+            with super().stage(name) as record:
+                yield record
+        finally:
+            self.open.pop()
+
+
+def _fetch_soundfont(charter):
+    with charter._stage("soundfont_fetch"):
+        return "font.sf2"
+
+
+def _run_fluidsynth(sound_font, midi_fp, wav_fp):
+    with wave.open(wav_fp, "wb") as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(44100)
+        wav.writeframes(bytes(400))
+
+
+@patch.object(Charter, "_fetch_soundfont", autospec=True, side_effect=_fetch_soundfont)
+@patch.object(Charter, "_run_fluidsynth", side_effect=_run_fluidsynth)
+class TestRenderMetrics(unittest.TestCase):
+    """Tests for the metrics of the audio stages."""
+
+    def test_stages_are_not_nested(self, mock_run_fluidsynth, mock_fetch_soundfont):
+        """Test that fetching the soundfont is never timed as part of a render."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            in_file_dir = os.path.join(tmp_dir, "song.mid")
+            _write_sample_midi(in_file_dir)
+            for options in ({}, {"package": "zip"}):
+                with self.subTest(**options):
+                    metrics = _NestingMetrics()
+                    Charter(metrics=metrics, preview=(0, 1), **options).convert(
+                        in_file_dir, tmp_dir, "ch"
+                    )
+                    self.assertEqual(metrics.stages["render"]["calls"], 2)
+                    self.assertIn("soundfont_fetch", metrics.stages)
+                    self.assertEqual(metrics.nested, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
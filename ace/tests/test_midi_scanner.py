@@ -0,0 +1,161 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from mido import MetaMessage
+
+from ace.cache import midi_digest_of
+from ace.charter import Charter
+from ace.midi_scanner import MidiScanError, scan_bytes, scan_file, to_message
+from ace.tests.test_translate import _write_sample_midi
+
+
+def _chunk(name, data):
+    return name + len(data).to_bytes(4, "big") + data
+
+
+# Format 1, two tracks, 480 ticks per beat
+HEADER = _chunk(b"MThd", bytes([0, 1, 0, 2, 0x01, 0xE0]))
+
+META_TRACK = _chunk(
+    b"MTrk",
+    bytes([0x00, 0xFF, 0x51, 0x03, 0x07, 0xA1, 0x20])  # set_tempo 500000
+    + bytes([0x00, 0xFF, 0x03, 0x02])
+    + b"Hi"  # track_name, skipped
+    + bytes([0x00, 0xFF, 0x58, 0x04, 0x04, 0x02, 0x18, 0x08])  # time_signature 4/4
+    + bytes([0x83, 0x60, 0xFF, 0x2F, 0x00]),  # end_of_track at 480
+)
+
+DRUM_TRACK = _chunk(
+    b"MTrk",
+    bytes([0x00, 0x99, 36, 100])  # note_on ch 9
+    + bytes([0x10, 38, 90])  # running status note_on ch 9
+    + bytes([0x00, 0x90, 60, 80])  # note_on ch 0, skipped
+    + bytes([0x00, 62, 80])  # running status ch 0, skipped
+    + bytes([0x00, 0xC9, 0x05])  # program_change ch 9
+    + bytes([0x00, 0xF0, 0x03, 0x7E, 0x09, 0xF7])  # sysex, skipped
+    + bytes([0x81, 0x00, 0x89, 36, 0])  # note_off ch 9 at 144
+    + bytes([0x00, 0xFF, 0x2F, 0x00]),
+)
+
+
+class TestMidiScanner(unittest.TestCase):
+    """Tests for the raw MIDI byte scanner."""
+
+    def test_scan_bytes(self):
+        """Test that only drum channel and tempo/time signature events are kept."""
+        ticks_per_beat, tracks, end_tick = scan_bytes(HEADER + META_TRACK + DRUM_TRACK)
+
+        self.assertEqual(ticks_per_beat, 480)
+        self.assertEqual(end_tick, 480)
+        self.assertEqual(
+            tracks[0],
+            [
+                (0, 0xFF, 0x51, bytes([0x07, 0xA1, 0x20])),
+                (0, 0xFF, 0x58, bytes([0x04, 0x02, 0x18, 0x08])),
+            ],
+        )
+        self.assertEqual(
+            tracks[1],
+            [
+                (0, 0x99, 36, 100),
+                (16, 0x99, 38, 90),
+                (16, 0xC9, 5, None),
+                (144, 0x89, 36, 0),
+            ],
+        )
+
+    def test_scan_bytes_malformed(self):
+        """Test that malformed files raise MidiScanError."""
+        with self.assertRaises(MidiScanError):
+            scan_bytes(b"not a midi file at all")
+        with self.assertRaises(MidiScanError):
+            scan_bytes(HEADER + META_TRACK)  # Missing second track
+        with self.assertRaises(MidiScanError):
+            scan_bytes(HEADER + META_TRACK + _chunk(b"MTrk", bytes([0x00, 36, 100])))
+        with self.assertRaises(MidiScanError):
+            scan_bytes(HEADER + META_TRACK + _chunk(b"MTrk", bytes([0x00, 0x99, 36])))
+
+    def test_to_message(self):
+        """Test that scanned events become the equivalent mido messages."""
+        tempo = to_message(0xFF, 0x51, bytes([0x07, 0xA1, 0x20]), time=5)
+        self.assertEqual(tempo, MetaMessage("set_tempo", tempo=500000, time=5))
+
+        note = to_message(0x99, 36, 100, time=0)
+        self.assertEqual((note.type, note.channel, note.note), ("note_on", 9, 36))
+
+    def test_scan_file_empty(self):
+        """Test that an empty file raises MidiScanError."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "empty.mid")
+            open(path, "wb").close()
+            with self.assertRaises(MidiScanError):
+                scan_file(path)
+
+    def test_extract_drums_matches_mido(self):
+        """Test that the scanner keeps the same drum and tempo events as mido."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            in_file_dir = os.path.join(tmp_dir, "song.mid")
+            _write_sample_midi(in_file_dir)
+
+            scanned = Charter(use_scanner=True).extract_drums(in_file_dir)
+            parsed = Charter(use_scanner=False).extract_drums(in_file_dir)
+
+        def kept(midi):
+            abs_time = 0
+            events = []
+            for msg in midi.tracks[0]:
+                abs_time += msg.time
+                if msg.type in ("note_on", "note_off", "set_tempo", "time_signature"):
+                    events.append((abs_time, msg.copy(time=0)))
+            return events
+
+        self.assertEqual(kept(scanned), kept(parsed))
+        self.assertEqual(
+            sum(msg.time for msg in scanned.tracks[0]),
+            sum(msg.time for msg in parsed.tracks[0]),
+        )
+        self.assertEqual(scanned.tracks[0][-1].type, "end_of_track")
+
+    def test_mido_fallback_keeps_the_same_track(self):
+        """Test that both paths drop the same non-drum events and digest the same."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            in_file_dir = os.path.join(tmp_dir, "song.mid")
+            with open(in_file_dir, "wb") as f:
+                f.write(HEADER + META_TRACK + DRUM_TRACK)
+
+            scanned = Charter(use_scanner=True).extract_drums(in_file_dir)
+            parsed = Charter(use_scanner=False).extract_drums(in_file_dir)
+
+        self.assertEqual(list(parsed.tracks[0]), list(scanned.tracks[0]))
+        self.assertEqual(midi_digest_of(parsed), midi_digest_of(scanned))
+        self.assertEqual(
+            [msg.type for msg in parsed.tracks[0]],
+            [
+                "set_tempo",
+                "time_signature",
+                "note_on",
+                "note_on",
+                "program_change",
+                "note_off",
+                "end_of_track",
+            ],
+        )
+
+    @patch("ace.charter.Charter._extract_drums_mido")
+    def test_extract_drums_falls_back_to_mido(self, mock_extract_mido):
+        """Test that files the scanner can't read are handed to mido."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            in_file_dir = os.path.join(tmp_dir, "bad.mid")
+            with open(in_file_dir, "wb") as f:
+                f.write(b"RIFF....")
+
+            result = Charter().extract_drums(in_file_dir)
+
+        mock_extract_mido.assert_called_once_with(in_file_dir, None)
+        self.assertIs(result, mock_extract_mido.return_value)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+
+from ace import vectorized
+from ace.mapping import CYMBAL_MAPPING, CYMBAL_OFFSET, DRUM_MAPPING
+from ace.note_track import CYMBAL, NoteTrack
+
+EVENTS = [(0, 0), (0, 2), (0, 66), (96, 1), (96, 4), (96, 68), (192, 3)]
+
+
+class TestNoteTrack(unittest.TestCase):
+    """Tests for the array-backed note store."""
+
+    def test_append_stays_sorted(self):
+        """Test that late notes are inserted after the notes already on their tick."""
+        track = NoteTrack()
+        track.append(0, 0)
+        track.append(192, 1)
+        track.append(96, 2)
+        track.append(0, 3, length=48)
+
+        self.assertEqual(list(track.ticks), [0, 0, 96, 192])
+        self.assertEqual(list(track.notes), [0, 3, 2, 1])
+        self.assertEqual(list(track.lengths), [0, 48, 0, 0])
+
+    def test_cymbal_flag(self):
+        """Test that a flagged pad is written with its cymbal marker."""
+        track = NoteTrack()
+        track.append(0, 2, flags=CYMBAL)
+        track.append(0, 3, length=96, flags=CYMBAL)
+
+        self.assertEqual(len(track), 2)
+        self.assertEqual(track.num_events(), 4)
+        self.assertEqual(
+            list(track.items()),
+            [(0, "N 2 0"), (0, "N 66 0"), (0, "N 3 96"), (0, "N 67 96")],
+        )
+
+    def test_from_events(self):
+        """Test that cymbal markers are folded into flags and expanded back."""
+        track = NoteTrack.from_events(EVENTS)
+
+        self.assertEqual(len(track), 5)
+        self.assertEqual(list(track.flags), [0, CYMBAL, 0, CYMBAL, 0])
+        self.assertEqual(list(track.events()), EVENTS)
+        self.assertEqual(track.num_events(), len(EVENTS))
+
+    @unittest.skipUnless(vectorized.HAS_NUMPY, "NumPy is not installed")
+    def test_from_arrays(self):
+        """Test that arrays build the same track as events."""
+        import numpy as np
+
+        ticks = np.array([tick for tick, _ in EVENTS], dtype=np.int64)
+        notes = np.array([note for _, note in EVENTS], dtype=np.int16)
+        track = NoteTrack.from_arrays(ticks, notes)
+        expected = NoteTrack.from_events(EVENTS)
+
+        for column in ("ticks", "notes", "lengths", "flags"):
+            self.assertEqual(getattr(track, column), getattr(expected, column))
+        self.assertEqual(track.num_events(), expected.num_events())
+
+    def test_markers_without_pads(self):
+        """Test that both builders reject a marker that doesn't follow a pad."""
+        for events in ([(0, 66), (0, 2)], [(0, 2), (0, 66), (0, 66)]):
+            with self.subTest(events=events):
+                with self.assertRaisesRegex(ValueError, "marker 66 at tick 0"):
+                    NoteTrack.from_events(events)
+                if not vectorized.HAS_NUMPY:
+                    continue
+                import numpy as np
+
+                ticks = np.array([tick for tick, _ in events], dtype=np.int64)
+                notes = np.array([note for _, note in events], dtype=np.int16)
+                with self.assertRaisesRegex(ValueError, "marker 66 at tick 0"):
+                    NoteTrack.from_arrays(ticks, notes)
+
+    def test_cymbal_markers_follow_lanes(self):
+        """Test that every cymbal marker is its lane plus CYMBAL_OFFSET."""
+        for note, marker in CYMBAL_MAPPING.items():
+            self.assertEqual(marker, DRUM_MAPPING[note][0] + CYMBAL_OFFSET)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,199 @@
+import os
+import tempfile
+import unittest
+import wave
+import zipfile
+from unittest.mock import patch
+
+from ace import drum_renderer, vectorized
+from ace.cache import OutputCache
+from ace.catalog import Catalog
+from ace.charter import Charter
+from ace.package import (
+    MASK_BLOCK,
+    SngPackage,
+    open_member,
+    open_package,
+    read_sng_header,
+    song_ini_values,
+)
+from ace.tests.test_translate import _write_sample_midi
+
+if vectorized.HAS_NUMPY:
+    import numpy as np
+
+METADATA = {"name": "Song", "artist": "Unknown", "pro_drums": "True"}
+
+
+class TestPackage(unittest.TestCase):
+    """Tests for the zip and .sng song packages."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.chart = b"[Song]\n{\n}\n" * 10
+        self.audio = bytes(range(256)) * (MASK_BLOCK // 100)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write(self, package_format):
+        path = os.path.join(self.tmp_dir.name, f"song.{package_format}")
+        files = ["notes.chart", "song.wav"]
+        with open_package(path, package_format, METADATA, files) as package:
+            with package.open("notes.chart") as f:
+                f.write(self.chart)
+            with package.open("song.wav") as f:
+                # Odd write sizes cross the mask period and block boundaries
+                for start in range(0, len(self.audio), 99991):
+                    f.write(self.audio[start : start + 99991])
+        return path
+
+    def test_sng_round_trip(self):
+        """Test that .sng members are masked as the format specifies and read back."""
+        path = self._write("sng")
+
+        with open(path, "rb") as f:
+            xor_mask, metadata, files = read_sng_header(f)
+            size, offset = files["song.wav"]
+            f.seek(offset)
+            masked = f.read(300)
+        self.assertEqual(metadata, METADATA)
+        self.assertEqual(list(files), ["notes.chart", "song.wav"])
+        self.assertEqual(size, len(self.audio))
+        self.assertEqual(
+            masked,
+            bytes(
+                byte ^ xor_mask[i % 16] ^ (i & 0xFF)
+                for i, byte in enumerate(self.audio[:300])
+            ),
+        )
+        self.assertEqual(os.path.getsize(path), offset + size)
+
+        with open_member(path, "notes.chart") as f:
+            self.assertEqual(f.read(), self.chart)
+        with open_member(path, "song.wav") as f:
+            f.seek(MASK_BLOCK + 7)
+            self.assertEqual(
+                f.read(1000), self.audio[MASK_BLOCK + 7 : MASK_BLOCK + 1007]
+            )
+
+    def test_zip_package(self):
+        """Test that a zip package holds song.ini and stores the audio uncompressed."""
+        path = self._write("zip")
+
+        with zipfile.ZipFile(path) as archive:
+            self.assertEqual(
+                archive.namelist(), ["song.ini", "notes.chart", "song.wav"]
+            )
+            self.assertEqual(
+                archive.getinfo("song.wav").compress_type, zipfile.ZIP_STORED
+            )
+            self.assertEqual(
+                archive.read("song.ini").decode(),
+                "[song]\nname = Song\nartist = Unknown\npro_drums = True\n",
+            )
+        with open_member(path, "song.wav") as f:
+            self.assertEqual(f.read(), self.audio)
+
+    def test_failed_package_is_removed(self):
+        """Test that a package that fails midway leaves no file behind."""
+        path = os.path.join(self.tmp_dir.name, "song.sng")
+        with self.assertRaises(RuntimeError):
+            with open_package(path, "sng", METADATA, ["notes.chart"]) as package:
+                with package.open("notes.chart") as f:
+                    f.write(self.chart)
+                raise RuntimeError("render failed")
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+    def test_sng_member_order(self):
+        """Test that .sng members must be written in their declared order."""
+        package = SngPackage(
+            os.path.join(self.tmp_dir.name, "song.sng"), {}, ["notes.chart", "song.wav"]
+        )
+        with self.assertRaises(ValueError):
+            package.open("song.wav")
+        package.abort()
+
+    def test_song_ini_values(self):
+        """Test that the quoted chart metadata becomes plain song.ini values."""
+        values = song_ini_values(
+            {"Name": '"My Song"', "Resolution": 480, "PreviewStart": 12.5}
+        )
+        self.assertEqual(
+            values,
+            {"name": "My Song", "pro_drums": "True", "preview_start_time": "12500"},
+        )
+
+
+@unittest.skipUnless(vectorized.HAS_NUMPY, "NumPy is not installed")
+@patch("ace.charter.Charter._fetch_soundfont")
+class TestPackageConversions(unittest.TestCase):
+    """Tests for converting songs straight into packages."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.song = os.path.join(self.tmp_dir.name, "song.mid")
+        _write_sample_midi(self.song)
+        self.sound_font = os.path.join(self.tmp_dir.name, "font.sf2")
+        with open(self.sound_font, "wb") as f:
+            f.write(b"soundfont")
+        self.samples = {
+            note: np.full((100, 2), 0.25, dtype=np.float32) for note in range(128)
+        }
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _out_dir(self, name):
+        out_dir = os.path.join(self.tmp_dir.name, name)
+        os.makedirs(out_dir)
+        return out_dir
+
+    def test_convert_to_package(self, mock_fetch_soundfont):
+        """Test that a packaged song matches the song folder and is served from cache."""
+        mock_fetch_soundfont.return_value = self.sound_font
+        cache = OutputCache(os.path.join(self.tmp_dir.name, "cache"))
+        catalog = Catalog(os.path.join(self.tmp_dir.name, "catalog.db"))
+        self.addCleanup(catalog.close)
+
+        with patch.object(Charter, "_drum_samples", return_value=self.samples):
+            Charter(renderer="numpy").convert(self.song, self._out_dir("loose"), "ch")
+            with open(
+                os.path.join(self.tmp_dir.name, "loose", "ch", "notes.chart")
+            ) as f:
+                expected_chart = f.read()
+
+            with patch(
+                "ace.drum_renderer.render_wav", wraps=drum_renderer.render_wav
+            ) as mock_render:
+                for i, package_format in enumerate(("zip", "sng", "sng")):
+                    out_dir = self._out_dir(str(i))
+                    charter = Charter(
+                        renderer="numpy",
+                        cache=cache,
+                        catalog=catalog,
+                        package=package_format,
+                    )
+                    charter.convert(self.song, out_dir, "ch")
+
+                    package_fp = os.path.join(out_dir, f"ch.{package_format}")
+                    self.assertEqual(os.listdir(out_dir), [f"ch.{package_format}"])
+                    with open_member(package_fp, "notes.chart") as f:
+                        self.assertEqual(f.read().decode(), expected_chart)
+                    with open_member(package_fp, "song.wav") as f:
+                        with wave.open(f, "rb") as wav:
+                            self.assertEqual(wav.getnchannels(), 2)
+                            self.assertGreater(wav.getnframes(), 0)
+
+        # The audio is rendered once, then streamed from the cache
+        self.assertEqual(mock_render.call_count, 1)
+        # Each package format is its own catalog entry
+        row, zip_row = catalog.find(self.song)
+        self.assertEqual(zip_row["settings"]["package"], "zip")
+        self.assertEqual(row["chart_path"], os.path.abspath(package_fp))
+        self.assertEqual(row["settings"]["package"], "sng")
+        self.assertGreater(row["duration"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from mido import MidiFile
+
+from ace import drum_renderer, vectorized
+from ace.charter import Charter
+from ace.parallel_render import plan_segments, render_segments
+from ace.preview import scan_timing
+from ace.tests.test_preview import _drum_midi
+
+if vectorized.HAS_NUMPY:
+    import numpy as np
+
+
+class TestPlanSegments(unittest.TestCase):
+    """Tests for picking the segment boundaries of a song."""
+
+    def test_boundaries_fall_between_notes(self):
+        """Test that boundaries move to the middle of the gap around them."""
+        # 120 BPM at 480 ticks per beat: 960 ticks per second, a kick every 0.7 seconds
+        onsets = list(range(0, 130 * 960, 672))
+        mid = _drum_midi(onsets)
+        end = onsets[-1] + 10
+
+        boundaries = plan_segments(mid, 4)
+        self.assertEqual(len(boundaries), 5)
+        self.assertEqual((boundaries[0], boundaries[-1]), (0, end))
+        for boundary in boundaries[1:-1]:
+            self.assertEqual(boundary % 672, 336)
+
+    def test_short_song_is_one_segment(self):
+        """Test that segments stay at least the minimum length."""
+        mid = _drum_midi(range(0, 50 * 960, 960))
+        self.assertEqual(plan_segments(mid, 8), [0, 49 * 960 + 10])
+        self.assertEqual(len(plan_segments(mid, 8, min_seconds=10.0)), 5)
+
+
+@unittest.skipUnless(vectorized.HAS_NUMPY, "NumPy is not installed")
+class TestRenderSegments(unittest.TestCase):
+    """Tests for rendering and stitching segments."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        # Smooth one-second hits that ring across the next boundary, so the rounding
+        # of a note to the nearest sample barely changes the mix
+        ring = 0.2 * np.sin(np.linspace(0, np.pi, drum_renderer.SAMPLE_RATE))
+        ring = ring.astype(np.float32)
+        self.samples = {note: np.stack([ring, -ring], axis=1) for note in range(128)}
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _render(self, midi_fp, wav_fp):
+        drum_renderer.render_wav(MidiFile(midi_fp), wav_fp, self.samples)
+
+    def test_stitched_song_matches_one_render(self):
+        """Test that the stitched segments line up with the song rendered whole."""
+        onsets = list(range(0, 100 * 960, 300))
+        mid = _drum_midi(onsets, tempo_changes=[(0, 500000), (40 * 960, 400000)])
+        whole_fp = os.path.join(self.tmp_dir.name, "whole.wav")
+        drum_renderer.render_wav(mid, whole_fp, self.samples)
+        whole = drum_renderer.read_wav(whole_fp)
+
+        boundaries = plan_segments(mid, 3, min_seconds=20.0)
+        self.assertEqual(len(boundaries), 4)
+        stitched = render_segments(mid, boundaries, self._render, self.tmp_dir.name)
+
+        # Notes may round to the next sample within a segment
+        self.assertLessEqual(abs(len(stitched) - len(whole)), 1)
+        frames = min(len(stitched), len(whole))
+        self.assertLess(np.abs(stitched[:frames] - whole[:frames]).max(), 1e-3)
+
+    def test_crash_rings_across_the_seam(self):
+        """Test that a crash ringing out over a boundary isn't cut off by the seam."""
+        # A crash that rings for as long as the one-shot render allows
+        frames = drum_renderer.SAMPLE_SPACING * drum_renderer.SAMPLE_RATE
+        ring = 0.2 * np.sin(np.linspace(0, np.pi, frames)).astype(np.float32)
+        self.samples = {note: np.stack([ring, ring], axis=1) for note in range(128)}
+
+        # Hits every second, then a crash and 4 seconds of silence before the next
+        onsets = list(range(0, 30 * 960, 960)) + [30 * 960 - 240]
+        onsets += list(range(34 * 960, 60 * 960, 960))
+        mid = _drum_midi(onsets)
+        whole_fp = os.path.join(self.tmp_dir.name, "whole.wav")
+        drum_renderer.render_wav(mid, whole_fp, self.samples)
+        whole = drum_renderer.read_wav(whole_fp)
+
+        # The boundary falls 3 seconds after the crash, which is still ringing
+        boundary = 33 * 960 - 240
+        stitched = render_segments(
+            mid, [0, boundary, onsets[-1] + 10], self._render, self.tmp_dir.name
+        )
+
+        seam = 33 * drum_renderer.SAMPLE_RATE
+        around = slice(
+            seam - drum_renderer.SAMPLE_RATE, seam + drum_renderer.SAMPLE_RATE
+        )
+        self.assertGreater(np.abs(whole[around]).max(), 0.05)
+        self.assertLess(np.abs(stitched[around] - whole[around]).max(), 1e-3)
+
+
+@unittest.skipUnless(vectorized.HAS_NUMPY, "NumPy is not installed")
+@patch("ace.charter.Charter._fetch_soundfont", return_value="font.sf2")
+class TestSegmentedConversions(unittest.TestCase):
+    """Tests for rendering songs in segments during conversions."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_long_song_renders_in_segments(self, mock_fetch_soundfont):
+        """Test that FluidSynth renders each segment of a long song once."""
+        song = os.path.join(self.tmp_dir.name, "song.mid")
+        _drum_midi(range(0, 95 * 960, 480)).save(song)
+        decay = np.linspace(0.2, 0.0, 1000, dtype=np.float32)
+        samples = {note: np.stack([decay, decay], axis=1) for note in range(128)}
+
+        def fake_fluidsynth(sound_font, midi_fp, wav_fp):
+            drum_renderer.render_wav(MidiFile(midi_fp), wav_fp, samples)
+
+        with patch.object(
+            Charter, "_run_fluidsynth", side_effect=fake_fluidsynth
+        ) as mock_run:
+            Charter(render_jobs=3).convert(song, self.tmp_dir.name, "ch")
+
+        self.assertEqual(mock_run.call_count, 3)
+        audio = drum_renderer.read_wav(
+            os.path.join(self.tmp_dir.name, "ch", "song.wav")
+        )
+        self.assertAlmostEqual(len(audio) / drum_renderer.SAMPLE_RATE, 94.5, places=1)
+
+    def test_song_is_timed_once(self, mock_fetch_soundfont):
+        """Test that the preview and the segments share one scan of the song."""
+        song = os.path.join(self.tmp_dir.name, "song.mid")
+        _drum_midi(range(0, 95 * 960, 480)).save(song)
+
+        def fake_fluidsynth(sound_font, midi_fp, wav_fp):
+            drum_renderer.write_wav(wav_fp, np.zeros((10, 2), np.float32))
+
+        with patch.object(
+            Charter, "_run_fluidsynth", side_effect=fake_fluidsynth
+        ), patch("ace.charter.scan_timing", wraps=scan_timing) as mock_scan, patch(
+            "ace.tempo_map.TempoMap.from_track", side_effect=AssertionError
+        ):
+            Charter(render_jobs=3, preview="auto").convert(
+                song, self.tmp_dir.name, "ch"
+            )
+
+        # The full song, and the preview cut down from it
+        scanned = [call.args[0] for call in mock_scan.call_args_list]
+        self.assertEqual(len(scanned), 2)
+        self.assertIsNot(scanned[0], scanned[1])
+
+    def test_render_jobs_must_be_positive(self, mock_fetch_soundfont):
+        """Test that render_jobs below 1 is rejected."""
+        with self.assertRaises(ValueError):
+            Charter(render_jobs=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+import os
+import tempfile
+import unittest
+import wave
+import zipfile
+from unittest.mock import patch
+
+from mido import Message, MetaMessage, MidiFile, MidiTrack
+
+from ace import drum_renderer, vectorized
+from ace.chart_reader import load_chart
+from ace.charter import Charter
+from ace.mapping import DRUM_CHANNEL
+from ace.package import open_member
+from ace.preview import cut_midi, densest_window
+from ace.tests.test_translate import _write_sample_midi
+
+if vectorized.HAS_NUMPY:
+    import numpy as np
+
+
+def _drum_midi(onsets, tempo_changes=(), ticks_per_beat=480):
+    """Build a drum track with a kick at each onset tick and tempo changes by tick."""
+    events = [
+        (tick, MetaMessage("set_tempo", tempo=tempo)) for tick, tempo in tempo_changes
+    ]
+    for tick in onsets:
+        events.append((tick, Message("note_on", note=36, velocity=100, channel=9)))
+        events.append((tick + 10, Message("note_off", note=36, channel=DRUM_CHANNEL)))
+    events.sort(key=lambda event: event[0])
+
+    mid = MidiFile(ticks_per_beat=ticks_per_beat)
+    track = MidiTrack()
+    last_tick = 0
+    for tick, msg in events:
+        track.append(msg.copy(time=tick - last_tick))
+        last_tick = tick
+    track.append(MetaMessage("end_of_track", time=0))
+    mid.tracks.append(track)
+    return mid
+
+
+class TestPreview(unittest.TestCase):
+    """Tests for picking and cutting the preview window."""
+
+    def test_densest_window(self):
+        """Test that the window starts on the densest stretch of notes."""
+        # 120 BPM at 480 ticks per beat: 960 ticks per second. A kick every two
+        # seconds, and every tenth of a second from 60 to 70 seconds
+        onsets = list(range(0, 120 * 960, 2 * 960))
+        onsets += range(60 * 960 + 96, 70 * 960, 96)
+        mid = _drum_midi(sorted(set(onsets)))
+
+        self.assertEqual(densest_window(mid, 10.0), (60.0, 70.0))
+        self.assertEqual(densest_window(mid, 500.0), (0.0, 118.01))
+
+    def test_window_stays_inside_song(self):
+        """Test that a dense ending moves the window back to fit the song."""
+        mid = _drum_midi([0, 9 * 960, 9 * 960 + 480, 10 * 960])
+        self.assertEqual(densest_window(mid, 4.0), (6.01, 10.01))
+
+    def test_no_window_without_notes(self):
+        """Test that a track without drum notes or length has no preview window."""
+        self.assertIsNone(densest_window(_drum_midi([])))
+        self.assertIsNone(densest_window(_drum_midi([], tempo_changes=[(480, 400000)])))
+
+    def test_cut_midi_keeps_tempo(self):
+        """Test that the cut track starts with the tempo in effect at the window."""
+        mid = _drum_midi(
+            [0, 960, 4 * 960, 5 * 960], tempo_changes=[(0, 500000), (960, 250000)]
+        )
+        # 1 second at 120 BPM, then 240 BPM: tick 4 * 960 is at 2.5 seconds
+        cut = cut_midi(mid, 2.5, 3.0)
+
+        (track,) = cut.tracks
+        self.assertEqual(track[0].type, "set_tempo")
+        self.assertEqual((track[0].tempo, track[0].time), (250000, 0))
+        # The kick at 2.5 seconds opens the window, the one at 3 seconds is past its end
+        notes = [msg for msg in track if msg.type == "note_on"]
+        self.assertEqual(len(notes), 1)
+        self.assertEqual(notes[0].time, 0)
+        # Half a second at 240 BPM is 960 ticks
+        self.assertEqual(sum(msg.time for msg in track), 960)
+        self.assertEqual(track[-1].type, "end_of_track")
+
+
+@unittest.skipUnless(vectorized.HAS_NUMPY, "NumPy is not installed")
+@patch("ace.charter.Charter._fetch_soundfont")
+class TestPreviewConversions(unittest.TestCase):
+    """Tests for rendering previews during conversions."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.song = os.path.join(self.tmp_dir.name, "song.mid")
+        _write_sample_midi(self.song)
+        self.sound_font = os.path.join(self.tmp_dir.name, "font.sf2")
+        with open(self.sound_font, "wb") as f:
+            f.write(b"soundfont")
+        self.samples = {
+            note: np.full((100, 2), 0.25, dtype=np.float32) for note in range(128)
+        }
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_preview_only(self, mock_fetch_soundfont):
+        """Test that only the preview window is rendered and written to the chart."""
+        mock_fetch_soundfont.return_value = self.sound_font
+        charter = Charter(renderer="numpy", preview=(0.5, 1.5), preview_only=True)
+
+        with patch.object(Charter, "_drum_samples", return_value=self.samples):
+            with patch(
+                "ace.drum_renderer.render_wav", wraps=drum_renderer.render_wav
+            ) as mock_render:
+                charter.convert(self.song, self.tmp_dir.name, "ch")
+
+        # Only the cut window is rendered, starting with its tempo
+        (call,) = mock_render.call_args_list
+        self.assertEqual(call.args[0].tracks[0][0].type, "set_tempo")
+        song_dir = os.path.join(self.tmp_dir.name, "ch")
+        self.assertEqual(sorted(os.listdir(song_dir)), ["notes.chart", "preview.wav"])
+        audio = drum_renderer.read_wav(os.path.join(song_dir, "preview.wav"))
+        self.assertEqual(len(audio), drum_renderer.SAMPLE_RATE)
+
+        chart = load_chart(os.path.join(song_dir, "notes.chart"))
+        self.assertEqual(
+            (chart.song["PreviewStart"], chart.song["PreviewEnd"]), ("0.5", "1.5")
+        )
+        # There is no song.wav for the chart to play
+        self.assertNotIn("MusicStream", chart.song)
+        self.assertIn("MusicStream", Charter()._song_metadata("song_DRUMS.mid"))
+
+    def test_packaged_preview(self, mock_fetch_soundfont):
+        """Test that a package holds the preview and song.ini its start time."""
+        mock_fetch_soundfont.return_value = self.sound_font
+        charter = Charter(renderer="numpy", preview="auto", package="zip")
+
+        with patch.object(Charter, "_drum_samples", return_value=self.samples):
+            charter.convert(self.song, self.tmp_dir.name, "ch")
+
+        package_fp = os.path.join(self.tmp_dir.name, "ch.zip")
+        with open_member(package_fp, "song.ini") as f:
+            self.assertIn("preview_start_time = 0\n", f.read().decode())
+        with open_member(package_fp, "preview.wav") as f:
+            self.assertEqual(f.read(4), b"RIFF")
+
+    def test_no_preview_without_notes(self, mock_fetch_soundfont):
+        """Test that a song without drum notes gets no preview file or bounds."""
+        mock_fetch_soundfont.return_value = self.sound_font
+        _drum_midi([]).save(self.song)
+
+        for options in ({}, {"package": "zip"}):
+            with self.subTest(**options):
+                charter = Charter(renderer="numpy", preview="auto", **options)
+                with patch.object(Charter, "_drum_samples", return_value=self.samples):
+                    charter.convert(self.song, self.tmp_dir.name, "ch")
+
+        song_dir = os.path.join(self.tmp_dir.name, "ch")
+        self.assertNotIn("preview.wav", os.listdir(song_dir))
+        chart = load_chart(os.path.join(song_dir, "notes.chart"))
+        self.assertEqual(chart.song["PreviewEnd"], "0")
+        with zipfile.ZipFile(os.path.join(self.tmp_dir.name, "ch.zip")) as package:
+            self.assertNotIn("preview.wav", package.namelist())
+
+    def test_fluidsynth_preview_is_cut_to_the_window(self, mock_fetch_soundfont):
+        """Test that the ring FluidSynth renders past the window is cut off."""
+        mock_fetch_soundfont.return_value = self.sound_font
+
+        def fake_fluidsynth(sound_font, midi_fp, wav_fp):
+            # Three seconds of ring, past the end of any window
+            audio = np.full((3 * drum_renderer.SAMPLE_RATE, 2), 0.25, np.float32)
+            drum_renderer.write_wav(wav_fp, audio)
+
+        for options in ({}, {"package": "zip"}):
+            with self.subTest(**options):
+                charter = Charter(preview=(0.5, 1.5), preview_only=True, **options)
+                with patch.object(
+                    Charter, "_run_fluidsynth", side_effect=fake_fluidsynth
+                ):
+                    charter.convert(self.song, self.tmp_dir.name, "ch")
+
+                if options:
+                    package_fp = os.path.join(self.tmp_dir.name, "ch.zip")
+                    with open_member(package_fp, "preview.wav") as f:
+                        with wave.open(f) as wav:
+                            frames = wav.getnframes()
+                else:
+                    preview_fp = os.path.join(self.tmp_dir.name, "ch", "preview.wav")
+                    frames = len(drum_renderer.read_wav(preview_fp))
+                self.assertEqual(frames, drum_renderer.SAMPLE_RATE)
+
+
+if __name__ == "__main__":
+    unittest.main()
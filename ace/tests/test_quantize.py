@@ -0,0 +1,147 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from mido import Message, MetaMessage, MidiFile, MidiTrack
+
+from ace import vectorized
+from ace.charter import Charter
+from ace.difficulty import DIFFICULTIES
+from ace.mapping import CHART_RESOLUTION, DRUM_MAPPING
+from ace.note_track import CYMBAL
+from ace.quantize import grid_ticks, merge_hits, snap_tick
+
+
+def _humanized_track(seed=0, ticks_per_beat=480):
+    """Build a drum track of sixteenths pushed and pulled off the grid, with flams."""
+    rng = random.Random(seed)
+    drums = sorted(DRUM_MAPPING)
+    track = [MetaMessage("set_tempo", tempo=500000, time=0)]
+    events = []
+    for step in range(256):
+        tick = step * ticks_per_beat // 4 + rng.randint(0, 20)
+        for note in rng.sample(drums, rng.randint(1, 3)):
+            events.append((tick, note))
+            if rng.random() < 0.2:
+                # A grace note or a doubled hit on the same drum
+                events.append((tick + rng.randint(0, 12), note))
+    events.sort(key=lambda event: event[0])
+
+    last_tick = 0
+    for tick, note in events:
+        track.append(
+            Message("note_on", note=note, velocity=90, time=tick - last_tick, channel=9)
+        )
+        last_tick = tick
+    return track
+
+
+class TestQuantize(unittest.TestCase):
+    """Tests for snapping and merging drum hits."""
+
+    def test_grid_ticks(self):
+        """Test that subdivisions become grids of chart ticks."""
+        self.assertEqual(grid_ticks(4), CHART_RESOLUTION)
+        self.assertEqual(grid_ticks(16), CHART_RESOLUTION // 4)
+        self.assertEqual(grid_ticks(12), CHART_RESOLUTION // 3)
+        with self.assertRaises(ValueError):
+            grid_ticks(7)
+        with self.assertRaises(ValueError):
+            grid_ticks(0)
+
+    def test_snap_tick_rounds(self):
+        """Test that hits snap to the nearest grid line rather than truncating."""
+        grid = grid_ticks(16)
+        # 120 ticks per sixteenth at 480 ticks per beat
+        self.assertEqual(snap_tick(0, 480, grid), 0)
+        self.assertEqual(snap_tick(59, 480, grid), 0)
+        self.assertEqual(snap_tick(60, 480, grid), grid)
+        self.assertEqual(snap_tick(115, 480, grid), grid)
+        self.assertEqual(snap_tick(478, 480, grid), 4 * grid)
+
+    def test_merge_hits(self):
+        """Test that duplicate and flammed hits merge into the first hit of a lane."""
+        hits = [
+            (0, 1, 0),
+            (0, 2, 0),
+            (0, 1, 0),
+            (5, 2, CYMBAL),
+            (10, 2, 0),
+            (40, 2, 0),
+            (40, 3, 0),
+        ]
+        self.assertEqual(
+            merge_hits(hits),
+            [(0, 1, 0), (0, 2, 0), (5, 2, CYMBAL), (10, 2, 0), (40, 2, 0), (40, 3, 0)],
+        )
+        # Hits 5 ticks apart run together into one cymbal
+        self.assertEqual(
+            merge_hits(hits, 5),
+            [(0, 1, 0), (0, 2, CYMBAL), (40, 2, 0), (40, 3, 0)],
+        )
+
+    @unittest.skipUnless(vectorized.HAS_NUMPY, "NumPy is not installed")
+    def test_numpy_path_matches_python_path(self):
+        """Test that both paths merge and snap the same hits."""
+        python_path = Charter(use_numpy=False)
+        for seed, ticks_per_beat in ((0, 480), (1, 96), (2, 960)):
+            track = _humanized_track(seed, ticks_per_beat)
+            for quantize, flam_ticks in ((None, 0), (16, None), (32, 6), (12, 10)):
+                with self.subTest(seed=seed, quantize=quantize, flam_ticks=flam_ticks):
+                    charter = Charter(quantize=quantize, flam_ticks=flam_ticks)
+                    python_path.grid = charter.grid
+                    python_path.flam_ticks = charter.flam_ticks
+                    expected = python_path._chart_sections(
+                        track, ticks_per_beat, tuple(DIFFICULTIES)
+                    )
+                    actual = vectorized.chart_sections(
+                        track,
+                        ticks_per_beat,
+                        tuple(DIFFICULTIES),
+                        charter.grid,
+                        charter.flam_ticks,
+                    )
+                    self.assertEqual(
+                        [(name, list(notes.items())) for name, notes in actual[1]],
+                        [(name, list(notes.items())) for name, notes in expected[1]],
+                    )
+
+    @patch("ace.charter.Charter.generate_wav_file")
+    def test_quantized_chart_is_smaller(self, mock_generate_wav):
+        """Test that a quantized chart has every note on the grid, once per lane."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            song = os.path.join(tmp_dir, "song.mid")
+            mid = MidiFile(ticks_per_beat=480)
+            mid.tracks.append(MidiTrack(_humanized_track()))
+            mid.save(song)
+
+            sizes = []
+            for name, options in (("raw", {}), ("clean", {"quantize": 16})):
+                out_dir = os.path.join(tmp_dir, name)
+                os.makedirs(out_dir)
+                Charter(difficulties=(), **options).convert(song, out_dir, "ch")
+                chart_fp = os.path.join(out_dir, "ch", "notes.chart")
+                sizes.append(os.path.getsize(chart_fp))
+
+            with open(chart_fp) as f:
+                notes = f.read().split("[ExpertDrums]")[1].splitlines()[2:-1]
+            ticks = [int(line.split("=")[0]) for line in notes]
+            self.assertTrue(all(tick % grid_ticks(16) == 0 for tick in ticks))
+            self.assertEqual(len(notes), len(set(notes)))
+            self.assertLess(sizes[1], sizes[0])
+
+    def test_settings(self):
+        """Test that the cleanup only shows in the settings when it's enabled."""
+        self.assertNotIn("cleanup", Charter().settings())
+        self.assertEqual(
+            Charter(quantize=16).settings()["cleanup"],
+            {"quantize": 16, "flam_ticks": 0},
+        )
+        with self.assertRaises(ValueError):
+            Charter(flam_ticks=-1)
+
+
+if __name__ == "__main__":
+    unittest.main()
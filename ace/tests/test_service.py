@@ -0,0 +1,128 @@
+import http.client
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from ace import client
+from ace.service import ConversionService, make_server
+from ace.tests.test_translate import _write_sample_midi
+
+
+@patch("ace.charter.Charter._fetch_soundfont", return_value="font.sf2")
+@patch("ace.charter.Charter.generate_wav_file")
+class TestConversionService(unittest.TestCase):
+    """Tests for the local conversion service and its client."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.song = os.path.join(self.tmp_dir.name, "song.mid")
+        _write_sample_midi(self.song)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _serve(self, service):
+        """Serve on a free port until the test ends."""
+        server = make_server(service, port=0)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(thread.join)
+        self.addCleanup(server.shutdown)
+        return server.server_address[1]
+
+    def test_convert(self, mock_generate_wav, mock_fetch_soundfont):
+        """Test that jobs are converted by the resident workers."""
+        service = ConversionService(self.tmp_dir.name, {"difficulties": ()}, workers=2)
+        service.start()
+        self.addCleanup(service.stop)
+        port = self._serve(service)
+
+        result = client.convert(self.song, port=port)
+        self.assertIsNone(result["error"])
+        self.assertEqual(result["song_folder"], "artist - Song (ACE)")
+        self.assertTrue(
+            os.path.exists(
+                os.path.join(self.tmp_dir.name, "artist - Song (ACE)", "notes.chart")
+            )
+        )
+
+        result = client.convert(self.song + ".missing", port=port)
+        self.assertIn("FileNotFoundError", result["error"])
+
+        status, body = client.request("/status", port=port)
+        self.assertEqual(status, 200)
+        self.assertEqual(body["completed"], 2)
+        self.assertEqual(body["failed"], 1)
+        # Only the warm-up fetched the soundfont
+        self.assertEqual(mock_fetch_soundfont.call_count, 1)
+
+    def test_rejected_jobs(self, mock_generate_wav, mock_fetch_soundfont):
+        """Test that malformed jobs and jobs over the queue bound are turned away."""
+        # Without workers, the queued job is never taken
+        service = ConversionService(self.tmp_dir.name, queue_size=1)
+        port = self._serve(service)
+
+        status, body = client.request("/convert", {"output_dir": 1}, port=port)
+        self.assertEqual(status, 400)
+
+        service.submit({"input": self.song})
+        with self.assertRaisesRegex(client.ServiceError, "queue is full"):
+            client.convert(self.song, port=port)
+
+    def test_rejects_browser_requests(self, mock_generate_wav, mock_fetch_soundfont):
+        """Test that cross-site and DNS rebinding requests never reach the endpoints."""
+        port = self._serve(ConversionService(self.tmp_dir.name))
+
+        def call(method, path, headers):
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            self.addCleanup(conn.close)
+            conn.request(method, path, b"{}" if method == "POST" else None, headers)
+            response = conn.getresponse()
+            return response.status, json.load(response)
+
+        def post(headers):
+            return call("POST", "/shutdown", headers)
+
+        # A form or text/plain post needs no CORS preflight
+        self.assertEqual(post({"Content-Type": "text/plain"})[0], 415)
+        self.assertEqual(post({})[0], 415)
+        # A rebound DNS name still sends its own Host
+        status, body = post(
+            {"Content-Type": "application/json", "Host": f"evil.example:{port}"}
+        )
+        self.assertEqual((status, body["message"]), (403, "Host not allowed"))
+        status, body = post(
+            {"Content-Type": "application/json", "Origin": "http://evil.example"}
+        )
+        self.assertEqual((status, body["message"]), (403, "Origin not allowed"))
+
+        self.assertEqual(call("GET", "/status", {"Host": "evil.example"})[0], 403)
+
+        # The service is still up, and serves local names and origins
+        for headers in (
+            {"Host": f"localhost:{port}"},
+            {"Host": f"[::1]:{port}", "Origin": f"http://127.0.0.1:{port}"},
+        ):
+            self.assertEqual(call("GET", "/status", headers)[0], 200)
+
+    def test_shutdown(self, mock_generate_wav, mock_fetch_soundfont):
+        """Test that the service stops on request, and the client reports it's gone."""
+        server = make_server(ConversionService(self.tmp_dir.name), port=0)
+        port = server.server_address[1]
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+
+        self.assertEqual(client.request("/shutdown", {}, port=port)[0], 200)
+        thread.join(timeout=5)
+        server.server_close()
+        self.assertFalse(thread.is_alive())
+        with self.assertRaises(client.ServiceError):
+            client.convert(self.song, port=port)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+
+from mido import Message, MetaMessage
+
+from ace import vectorized
+from ace.tempo_map import TempoMap, chart_bpm
+
+if vectorized.HAS_NUMPY:
+    import numpy as np
+
+
+class TestTempoMap(unittest.TestCase):
+    """Tests for the tempo map index."""
+
+    def setUp(self):
+        """Set up 120 BPM until tick 960, then 60 BPM, at 480 ticks per beat."""
+        self.tempo_map = TempoMap([(0, 500000), (960, 1000000)], 480)
+
+    def test_tick_to_seconds(self):
+        """Test that tick times follow the tempo changes."""
+        seconds = [self.tempo_map.tick_to_seconds(t) for t in (0, 480, 960, 1440)]
+        self.assertEqual(seconds, [0.0, 0.5, 1.0, 2.0])
+
+    def test_seconds_to_tick(self):
+        """Test that seconds map back to the same ticks."""
+        ticks = [self.tempo_map.seconds_to_tick(s) for s in (0.0, 0.5, 1.0, 2.0)]
+        self.assertEqual(ticks, [0, 480, 960, 1440])
+        self.assertEqual(self.tempo_map.seconds_to_tick(-1.0), 0)
+
+    def test_chart_ticks(self):
+        """Test rescaling MIDI ticks and seconds to chart ticks."""
+        self.assertEqual(self.tempo_map.to_chart_tick(1440), 576)
+        self.assertEqual(self.tempo_map.to_chart_tick(1440, resolution=480), 1440)
+        self.assertEqual(self.tempo_map.to_chart_tick(5, resolution=192), 2)
+        self.assertEqual(self.tempo_map.seconds_to_chart_tick(1.5), 480)
+
+    def test_default_tempo(self):
+        """Test that ticks before the first tempo change use 120 BPM."""
+        tempo_map = TempoMap([(960, 250000)], 480)
+        self.assertEqual(tempo_map.tick_to_seconds(480), 0.5)
+        self.assertEqual(tempo_map.tick_to_seconds(1440), 1.25)
+        self.assertEqual(tempo_map.sync_items(), [(384, "B 240000")])
+
+    def test_same_tick_changes(self):
+        """Test that the last of several tempo changes on one tick wins."""
+        tempo_map = TempoMap([(0, 400000), (0, 500000), (480, 600000)], 480)
+        self.assertEqual(tempo_map.changes, [(0, 500000), (480, 600000)])
+        self.assertEqual(tempo_map.tick_to_seconds(480), 0.5)
+
+    def test_sync_items_keep_sub_bpm_precision(self):
+        """Test that B values round to the nearest 0.001 BPM instead of truncating."""
+        self.assertEqual(chart_bpm(500000), 120000)
+        self.assertEqual(chart_bpm(461538), 130000)
+        self.assertEqual(chart_bpm(333333), 180000)
+        self.assertEqual(chart_bpm(648649), 92500)
+        self.assertEqual(chart_bpm(413793), 145000)
+
+        tempo_map = TempoMap([(0, 500000), (100, 648649)], 96)
+        self.assertEqual(tempo_map.sync_items(), [(0, "B 120000"), (200, "B 92500")])
+
+    def test_from_track(self):
+        """Test that tempo changes are read at their absolute ticks."""
+        track = [
+            MetaMessage("set_tempo", tempo=600000, time=0),
+            Message("note_on", note=36, velocity=64, time=100, channel=9),
+            MetaMessage("set_tempo", tempo=300000, time=20),
+        ]
+        tempo_map = TempoMap.from_track(track, 480)
+        self.assertEqual(tempo_map.changes, [(0, 600000), (120, 300000)])
+
+    @unittest.skipUnless(vectorized.HAS_NUMPY, "NumPy is not installed")
+    def test_ticks_to_seconds_array(self):
+        """Test that the array conversion matches the scalar one."""
+        ticks = np.array([0, 100, 480, 960, 1000, 1440])
+        np.testing.assert_allclose(
+            self.tempo_map.ticks_to_seconds(ticks),
+            [self.tempo_map.tick_to_seconds(t) for t in ticks.tolist()],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
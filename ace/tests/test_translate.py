@@ -1,7 +1,9 @@
+import os
+import tempfile
 import unittest
 from unittest.mock import MagicMock, PropertyMock, mock_open, patch
 
-from mido import Message, MetaMessage
+from mido import Message, MetaMessage, MidiFile, MidiTrack
 
 from ace.charter import Charter
 
@@ -76,6 +78,7 @@ class TestChartTranslator(unittest.TestCase):
         # Check the returned file key
         self.assertEqual(result, "input_DRUMS.mid")
 
+    @patch("ace.charter.shutil.copyfile")
     @patch("builtins.open", new_callable=mock_open)
     @patch("ace.charter.MidiFile")
     @patch("ace.charter.mido.merge_tracks")
@@ -92,6 +95,7 @@ class TestChartTranslator(unittest.TestCase):
         mock_merge_tracks,
         mock_midi_file,
         mock_file_open,
+        mock_copyfile,
     ):
         """Test generate_chart_file method."""
         in_file_key = "input_DRUMS.mid"
@@ -144,6 +148,116 @@ class TestChartTranslator(unittest.TestCase):
             self.assertIn("[Events]", written_content)
             self.assertIn("[ExpertDrums]", written_content)
 
+    @patch("ace.charter.Charter.generate_wav_file")
+    def test_notes_chart_matches_drums_chart(self, mock_generate_wav):
+        """Test that notes.chart is a byte for byte copy of <name>_DRUMS.chart."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            in_file_dir = os.path.join(tmp_dir, "My Song.mid")
+            _write_sample_midi(in_file_dir)
+            ch_out_dir = "artist - My Song (ACE)"
+            os.makedirs(os.path.join(tmp_dir, ch_out_dir))
+
+            split_key = self.translator.split_midi(in_file_dir, tmp_dir)
+            self.translator.generate_chart_file(split_key, tmp_dir, ch_out_dir)
+
+            with open(os.path.join(tmp_dir, "my_song_DRUMS.chart"), "rb") as f:
+                drums_chart = f.read()
+            with open(os.path.join(tmp_dir, ch_out_dir, "notes.chart"), "rb") as f:
+                notes_chart = f.read()
+            self.assertIn(b"[ExpertDrums]", drums_chart)
+            self.assertEqual(notes_chart, drums_chart)
+
+    @patch("ace.charter.Charter.generate_wav_file")
+    def test_convert_matches_split_round_trip(self, mock_generate_wav):
+        """Test that convert writes the same chart as split_midi + generate_chart_file."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            in_file_dir = os.path.join(tmp_dir, "My Song.mid")
+            _write_sample_midi(in_file_dir)
+
+            fast_dir = os.path.join(tmp_dir, "fast")
+            slow_dir = os.path.join(tmp_dir, "slow")
+            ch_out_dir = "artist - My Song (ACE)"
+            for out_dir in (fast_dir, slow_dir):
+                os.makedirs(os.path.join(out_dir, ch_out_dir))
+
+            key = self.translator.convert(in_file_dir, fast_dir, ch_out_dir)
+            self.assertEqual(key, "my_song_DRUMS.mid")
+            self.assertFalse(os.path.exists(os.path.join(fast_dir, key)))
+
+            split_key = self.translator.split_midi(in_file_dir, slow_dir)
+            self.translator.generate_chart_file(split_key, slow_dir, ch_out_dir)
+
+            with open(os.path.join(fast_dir, ch_out_dir, "notes.chart")) as f:
+                fast_chart = f.read()
+            with open(os.path.join(slow_dir, ch_out_dir, "notes.chart")) as f:
+                slow_chart = f.read()
+            self.assertEqual(fast_chart, slow_chart)
+            self.assertIn("N 66 0", fast_chart)
+
+            # The in-memory MIDI is passed straight to audio rendering
+            self.assertIsInstance(mock_generate_wav.call_args.kwargs["midi"], MidiFile)
+
+    def test_extract_drums_keeps_same_tick_order(self):
+        """Test that events at the same tick keep track order after the merge."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            in_file_dir = os.path.join(tmp_dir, "ties.mid")
+            mid = MidiFile(ticks_per_beat=480)
+            for notes in ([36, 38], [42, 46], [49]):
+                track = MidiTrack()
+                for note in notes:
+                    track.append(
+                        Message("note_on", note=note, velocity=64, time=0, channel=9)
+                    )
+                track.append(
+                    Message("note_on", note=notes[0], velocity=64, time=10, channel=9)
+                )
+                mid.tracks.append(track)
+            mid.save(in_file_dir)
+
+            for use_scanner in (False, True):
+                drums = Charter(use_scanner=use_scanner).extract_drums(in_file_dir)
+                notes = [
+                    (msg.time, msg.note)
+                    for msg in drums.tracks[0]
+                    if msg.type == "note_on"
+                ]
+                self.assertEqual(
+                    notes,
+                    [
+                        (0, 36),
+                        (0, 38),
+                        (0, 42),
+                        (0, 46),
+                        (0, 49),
+                        (10, 36),
+                        (0, 42),
+                        (0, 49),
+                    ],
+                )
+
+
+def _write_sample_midi(path):
+    """Write a small two-track MIDI file with drums, a tempo change and a melody."""
+    mid = MidiFile(ticks_per_beat=480)
+    meta = MidiTrack()
+    meta.append(MetaMessage("set_tempo", tempo=500000, time=0))
+    meta.append(MetaMessage("time_signature", numerator=4, denominator=4, time=0))
+    meta.append(MetaMessage("set_tempo", tempo=400000, time=960))
+    drums = MidiTrack()
+    for i, note in enumerate([36, 42, 38, 42, 36, 49, 38, 51]):
+        drums.append(
+            Message(
+                "note_on", note=note, velocity=100, time=0 if i == 0 else 240, channel=9
+            )
+        )
+        drums.append(Message("note_off", note=note, velocity=0, time=0, channel=9))
+    melody = MidiTrack()
+    melody.append(Message("program_change", program=30, time=0, channel=0))
+    melody.append(Message("note_on", note=60, velocity=90, time=120, channel=0))
+    melody.append(Message("note_off", note=60, velocity=0, time=480, channel=0))
+    mid.tracks.extend([meta, drums, melody])
+    mid.save(path)
+
 
 if __name__ == "__main__":
     unittest.main()
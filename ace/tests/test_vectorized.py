@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from mido import Message, MetaMessage
+
+from ace import vectorized
+from ace.charter import Charter
+from ace.difficulty import DIFFICULTIES
+from ace.mapping import DRUM_MAPPING
+from ace.tests.test_translate import _write_sample_midi
+
+
+@unittest.skipUnless(vectorized.HAS_NUMPY, "NumPy is not installed")
+class TestVectorized(unittest.TestCase):
+    """Tests for the NumPy-backed drum event extraction."""
+
+    def setUp(self):
+        """Set up a merged track covering every mapping and filtering branch."""
+        self.track = [
+            MetaMessage("set_tempo", tempo=500000, time=0),
+            Message("note_on", note=36, velocity=64, time=0, channel=9),
+            Message("note_on", note=42, velocity=64, time=0, channel=9),
+            Message("note_on", note=38, velocity=0, time=100, channel=9),
+            Message("note_on", note=54, velocity=64, time=0, channel=9),
+            Message("note_on", note=49, velocity=64, time=0, channel=0),
+            Message("note_off", note=36, velocity=0, time=7, channel=9),
+            MetaMessage("set_tempo", tempo=333333, time=13),
+            Message("note_on", note=51, velocity=90, time=0, channel=9),
+            Message("control_change", control=7, value=100, time=250, channel=9),
+            Message("note_on", note=57, velocity=90, time=1, channel=9),
+        ]
+
+    def test_decode_track(self):
+        """Test that deltas are accumulated into absolute ticks."""
+        notes, tempos = vectorized.decode_track(self.track)
+
+        self.assertEqual(notes["abs_tick"].tolist(), [0, 0, 100, 100, 100, 120, 371])
+        self.assertEqual(notes["channel"].tolist(), [9, 9, 9, 9, 0, 9, 9])
+        self.assertEqual(tempos["abs_tick"].tolist(), [0, 120])
+        self.assertEqual(tempos["tempo"].tolist(), [500000, 333333])
+
+    def test_lookup_tables_match_mapping(self):
+        """Test that the lookup tables cover DRUM_MAPPING exactly."""
+        mapped = [note for note in range(128) if vectorized.LANE_LUT[note] >= 0]
+        self.assertEqual(mapped, sorted(DRUM_MAPPING))
+
+    def test_chart_sections_match_python_path(self):
+        """Test that both paths produce the same events for every resolution."""
+        for ticks_per_beat in (96, 120, 480, 960):
+            expected = Charter(use_numpy=False)._chart_sections(
+                self.track, ticks_per_beat, tuple(DIFFICULTIES)
+            )
+            actual = vectorized.chart_sections(
+                self.track, ticks_per_beat, tuple(DIFFICULTIES)
+            )
+
+            self.assertEqual(actual[0], expected[0])
+            self.assertEqual(
+                [(name, list(notes.items())) for name, notes in actual[1]],
+                [(name, list(notes.items())) for name, notes in expected[1]],
+            )
+
+    @patch("ace.charter.Charter.generate_wav_file")
+    def test_generate_chart_file_is_byte_identical(self, mock_generate_wav):
+        """Test that both paths write byte-identical chart files."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            in_file_dir = os.path.join(tmp_dir, "song.mid")
+            _write_sample_midi(in_file_dir)
+
+            charts = []
+            for use_numpy in (False, True):
+                out_dir = os.path.join(tmp_dir, str(use_numpy))
+                os.makedirs(out_dir)
+                Charter(use_numpy=use_numpy).convert(in_file_dir, out_dir, "ch")
+                with open(os.path.join(out_dir, "ch", "notes.chart"), "rb") as f:
+                    charts.append(f.read())
+
+            self.assertEqual(charts[0], charts[1])
+
+    def test_scanned_arrays_match_decoded_track(self):
+        """Test that the scanner's arrays match decoding the extracted messages."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            in_file_dir = os.path.join(tmp_dir, "song.mid")
+            _write_sample_midi(in_file_dir)
+            midi = Charter(use_numpy=True).extract_drums(in_file_dir)
+
+        notes, tempos = midi.drum_arrays
+        expected_notes, expected_tempos = vectorized.decode_track(midi.tracks[0])
+        self.assertGreater(len(notes), 0)
+        self.assertEqual(notes.tolist(), expected_notes.tolist())
+        self.assertEqual(tempos.tolist(), expected_tempos.tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from ace.tests.test_translate import _write_sample_midi
+from ace.watch import Watcher, watch
+
+
+class TestWatcher(unittest.TestCase):
+    """Tests for detecting changed MIDI files."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.song = os.path.join(self.tmp_dir.name, "song.mid")
+        _write_sample_midi(self.song)
+        self.watcher = Watcher([self.tmp_dir.name], debounce=1.0)
+
+    def tearDown(self):
+        self.watcher.close()
+        self.tmp_dir.cleanup()
+
+    def _touch(self, path, mtime_ns):
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    def test_debounce(self):
+        """Test that a file is reported once it stops changing, and only once."""
+        self.assertEqual(
+            self.watcher.index, {self.song: self.watcher._scan()[self.song]}
+        )
+        self.assertEqual(self.watcher.poll(now=0.0), [])
+
+        # Saved twice in a row: the debounce restarts at the second save
+        self._touch(self.song, 1_000_000_000)
+        self.assertEqual(self.watcher.poll(now=10.0), [])
+        self._touch(self.song, 2_000_000_000)
+        self.assertEqual(self.watcher.poll(now=10.5), [])
+        self.assertEqual(self.watcher.poll(now=11.0), [])
+        self.assertEqual(self.watcher.poll(now=11.5), [self.song])
+        self.assertEqual(self.watcher.poll(now=20.0), [])
+
+    def test_new_and_deleted_files(self):
+        """Test that new files are picked up and deleted ones are dropped."""
+        other = os.path.join(self.tmp_dir.name, "album", "other.mid")
+        os.makedirs(os.path.dirname(other))
+        _write_sample_midi(other)
+        self._touch(self.song, 1_000_000_000)
+        self.assertEqual(self.watcher.poll(now=0.0), [])
+
+        os.remove(self.song)
+        self.assertEqual(self.watcher.poll(now=5.0), [other])
+        self.assertEqual(list(self.watcher.index), [other])
+
+    def test_inotify_wakes_up(self):
+        """Test that a write in a watched directory ends the wait early."""
+        if self.watcher._inotify is None:
+            self.skipTest("inotify is not available")
+
+        _write_sample_midi(self.song)
+        start = time.monotonic()
+        self.watcher.wait()
+        self.assertLess(time.monotonic() - start, 5.0)
+
+    @patch("ace.watch.Watcher.wait", side_effect=[None, KeyboardInterrupt])
+    @patch("ace.watch.convert_file", return_value=(None, None, None))
+    def test_watch(self, mock_convert_file, mock_wait):
+        """Test that every file is converted once, then again after it changes."""
+        out_dir = os.path.join(self.tmp_dir.name, "out")
+        with patch("ace.watch.Watcher.poll", return_value=[self.song]):
+            watch([self.tmp_dir.name], out_dir, debounce=0.0)
+
+        self.assertEqual(mock_convert_file.call_count, 2)
+        mock_convert_file.assert_called_with(self.song, out_dir, False, None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,361 @@
+"""
+Module for NumPy-backed drum event extraction.
+Decodes a delta-timed drum track into structured arrays and maps the notes to
+Clone Hero lanes with array operations. NumPy is optional; check `HAS_NUMPY`.
+"""
+
+from ace.difficulty import DIFFICULTIES
+from ace.mapping import (
+    CHART_RESOLUTION,
+    CYMBAL_MAPPING,
+    CYMBAL_MARKER,
+    CYMBAL_OFFSET,
+    DRUM_CHANNEL,
+    DRUM_MAPPING,
+    KICK,
+)
+from ace.midi_scanner import META, META_SET_TEMPO
+from ace.note_track import NoteTrack
+from ace.tempo_map import TempoMap
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+HAS_NUMPY = np is not None
+
+if HAS_NUMPY:
+    NOTE_DTYPE = np.dtype(
+        [
+            ("abs_tick", np.int64),
+            ("note", np.uint8),
+            ("velocity", np.uint8),
+            ("channel", np.uint8),
+        ]
+    )
+    TEMPO_DTYPE = np.dtype([("abs_tick", np.int64), ("tempo", np.int64)])
+
+    # 128-entry lookup tables replacing the DRUM_MAPPING/CYMBAL_MAPPING dicts, -1 = unmapped
+    LANE_LUT = np.full(128, -1, dtype=np.int16)
+    for _note, (_lane, _flag) in DRUM_MAPPING.items():
+        LANE_LUT[_note] = _lane
+    CYMBAL_LUT = np.full(128, -1, dtype=np.int16)
+    for _note, _cymbal in CYMBAL_MAPPING.items():
+        CYMBAL_LUT[_note] = _cymbal
+
+
+def decode_track(track):
+    """
+    Decode a delta-timed track into structured note and tempo arrays.
+
+    Args:
+        track: Iterable of mido messages with delta times, e.g. a merged MidiTrack
+
+    Returns:
+        tuple: (notes, tempos) structured arrays. `notes` holds every note_on
+            message (abs_tick, note, velocity, channel) and `tempos` every
+            set_tempo message (abs_tick, tempo), both in track order
+    """
+    deltas = []
+    note_rows = []
+    note_index = []
+    tempo_values = []
+    tempo_index = []
+
+    for i, msg in enumerate(track):
+        deltas.append(msg.time)
+        if msg.type == "note_on":
+            note_index.append(i)
+            note_rows.append((msg.note, msg.velocity, msg.channel))
+        elif msg.type == "set_tempo":
+            tempo_index.append(i)
+            tempo_values.append(msg.tempo)
+
+    abs_ticks = np.cumsum(np.asarray(deltas, dtype=np.int64))
+
+    notes = np.zeros(len(note_rows), dtype=NOTE_DTYPE)
+    if note_rows:
+        notes["abs_tick"] = abs_ticks[note_index]
+        fields = np.asarray(note_rows, dtype=np.uint8)
+        notes["note"] = fields[:, 0]
+        notes["velocity"] = fields[:, 1]
+        notes["channel"] = fields[:, 2]
+
+    tempos = np.zeros(len(tempo_values), dtype=TEMPO_DTYPE)
+    if tempo_values:
+        tempos["abs_tick"] = abs_ticks[tempo_index]
+        tempos["tempo"] = tempo_values
+
+    return notes, tempos
+
+
+def decode_events(events):
+    """
+    Decode scanned MIDI events straight into structured note and tempo arrays.
+
+    Gives the same arrays as `decode_track` on the messages built from the events,
+    without building a mido message per event.
+
+    Args:
+        events: Time-ordered (abs_tick, status, a, b) tuples from `ace.midi_scanner`
+
+    Returns:
+        tuple: (notes, tempos) structured arrays, see `decode_track`
+    """
+    notes = np.array(
+        [
+            (tick, a, b, status & 0x0F)
+            for tick, status, a, b in events
+            if status & 0xF0 == 0x90
+        ],
+        dtype=NOTE_DTYPE,
+    )
+    tempos = np.array(
+        [
+            (tick, int.from_bytes(b, "big"))
+            for tick, status, a, b in events
+            if status == META and a == META_SET_TEMPO
+        ],
+        dtype=TEMPO_DTYPE,
+    )
+    return notes, tempos
+
+
+def to_chart_ticks(abs_ticks, ticks_per_beat: int):
+    """
+    Rescale absolute MIDI ticks to chart ticks, truncating like the Python path.
+
+    Args:
+        abs_ticks: Integer array of absolute MIDI ticks
+        ticks_per_beat (int): MIDI file resolution
+
+    Returns:
+        ndarray: Chart ticks at CHART_RESOLUTION
+    """
+    return abs_ticks * CHART_RESOLUTION // ticks_per_beat
+
+
+def snap_ticks(abs_ticks, ticks_per_beat: int, grid: int):
+    """
+    Rescale absolute MIDI ticks to the nearest grid lines in chart ticks.
+
+    Rounds like `ace.quantize.snap_tick`.
+
+    Args:
+        abs_ticks: Integer array of absolute MIDI ticks
+        ticks_per_beat (int): MIDI file resolution
+        grid (int): Grid size in chart ticks, from `ace.quantize.grid_ticks`
+
+    Returns:
+        ndarray: Chart ticks on the grid
+    """
+    cell = ticks_per_beat * grid
+    return (2 * abs_ticks * CHART_RESOLUTION + cell) // (2 * cell) * grid
+
+
+def merge_hits(ticks, lanes, markers, flam_ticks: int = 0):
+    """
+    Merge the duplicate and flammed hits of each lane with array operations.
+
+    Merges the same hits as `ace.quantize.merge_hits`: each run of hits on one lane
+    that are at most flam_ticks apart becomes its first hit, a cymbal if any hit
+    of the run was.
+
+    Args:
+        ticks: Integer array of chart ticks in chart order
+        lanes: Integer array of the lane of each hit
+        markers: Integer array of the cymbal marker of each hit, -1 for none
+        flam_ticks (int): Largest gap in chart ticks between merged hits
+
+    Returns:
+        tuple: (ticks, lanes, markers) arrays of the merged hits in chart order
+    """
+    if not len(ticks):
+        return ticks, lanes, markers
+
+    # Group the hits by lane, in chart order within each lane
+    order = np.lexsort((np.arange(len(ticks)), ticks, lanes))
+    lane_ticks, lane_of = ticks[order], lanes[order]
+    run_starts = np.ones(len(order), dtype=bool)
+    run_starts[1:] = (lane_of[1:] != lane_of[:-1]) | (np.diff(lane_ticks) > flam_ticks)
+    starts = np.flatnonzero(run_starts)
+
+    # Markers of one lane are equal, so any cymbal hit makes the run a cymbal
+    run_markers = np.maximum.reduceat(markers[order], starts)
+    firsts = order[starts]
+    chart_order = np.argsort(firsts, kind="stable")
+    kept = firsts[chart_order]
+    return ticks[kept], lanes[kept], run_markers[chart_order]
+
+
+def drum_events(notes, ticks_per_beat: int, grid: int = None, flam_ticks: int = None):
+    """
+    Map decoded notes to ExpertDrums chart events.
+
+    Keeps sounding notes on the drum channel that are in DRUM_MAPPING, and emits each
+    lane note followed by its cymbal marker when the drum is a cymbal.
+
+    Args:
+        notes: Structured note array from `decode_track`
+        ticks_per_beat (int): MIDI file resolution
+        grid (int, optional): Snap the notes to this grid of chart ticks instead of
+            truncating them to a chart tick, see `snap_ticks`
+        flam_ticks (int, optional): Merge the duplicate and flammed hits of each
+            lane, see `merge_hits`. Defaults to keeping every hit
+
+    Returns:
+        tuple: (ticks, codes) integer arrays in chart order, where codes are the
+            Clone Hero note numbers
+    """
+    lanes = LANE_LUT[notes["note"]]
+    keep = (notes["velocity"] > 0) & (notes["channel"] == DRUM_CHANNEL) & (lanes >= 0)
+    kept = notes[keep]
+    lanes = lanes[keep]
+    markers = CYMBAL_LUT[kept["note"]]
+
+    if grid is None:
+        ticks = to_chart_ticks(kept["abs_tick"], ticks_per_beat)
+    else:
+        ticks = snap_ticks(kept["abs_tick"], ticks_per_beat, grid)
+    if flam_ticks is not None:
+        ticks, lanes, markers = merge_hits(ticks, lanes, markers, flam_ticks)
+
+    # Interleave every lane note with its (optional) cymbal marker
+    codes = np.stack([lanes, markers], axis=1).ravel()
+    ticks = np.repeat(ticks, 2)
+    emitted = codes >= 0
+
+    return ticks[emitted], codes[emitted]
+
+
+def _run_starts(values):
+    """
+    Mark the first element of each run of equal values.
+
+    Args:
+        values: Integer array
+
+    Returns:
+        ndarray: Boolean mask, True where a value differs from the one before it
+    """
+    starts = np.ones(len(values), dtype=bool)
+    starts[1:] = values[1:] != values[:-1]
+    return starts
+
+
+def _first_of_cell(ticks, grid: int):
+    """
+    Mark the events at the first tick of each grid cell.
+
+    Args:
+        ticks: Sorted integer array of chart ticks
+        grid (int): Cell size in chart ticks
+
+    Returns:
+        ndarray: Boolean mask of the events sharing the first tick of their cell
+    """
+    starts = np.flatnonzero(_run_starts(ticks // grid))
+    first_ticks = np.repeat(ticks[starts], np.diff(np.append(starts, len(ticks))))
+    return ticks == first_ticks
+
+
+def reduce_drums(ticks, codes, difficulty: str):
+    """
+    Reduce ExpertDrums events to a lower difficulty with array operations.
+
+    Produces the same events, in the same order, as `ace.difficulty.reduce_drums`.
+
+    Args:
+        ticks: Integer array of ExpertDrums chart ticks in chart order
+        codes: Integer array of the Clone Hero note numbers
+        difficulty (str): A key of DIFFICULTIES
+
+    Returns:
+        tuple: (ticks, codes) integer arrays of the reduced events in chart order
+    """
+    settings = DIFFICULTIES[difficulty]
+
+    # Density thinning on the beat grid
+    keep = _first_of_cell(ticks, settings["grid"])
+    ticks, codes = ticks[keep], codes[keep].astype(np.int64)
+
+    # Deduplicate each chord into one sorted key per note, ordered as the kick, then
+    # each pad directly followed by its cymbal marker
+    is_marker = codes >= CYMBAL_MARKER
+    order = np.where(is_marker, (codes - CYMBAL_OFFSET) * 2 + 1, codes * 2)
+    keys = np.unique(ticks * 256 + order)
+    ticks, order = keys // 256, keys % 256
+    codes = np.where(order % 2, order // 2 + CYMBAL_OFFSET, order // 2)
+    is_kick = codes == KICK
+    is_marker = codes >= CYMBAL_MARKER
+
+    # Keep the lowest pad lanes of each chord, pads of a chord being contiguous
+    pads = np.flatnonzero(~is_kick & ~is_marker)
+    positions = np.arange(len(pads))
+    chord_start = np.maximum.accumulate(
+        np.where(_run_starts(ticks[pads]), positions, 0)
+    )
+    keep = np.zeros(len(keys), dtype=bool)
+    keep[pads[positions - chord_start < settings["max_pads"]]] = True
+    pad_keys = keys[keep]
+
+    if settings["cymbals"]:
+        # The key of a marker is its pad's key plus one
+        keep |= is_marker & np.isin(keys - 1, pad_keys)
+
+    kicks = np.flatnonzero(is_kick)
+    if not settings["kick_with_pads"]:
+        kicks = kicks[~np.isin(ticks[kicks], pad_keys // 256)]
+    kicks = kicks[_first_of_cell(ticks[kicks], settings["kick_grid"])]
+    keep[kicks] = True
+
+    return ticks[keep], codes[keep]
+
+
+def chart_sections(
+    track,
+    ticks_per_beat: int,
+    difficulties=(),
+    grid: int = None,
+    flam_ticks: int = None,
+    decoded: tuple = None,
+):
+    """
+    Build the SyncTrack items and drum note tracks for a drum track.
+
+    Produces the same events, in the same order, as the Python path of
+    `Charter.generate_chart_file`.
+
+    Args:
+        track: Iterable of mido messages with delta times, e.g. a merged MidiTrack
+        ticks_per_beat (int): MIDI file resolution
+        difficulties: Lower difficulties to reduce ExpertDrums to, keys of DIFFICULTIES
+        grid (int, optional): Grid in chart ticks to snap the drum notes to
+        flam_ticks (int, optional): Merge the duplicate and flammed hits of each
+            lane, see `merge_hits`
+        decoded (tuple, optional): (notes, tempos) arrays of the track from
+            `decode_events`, saving the decoding of its messages
+
+    Returns:
+        tuple: (sync_items, drum_sections), where sync_items is a list of (tick, event)
+            pairs and drum_sections a list of (name, NoteTrack) pairs starting with
+            ExpertDrums
+    """
+    notes, tempos = decode_track(track) if decoded is None else decoded
+
+    tempo_map = TempoMap(tempos.tolist(), ticks_per_beat)
+    sync_items = [(0, "TS 4")]
+    sync_items.extend(tempo_map.sync_items())
+
+    drum_ticks, codes = drum_events(notes, ticks_per_beat, grid, flam_ticks)
+    drum_sections = [("ExpertDrums", NoteTrack.from_arrays(drum_ticks, codes))]
+    for difficulty in difficulties:
+        drum_sections.append(
+            (
+                f"{difficulty}Drums",
+                NoteTrack.from_arrays(*reduce_drums(drum_ticks, codes, difficulty)),
+            )
+        )
+
+    return sync_items, drum_sections
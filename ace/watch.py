@@ -0,0 +1,247 @@
+"""
+Module for watching MIDI files and reconverting them when they change.
+Keeps an index of the size and modification time of every watched file, rescanned
+when Linux inotify reports activity in a watched directory (or on a timer where
+inotify isn't available), and reconverts a file once it has stopped changing.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import sys
+import time
+
+from rich import print
+
+from ace.batch import convert_file, find_midi_files
+
+logger = logging.getLogger(__name__)
+
+# Seconds a file must stay unchanged before it's reconverted, so an editor saving
+# several times in a row (or a file still being copied) triggers a single conversion
+DEFAULT_DEBOUNCE = 1.0
+
+# Seconds between rescans when inotify isn't available
+DEFAULT_INTERVAL = 0.5
+
+# Seconds between rescans with inotify, catching directories it doesn't watch yet
+INOTIFY_RESCAN = 30.0
+
+# IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+INOTIFY_MASK = 0x2 | 0x4 | 0x8 | 0x40 | 0x80 | 0x100 | 0x200
+
+
+class _Inotify:
+    """
+    Minimal ctypes binding of Linux inotify, only used to wake the watcher up.
+
+    Raises:
+        OSError: If inotify isn't available
+    """
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.watched = set()
+
+    def add(self, directory: str):
+        """
+        Watch a directory, ignoring directories that are already watched or gone.
+
+        Args:
+            directory (str): Directory to watch
+        """
+        if directory in self.watched:
+            return
+        if (
+            self._libc.inotify_add_watch(self.fd, os.fsencode(directory), INOTIFY_MASK)
+            >= 0
+        ):
+            self.watched.add(directory)
+
+    def wait(self, timeout: float):
+        """
+        Block until a watched directory changes or the timeout expires.
+
+        Args:
+            timeout (float): Seconds to wait at most
+
+        Returns:
+            bool: True if something changed
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+
+        # Only the wakeup matters, the index rescan finds what changed
+        while True:
+            try:
+                os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Watcher:
+    """
+    Tracks the MIDI files matched by a list of inputs and reports the ones that changed.
+
+    Files are identified by their (modification time, size) signature. A changed
+    file is reported once its signature has held for `debounce` seconds; deleted
+    files are dropped, and files that appear later are picked up by the next scan.
+
+    Args:
+        inputs (list): MIDI file paths, directories and/or glob patterns
+        debounce (float, optional): Seconds a file must stay unchanged before it's reported
+        interval (float, optional): Seconds between rescans when inotify isn't available
+    """
+
+    def __init__(
+        self,
+        inputs: list,
+        debounce: float = DEFAULT_DEBOUNCE,
+        interval: float = DEFAULT_INTERVAL,
+    ):
+        self.inputs = list(inputs)
+        self.debounce = debounce
+        self.interval = interval
+        # Path -> time its last change was seen
+        self.pending = {}
+
+        self._inotify = None
+        if sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify()
+            except (AttributeError, OSError) as e:
+                logger.info(f"inotify unavailable, polling instead: {e}")
+
+        self.index = self._scan()
+
+    def _scan(self):
+        """
+        Stat every matched MIDI file.
+
+        Returns:
+            dict: (st_mtime_ns, st_size) signatures keyed by path
+        """
+        index = {}
+        for path in find_midi_files(self.inputs):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            index[path] = (stat.st_mtime_ns, stat.st_size)
+
+        if self._inotify is not None:
+            for pattern in self.inputs:
+                if os.path.isdir(pattern):
+                    self._inotify.add(pattern)
+            for path in index:
+                self._inotify.add(os.path.dirname(path) or os.curdir)
+        return index
+
+    def poll(self, now: float = None):
+        """
+        Rescan the inputs and collect the files that have settled after a change.
+
+        Args:
+            now (float, optional): Current `time.monotonic()` time
+
+        Returns:
+            list: Paths of the files to reconvert
+        """
+        now = time.monotonic() if now is None else now
+        index = self._scan()
+        for path, signature in index.items():
+            if self.index.get(path) != signature:
+                self.pending[path] = now
+        self.index = index
+
+        ready = []
+        for path, changed in list(self.pending.items()):
+            if path not in index:
+                del self.pending[path]
+            elif now - changed >= self.debounce:
+                del self.pending[path]
+                ready.append(path)
+        return ready
+
+    def wait(self):
+        """
+        Sleep until the next poll is due, waking early when inotify reports a change.
+        """
+        timeout = self.interval if self._inotify is None else INOTIFY_RESCAN
+        if self.pending:
+            settle = min(self.pending.values()) + self.debounce - time.monotonic()
+            timeout = max(0.0, min(timeout, settle))
+
+        if self._inotify is None:
+            time.sleep(timeout)
+        else:
+            self._inotify.wait(timeout)
+
+    def close(self):
+        """
+        Release the inotify file descriptor, if any.
+        """
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+
+def _convert(in_file_dir: str, out_dir: str, save_split_midi: bool, charter_options):
+    _, error, _ = convert_file(in_file_dir, out_dir, save_split_midi, charter_options)
+    if error is None:
+        print(f"[bold green]✔ Converted:[/bold green] [cyan]{in_file_dir}[/cyan]")
+    else:
+        print(f"[bold red]✘ Failed:[/bold red] [cyan]{in_file_dir}[/cyan] ({error})")
+
+
+def watch(
+    inputs: list,
+    out_dir: str,
+    save_split_midi: bool = False,
+    charter_options: dict = None,
+    debounce: float = DEFAULT_DEBOUNCE,
+    interval: float = DEFAULT_INTERVAL,
+):
+    """
+    Convert the MIDI files matched by the inputs, then reconvert them as they change.
+
+    Runs until interrupted with Ctrl+C. With an output cache in the charter options,
+    only the stages whose inputs changed are redone: an unchanged file is served
+    from the cache, and an edit that leaves the drum track as it was re-charts the
+    song without rendering its audio again.
+
+    Args:
+        inputs (list): MIDI file paths, directories and/or glob patterns
+        out_dir (str): Directory where all output files will be saved
+        save_split_midi (bool): Also write the split "_DRUMS" MIDI files to out_dir
+        charter_options (dict, optional): Keyword arguments for the Charter
+        debounce (float, optional): Seconds a file must stay unchanged before it's reconverted
+        interval (float, optional): Seconds between rescans when inotify isn't available
+    """
+    watcher = Watcher(inputs, debounce, interval)
+    try:
+        for in_file_dir in watcher.index:
+            _convert(in_file_dir, out_dir, save_split_midi, charter_options)
+
+        print(
+            f"[bold]Watching {len(watcher.index)} MIDI files for changes, press Ctrl+C to stop[/bold]"
+        )
+        while True:
+            watcher.wait()
+            for in_file_dir in watcher.poll():
+                logger.info(f"Reconverting changed file: {in_file_dir}")
+                _convert(in_file_dir, out_dir, save_split_midi, charter_options)
+    except KeyboardInterrupt:
+        logger.info("Stopped watching")
+    finally:
+        watcher.close()
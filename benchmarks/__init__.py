@@ -0,0 +1,4 @@
+"""
+Benchmarks for the Charter stages, run on synthetic MIDI files.
+Run them with `python -m benchmarks.run`.
+"""
@@ -0,0 +1,326 @@
+"""
+Benchmark the Charter stages on synthetic MIDI files.
+
+Each scenario generates a song, then times `split_midi`, `generate_chart_file` and
+the audio step separately, reporting events per second and peak Python memory.
+Results can be stored as a baseline and later runs compared against it:
+
+    python -m benchmarks.run --save_baseline
+    python -m benchmarks.run --compare
+"""
+
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+from mido import MidiFile
+from rich import print
+from rich.table import Table
+
+from ace import drum_renderer, vectorized
+from ace.charter import Charter
+from ace.mapping import CYMBAL_MAPPING, DRUM_MAPPING
+from benchmarks.synthetic import count_events, generate_midi
+
+if vectorized.HAS_NUMPY:
+    import numpy as np
+
+BASELINE_FP = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+SCENARIOS = {
+    "small": {
+        "seconds": 180,
+        "tracks": 2,
+        "notes_per_second": 8,
+        "tempo_changes": 2,
+        "ticks_per_beat": 480,
+    },
+    "dense": {
+        "seconds": 240,
+        "tracks": 8,
+        "notes_per_second": 32,
+        "tempo_changes": 32,
+        "ticks_per_beat": 960,
+    },
+    "long": {
+        "seconds": 900,
+        "tracks": 4,
+        "notes_per_second": 12,
+        "tempo_changes": 200,
+        "ticks_per_beat": 96,
+    },
+}
+
+AUDIO_MODES = ("numpy", "fluidsynth", "none")
+
+
+def synthetic_samples():
+    """
+    Build stand-in one-shot samples so the NumPy renderer runs without a soundfont.
+
+    Returns:
+        dict: Decaying noise per GM drum note, long for cymbals and short otherwise
+    """
+    rng = np.random.default_rng(0)
+    samples = {}
+    for note in sorted(DRUM_MAPPING):
+        frames = drum_renderer.SAMPLE_RATE * (2 if note in CYMBAL_MAPPING else 1) // 2
+        decay = np.exp(-np.linspace(0, 8, frames, dtype=np.float32))[:, None]
+        noise = rng.uniform(-1, 1, (frames, 2)).astype(np.float32)
+        samples[note] = noise * decay
+    return samples
+
+
+def _measure(stage, events: int, repeats: int):
+    """
+    Time a stage, then run it once more to record its peak memory.
+
+    Args:
+        stage: Callable running the stage
+        events (int): Number of MIDI events the stage handles
+        repeats (int): Number of timed runs; the fastest one is kept
+
+    Returns:
+        dict: seconds, events, events_per_second and peak_bytes of the stage
+    """
+    seconds = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        stage()
+        seconds = min(seconds, time.perf_counter() - start)
+
+    # Tracing slows the stage down, so memory gets a run of its own
+    tracemalloc.start()
+    try:
+        stage()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds": round(seconds, 6),
+        "events": events,
+        "events_per_second": round(events / seconds),
+        "peak_bytes": peak_bytes,
+    }
+
+
+def run_scenario(config: dict, charter_options: dict, audio: str, repeats: int = 3):
+    """
+    Generate a synthetic song and benchmark each Charter stage on it.
+
+    Args:
+        config (dict): Arguments for `generate_midi`
+        charter_options (dict): Keyword arguments for `Charter`
+        audio (str): Audio step to time, one of AUDIO_MODES
+        repeats (int): Number of timed runs per stage
+
+    Returns:
+        dict: Measurements per stage, see `_measure`
+    """
+    charter = Charter(**charter_options)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        in_file_dir = os.path.join(tmp_dir, "synthetic_song.mid")
+        song = generate_midi(**config)
+        song.save(in_file_dir)
+        os.makedirs(os.path.join(tmp_dir, "ch"))
+
+        in_file_key = charter.split_file_key(in_file_dir)
+        split_fp = os.path.join(tmp_dir, in_file_key)
+
+        def split():
+            charter.split_midi(in_file_dir, tmp_dir)
+
+        def chart():
+            charter.generate_chart_file(in_file_key, tmp_dir, "ch")
+
+        def render_numpy():
+            wav_out_fp = os.path.join(tmp_dir, "ch", "song.wav")
+            drum_renderer.render_wav(MidiFile(split_fp), wav_out_fp, samples)
+
+        def render_fluidsynth():
+            charter.generate_wav_file(in_file_key, tmp_dir, "ch")
+
+        # Keep the Charter's progress output out of the report
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            results["split"] = _measure(split, count_events(song), repeats)
+            split_events = count_events(MidiFile(split_fp))
+            results["chart"] = _measure(chart, split_events, repeats)
+            if audio == "numpy":
+                samples = synthetic_samples()
+                results["audio"] = _measure(render_numpy, split_events, repeats)
+            elif audio == "fluidsynth":
+                # Download the soundfont before the clock starts
+                charter._fetch_soundfont()
+                results["audio"] = _measure(render_fluidsynth, split_events, repeats)
+
+    return results
+
+
+def compare(results: dict, baseline: dict, max_slowdown: float):
+    """
+    Find stages that got slower or hungrier than the baseline allows.
+
+    Args:
+        results (dict): Measurements per scenario and stage
+        baseline (dict): Stored measurements in the same layout
+        max_slowdown (float): Allowed ratio of baseline to current events per second,
+            and of current to baseline peak memory
+
+    Returns:
+        list: Description of every regression found
+    """
+    regressions = []
+    for scenario, stages in results.items():
+        for stage, current in stages.items():
+            previous = baseline.get(scenario, {}).get(stage)
+            if previous is None:
+                continue
+            speed = previous["events_per_second"] / current["events_per_second"]
+            if speed > max_slowdown:
+                regressions.append(
+                    f"{scenario}/{stage}: {current['events_per_second']:,} events/s, "
+                    f"{speed:.2f}x slower than the baseline"
+                )
+            growth = current["peak_bytes"] / max(1, previous["peak_bytes"])
+            if growth > max_slowdown:
+                regressions.append(
+                    f"{scenario}/{stage}: {current['peak_bytes']:,} peak bytes, "
+                    f"{growth:.2f}x the baseline"
+                )
+    return regressions
+
+
+def _print_results(results: dict):
+    table = Table(title="Charter stage benchmarks")
+    for column in ("Scenario", "Stage", "Events", "Seconds", "Events/s", "Peak MiB"):
+        table.add_column(
+            column, justify="left" if column in ("Scenario", "Stage") else "right"
+        )
+    for scenario, stages in results.items():
+        for stage, result in stages.items():
+            table.add_row(
+                scenario,
+                stage,
+                f"{result['events']:,}",
+                f"{result['seconds']:.4f}",
+                f"{result['events_per_second']:,}",
+                f"{result['peak_bytes'] / 2**20:.1f}",
+            )
+    print(table)
+
+
+def main():
+    parser = ArgumentParser(description="Benchmark the Charter stages")
+    parser.add_argument(
+        "-s",
+        "--scenario",
+        choices=list(SCENARIOS),
+        nargs="+",
+        help="Stored scenarios to run (defaults to all of them)",
+    )
+    # A custom scenario replaces the stored ones, one run per ticks_per_beat value
+    parser.add_argument("--seconds", type=float, help="Custom song length")
+    parser.add_argument(
+        "--tracks", type=int, default=4, help="Custom instrument tracks"
+    )
+    parser.add_argument(
+        "--notes_per_second", type=float, default=16, help="Custom notes per track"
+    )
+    parser.add_argument(
+        "--tempo_changes", type=int, default=8, help="Custom tempo change count"
+    )
+    parser.add_argument(
+        "--ticks_per_beat",
+        type=int,
+        nargs="+",
+        default=[480],
+        help="Custom MIDI resolutions",
+    )
+    parser.add_argument(
+        "--audio",
+        choices=AUDIO_MODES,
+        default="numpy" if vectorized.HAS_NUMPY else "none",
+        help="Audio step to time. 'numpy' mixes synthetic samples, 'fluidsynth' "
+        "needs FluidSynth and downloads the soundfont",
+    )
+    parser.add_argument("--no_numpy", action="store_true", help="Chart without NumPy")
+    parser.add_argument(
+        "--no_scanner", action="store_true", help="Parse every file with mido"
+    )
+    parser.add_argument(
+        "-r", "--repeats", type=int, default=3, help="Timed runs per stage"
+    )
+    parser.add_argument("--json", type=str, help="Also write the results to this file")
+    parser.add_argument(
+        "--save_baseline", action="store_true", help=f"Overwrite {BASELINE_FP}"
+    )
+    parser.add_argument(
+        "--compare", action="store_true", help="Exit with 1 on a regression"
+    )
+    parser.add_argument(
+        "--max_slowdown",
+        type=float,
+        default=1.5,
+        help="Slowdown or memory growth over the baseline counted as a regression",
+    )
+    args = parser.parse_args()
+
+    if args.audio == "numpy" and not vectorized.HAS_NUMPY:
+        parser.error("--audio numpy requires NumPy")
+
+    if args.seconds:
+        scenarios = {
+            f"custom_{tpb}": {
+                "seconds": args.seconds,
+                "tracks": args.tracks,
+                "notes_per_second": args.notes_per_second,
+                "tempo_changes": args.tempo_changes,
+                "ticks_per_beat": tpb,
+            }
+            for tpb in args.ticks_per_beat
+        }
+    else:
+        scenarios = {name: SCENARIOS[name] for name in args.scenario or SCENARIOS}
+
+    charter_options = {
+        "use_numpy": False if args.no_numpy else None,
+        "use_scanner": not args.no_scanner,
+    }
+    results = {}
+    for name, config in scenarios.items():
+        print(f"[bold]Running scenario[/bold] [cyan]{name}[/cyan]")
+        results[name] = run_scenario(config, charter_options, args.audio, args.repeats)
+    _print_results(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(BASELINE_FP, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(
+            f"[bold green]✔ Saved baseline to:[/bold green] [cyan]{BASELINE_FP}[/cyan]"
+        )
+
+    if args.compare:
+        with open(BASELINE_FP) as f:
+            regressions = compare(results, json.load(f), args.max_slowdown)
+        for regression in regressions:
+            print(f"[bold red]Regression:[/bold red] {regression}")
+        if regressions:
+            sys.exit(1)
+        print("[bold green]✔ No regressions against the baseline[/bold green]")
+
+
+if __name__ == "__main__":
+    main()
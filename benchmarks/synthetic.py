@@ -0,0 +1,175 @@
+"""
+Module for generating synthetic MIDI files of a configurable size.
+Songs are seeded, so the same settings always produce the same file.
+"""
+
+import random
+
+from mido import Message, MetaMessage, MidiFile, MidiTrack
+
+from ace.mapping import DRUM_CHANNEL, DRUM_MAPPING
+
+# Tempo the note density is laid out at, before any tempo changes
+BASE_TEMPO = 500000
+
+# Share of drum hits snapped to a sixteenth note grid, the rest land anywhere
+QUANTIZED_SHARE = 0.8
+
+
+def _to_delta(events: list):
+    """
+    Turn (abs_tick, order, message) events into a delta-timed MIDI track.
+
+    Args:
+        events (list): Events to sort; order breaks ties between events on the same tick
+
+    Returns:
+        MidiTrack: The track, ending with end_of_track
+    """
+    track = MidiTrack()
+    last_tick = 0
+    for abs_tick, _, msg in sorted(events, key=lambda event: event[:2]):
+        track.append(msg.copy(time=abs_tick - last_tick))
+        last_tick = abs_tick
+    track.append(MetaMessage("end_of_track", time=0))
+    return track
+
+
+def _conductor_track(total_ticks: int, tempo_changes: int, rng: random.Random):
+    """
+    Build the tempo and time signature track.
+
+    Args:
+        total_ticks (int): Length of the song
+        tempo_changes (int): Number of tempo changes after the initial tempo
+        rng (random.Random): Seeded generator
+
+    Returns:
+        MidiTrack: The conductor track
+    """
+    events = [
+        (0, 0, MetaMessage("track_name", name="Conductor")),
+        (0, 1, MetaMessage("time_signature", numerator=4, denominator=4)),
+        (0, 2, MetaMessage("set_tempo", tempo=BASE_TEMPO)),
+    ]
+    for i in range(1, tempo_changes + 1):
+        bpm = rng.uniform(70, 200)
+        abs_tick = total_ticks * i // (tempo_changes + 1)
+        events.append((abs_tick, 2, MetaMessage("set_tempo", tempo=round(6e7 / bpm))))
+    return _to_delta(events)
+
+
+def _instrument_track(
+    index: int,
+    total_ticks: int,
+    num_notes: int,
+    ticks_per_beat: int,
+    rng: random.Random,
+):
+    """
+    Build one instrument track. Odd tracks are drums, even tracks are melodic.
+
+    Args:
+        index (int): Track number, starting at 1
+        total_ticks (int): Length of the song
+        num_notes (int): Number of notes in the track
+        ticks_per_beat (int): MIDI file resolution
+        rng (random.Random): Seeded generator
+
+    Returns:
+        MidiTrack: The instrument track
+    """
+    is_drums = index % 2 == 1
+    if is_drums:
+        channel = DRUM_CHANNEL
+        pitches = sorted(DRUM_MAPPING)
+    else:
+        # Melodic tracks skip the drum channel
+        channel = (index // 2 - 1) % 15
+        channel += channel >= DRUM_CHANNEL
+        pitches = range(36, 84)
+
+    events = [
+        (0, 0, MetaMessage("track_name", name=f"Track {index}")),
+        (0, 1, Message("program_change", program=index % 128, channel=channel)),
+    ]
+    grid = max(1, ticks_per_beat // 4)
+    for _ in range(num_notes):
+        abs_tick = rng.randrange(total_ticks)
+        if is_drums:
+            if rng.random() < QUANTIZED_SHARE:
+                abs_tick -= abs_tick % grid
+            duration = max(1, ticks_per_beat // 8)
+        else:
+            duration = rng.randint(1, ticks_per_beat)
+
+        note = rng.choice(pitches)
+        velocity = rng.randint(1, 127)
+        events.append(
+            (
+                abs_tick,
+                3,
+                Message("note_on", note=note, velocity=velocity, channel=channel),
+            )
+        )
+        # Note offs sort ahead of note ons on the same tick
+        events.append(
+            (
+                abs_tick + duration,
+                2,
+                Message("note_off", note=note, velocity=0, channel=channel),
+            )
+        )
+    return _to_delta(events)
+
+
+def generate_midi(
+    seconds: float = 60,
+    tracks: int = 2,
+    notes_per_second: float = 8,
+    tempo_changes: int = 4,
+    ticks_per_beat: int = 480,
+    seed: int = 0,
+):
+    """
+    Generate a synthetic multi-track MIDI song.
+
+    The song has a conductor track followed by `tracks` instrument tracks that
+    alternate between drums on the drum channel and melodic parts on other channels.
+
+    Args:
+        seconds (float): Song length, measured at the initial 120 BPM
+        tracks (int): Number of instrument tracks
+        notes_per_second (float): Notes per second in each instrument track at 120 BPM
+        tempo_changes (int): Number of tempo changes spread over the song
+        ticks_per_beat (int): MIDI file resolution
+        seed (int): Seed of the random generator
+
+    Returns:
+        MidiFile: The generated song
+    """
+    rng = random.Random(seed)
+    ticks_per_second = ticks_per_beat * 1e6 / BASE_TEMPO
+    total_ticks = max(1, round(seconds * ticks_per_second))
+    num_notes = round(seconds * notes_per_second)
+
+    mid = MidiFile(type=1, ticks_per_beat=ticks_per_beat)
+    mid.tracks.append(_conductor_track(total_ticks, tempo_changes, rng))
+    for index in range(1, tracks + 1):
+        mid.tracks.append(
+            _instrument_track(index, total_ticks, num_notes, ticks_per_beat, rng)
+        )
+    return mid
+
+
+def count_events(mid: MidiFile):
+    """
+    Count the messages in every track of a MIDI file.
+
+    Args:
+        mid (MidiFile): The MIDI file
+
+    Returns:
+        int: Number of messages, including meta messages
+    """
+    return sum(len(track) for track in mid.tracks)